@@ -1,14 +1,37 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import Flask, render_template, request, jsonify, redirect, url_for, send_file
 from supabase import create_client, Client
 import os
 import subprocess
 import yt_dlp
-import whisper
 import google.generativeai as genai
 from dotenv import load_dotenv
 import re
-import glob
-import shutil
+from jobs import JobQueue, PipelineError, JOB_WAITING, JOB_QUEUED, JOB_RUNNING
+from workdirs import WorkDirManager
+from whisper_models import WhisperModelRegistry, SUPPORTED_MODEL_SIZES
+from audio import load_pcm, load_pcm_mmap, hash_audio, SAMPLE_RATE
+from transcription import Transcription, transcribe_parallel
+from result_cache import ResultCache
+from media_cache import MediaCache
+from llm_client import GeminiClient
+from vision import FaceIndex, extract_faces_from_video, create_thumbnail
+from reframe import plan_reframe
+from proxy import build_proxy
+from boundaries import BoundarySnapper, scene_cuts, silence_map
+from clip_library import ClipLibrary
+from uploads import UploadManager, UploadError
+from clip_renderer import (
+    probe_video, can_stream_copy, render_clip, render_single_pass, scale_filter,
+    ENCODE_PROFILES, encoder_args_for, profile_threads
+)
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import namedtuple
+from typing import TypedDict
 
 # Carregar variáveis de ambiente
 load_dotenv()
@@ -24,6 +47,136 @@ DOWNLOADS_DIR = "downloads"
 if not os.path.exists(DOWNLOADS_DIR):
     os.makedirs(DOWNLOADS_DIR)
 
+# Pasta para dados persistentes (fila de jobs)
+DATA_DIR = os.getenv("DATA_DIR", "data")
+if not os.path.exists(DATA_DIR):
+    os.makedirs(DATA_DIR)
+
+# Configurações da fila de jobs
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(DATA_DIR, "jobs.db"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))  # Sem renovação, um job em execução volta a ficar disponível
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+# Cada job tem sua própria pasta de trabalho dentro de downloads/jobs
+JOB_DIRS_ROOT = os.path.join(DOWNLOADS_DIR, "jobs")
+JOB_DIR_TTL = int(os.getenv("JOB_DIR_TTL", str(6 * 3600)))  # Segundos até uma pasta abandonada expirar
+JOB_DIRS_QUOTA_MB = int(os.getenv("JOB_DIRS_QUOTA_MB", "20480"))
+
+# Uploads em partes: tamanho máximo de cada parte e do arquivo inteiro
+UPLOAD_MAX_CHUNK_MB = int(os.getenv("UPLOAD_MAX_CHUNK_MB", "64"))
+UPLOAD_MAX_SIZE_MB = int(os.getenv("UPLOAD_MAX_SIZE_MB", "20480"))
+ALLOWED_VIDEO_EXTENSIONS = {'mp4', 'mov', 'avi', 'mkv', 'webm'}
+
+# Configurações do Whisper
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")  # "tiny", "base" ou "small"
+if WHISPER_MODEL not in SUPPORTED_MODEL_SIZES:
+    raise ValueError(f"WHISPER_MODEL inválido: {WHISPER_MODEL}. Use um dos seguintes: {', '.join(SUPPORTED_MODEL_SIZES)}")
+WHISPER_PRELOAD = os.getenv("WHISPER_PRELOAD", "1") == "1"  # Carregar o modelo ao iniciar a aplicação
+
+# Transcrição paralela de vídeos longos (em CPU): número de processos e tamanho de cada trecho
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", str(max(1, min(4, (os.cpu_count() or 1) // 2)))))
+TRANSCRIBE_CHUNK_SECONDS = int(os.getenv("TRANSCRIBE_CHUNK_SECONDS", "600"))
+
+# Modo de extração de áudio: "pcm" (em memória), "pcm_mmap" (arquivo mapeado) ou "mp3" (legado)
+AUDIO_EXTRACTION_MODE = os.getenv("AUDIO_EXTRACTION_MODE", "pcm")
+
+# Modelos Whisper compartilhados entre todos os jobs do processo (pré-carregados em start_services)
+whisper_models = WhisperModelRegistry()
+
+# Modelo da Gemini usado na análise e nos títulos
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
+# Incrementar sempre que o prompt de análise mudar, para invalidar análises em cache
+ANALYSIS_PROMPT_VERSION = "3"
+
+# Cliente da Gemini: taxa máxima, chamadas simultâneas, prazo por chamada e novas tentativas
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "60"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "120"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")  # Ex.: servidor falso local (scripts/fake_gemini_server.py)
+
+# Cliente compartilhado, criado na primeira chamada
+gemini_client = None
+gemini_client_lock = threading.Lock()
+
+def get_gemini_client():
+    """Retorna o cliente compartilhado da Gemini, ou None se a chave de API não estiver configurada."""
+    global gemini_client
+    with gemini_client_lock:
+        if gemini_client is None:
+            api_key = os.getenv("GEMINI_API_KEY")  # Buscar a chave de API do .env
+            if not api_key:
+                print("Erro: Chave de API da Gemini não encontrada.")
+                return None
+            gemini_client = GeminiClient(
+                api_key,
+                GEMINI_MODEL,
+                requests_per_minute=GEMINI_RPM,
+                max_concurrency=GEMINI_MAX_CONCURRENCY,
+                timeout=GEMINI_TIMEOUT,
+                max_retries=GEMINI_MAX_RETRIES,
+                api_endpoint=GEMINI_API_ENDPOINT
+            )
+        return gemini_client
+
+# Análise hierárquica (map-reduce) para transcrições longas: tamanho das janelas e chamadas simultâneas
+ANALYSIS_WINDOW_SECONDS = int(os.getenv("ANALYSIS_WINDOW_SECONDS", "1200"))
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "4"))
+
+# Cache persistente de transcrições e análises, com chave pelo hash do áudio
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", os.path.join(DATA_DIR, "cache"))
+RESULT_CACHE_MAX_MB = int(os.getenv("RESULT_CACHE_MAX_MB", "512"))
+result_cache = ResultCache(RESULT_CACHE_DIR, RESULT_CACHE_MAX_MB * 1024 * 1024)
+
+# Cache compartilhado de vídeos baixados do YouTube (fora das pastas dos jobs)
+MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", os.path.join(DOWNLOADS_DIR, "media_cache"))
+MEDIA_CACHE_MAX_MB = int(os.getenv("MEDIA_CACHE_MAX_MB", "10240"))
+media_cache = MediaCache(MEDIA_CACHE_DIR, MEDIA_CACHE_MAX_MB * 1024 * 1024)
+
+# Ingestão de vídeos do YouTube: "pipelined" baixa primeiro só o áudio e transcreve enquanto
+# o vídeo é baixado em segundo plano; "sequential" baixa o vídeo inteiro antes de extrair o áudio
+INGEST_MODE = os.getenv("INGEST_MODE", "pipelined")
+
+# Downloads de vídeo em segundo plano (no máximo um por job em execução)
+ingest_pool = ThreadPoolExecutor(max_workers=JOB_WORKERS)
+
+# Modo de renderização dos clipes: "seek" (um ffmpeg por clipe com seek na entrada)
+# ou "single_pass" (todos os clipes em uma única decodificação do vídeo)
+CLIP_RENDER_MODE = os.getenv("CLIP_RENDER_MODE", "seek")
+
+# Codificação paralela: threads do x264 por ffmpeg e quantos ffmpeg rodam ao mesmo tempo
+CLIP_ENCODE_THREADS = int(os.getenv("CLIP_ENCODE_THREADS", "4"))
+CLIP_ENCODE_WORKERS = int(os.getenv("CLIP_ENCODE_WORKERS", str(max(1, (os.cpu_count() or 1) // CLIP_ENCODE_THREADS))))
+# Cortar sem recodificar quando o vídeo já está no formato final; o smart cut recodifica só as bordas
+CLIP_STREAM_COPY = os.getenv("CLIP_STREAM_COPY", "1") == "1"
+CLIP_SMART_CUT = os.getenv("CLIP_SMART_CUT", "0") == "1"
+# Perfil de codificação padrão ("throughput", "balanced" ou "quality"); no modo "auto" os jobs
+# passam a usar "throughput" quando a fila (jobs em espera + em execução) chega a este tamanho
+ENCODE_PROFILE = os.getenv("ENCODE_PROFILE", "balanced")
+ENCODE_THROUGHPUT_QUEUE_DEPTH = int(os.getenv("ENCODE_THROUGHPUT_QUEUE_DEPTH", str(JOB_WORKERS + 1)))
+TITLE_WORKERS = int(os.getenv("TITLE_WORKERS", "4"))  # Chamadas individuais simultâneas quando o lote falha
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))  # Extrações de rostos simultâneas
+THUMBNAIL_SAMPLES = int(os.getenv("THUMBNAIL_SAMPLES", "24"))  # Frames amostrados (com seek) por clipe
+# Reenquadramento com rastreamento de rosto nos formatos 9:16 e 1:1 (em vez de esticar o vídeo)
+CLIP_REFRAME = os.getenv("CLIP_REFRAME", "1") == "1"
+REFRAME_SAMPLES_PER_SECOND = float(os.getenv("REFRAME_SAMPLES_PER_SECOND", "0.5"))
+REFRAME_MAX_SAMPLES = int(os.getenv("REFRAME_MAX_SAMPLES", "40"))
+# Proxy de análise (baixa resolução, poucos fps) gerado uma vez por vídeo para thumbnails e reenquadramento
+ANALYSIS_PROXY = os.getenv("ANALYSIS_PROXY", "1") == "1"
+PROXY_WIDTH = int(os.getenv("PROXY_WIDTH", "640"))
+PROXY_FPS = int(os.getenv("PROXY_FPS", "5"))
+# Ajuste das bordas dos clipes para a pausa ou troca de cena mais próxima (mapas em cache por áudio)
+BOUNDARY_SNAP = os.getenv("BOUNDARY_SNAP", "1") == "1"
+BOUNDARY_SNAP_TOLERANCE = float(os.getenv("BOUNDARY_SNAP_TOLERANCE", "1.5"))  # Segundos que uma borda pode mover
+SILENCE_MIN_SECONDS = float(os.getenv("SILENCE_MIN_SECONDS", "0.3"))
+SCENE_CUT_THRESHOLD = float(os.getenv("SCENE_CUT_THRESHOLD", "0.3"))
+BOUNDARY_MAP_VERSION = "1"
+
+# Índice persistente da biblioteca de clipes e tamanho das páginas da listagem
+CLIP_LIBRARY_DB_PATH = os.getenv("CLIP_LIBRARY_DB_PATH", os.path.join(DATA_DIR, "clips.db"))
+CLIPS_PAGE_SIZE = int(os.getenv("CLIPS_PAGE_SIZE", "24"))
+
 # Configurações do Supabase
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
@@ -53,50 +206,160 @@ def save_clip(user_id, clip_url, transcription, title):
     }).execute()
     return response.data
 
-# Função para limpar a pasta de downloads
-def clean_downloads_folder():
-    try:
-        for file in os.listdir(DOWNLOADS_DIR):
-            file_path = os.path.join(DOWNLOADS_DIR, file)
-            if os.path.isfile(file_path):
-                os.remove(file_path)
-            elif os.path.isdir(file_path):
-                shutil.rmtree(file_path)
-        print("Pasta de downloads limpa com sucesso")
-        return True
-    except Exception as e:
-        print(f"Erro ao limpar pasta de downloads: {e}")
-        return False
+# Formato padrão de download do YouTube: melhor qualidade disponível em MP4
+YOUTUBE_VIDEO_FORMAT = 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]'
+
+# Só o áudio, para começar a transcrição antes do vídeo chegar. É a mesma faixa m4a que
+# o formato de vídeo junta à imagem, então o PCM (e as chaves de cache) não mudam
+YOUTUBE_AUDIO_FORMAT = 'bestaudio[ext=m4a]/bestaudio'
+
+# Função para obter o ID de um vídeo do YouTube a partir da URL
+def get_youtube_video_id(video_url):
+    match = re.search(r"(?:v=|youtu\.be/|shorts/|embed/|live/)([A-Za-z0-9_-]{11})", video_url)
+    if match:
+        return match.group(1)
+
+    # URL em formato desconhecido: perguntar ao yt-dlp sem baixar
+    with yt_dlp.YoutubeDL({"quiet": True}) as ydl:
+        info = ydl.extract_info(video_url, download=False)
+        return info.get("id")
+
+# Chave de uma mídia do YouTube no cache: ID do vídeo + formato pedido
+def youtube_cache_key(video_id, video_format=YOUTUBE_VIDEO_FORMAT):
+    return f"{video_id}-{hashlib.sha1(video_format.encode('utf-8')).hexdigest()[:8]}"
 
 # Função para baixar vídeos do YouTube usando yt-dlp
-def download_youtube_video(video_url, output_path="downloads"):
+def download_youtube_video(video_url, video_format=YOUTUBE_VIDEO_FORMAT):
+    """
+    Baixa o vídeo usando o cache de mídia compartilhado.
+
+    Pedidos repetidos ou simultâneos do mesmo vídeo e formato reutilizam um único
+    download. O caminho retornado fica reservado até media_cache.release(caminho).
+
+    :param video_url: URL do vídeo no YouTube.
+    :param video_format: Seletor de formato do yt-dlp.
+    :return: (título, caminho) ou (None, None) em caso de erro.
+    """
     try:
-        print(f"Baixando vídeo: {video_url}")  # Log
-        ydl_opts = {
-            'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]',  # Melhor qualidade disponível
-            'outtmpl': f'{output_path}/%(title)s.%(ext)s',  # Nome do arquivo de saída
-        }
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(video_url, download=True)
-            video_title = info.get("title", "Título Indisponível")
-            video_path = ydl.prepare_filename(info)
-            print(f"Vídeo baixado: {video_path}")  # Log
-            return video_title, video_path
+        video_id = get_youtube_video_id(video_url)
+        if not video_id:
+            print(f"Não foi possível identificar o vídeo: {video_url}")
+            return None, None
+        cache_key = youtube_cache_key(video_id, video_format)
+
+        def download(target_dir):
+            print(f"Baixando vídeo: {video_url} ({video_format})")  # Log
+            ydl_opts = {
+                'format': video_format,
+                'outtmpl': f'{target_dir}/%(id)s.%(ext)s',  # Nome do arquivo de saída
+            }
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                info = ydl.extract_info(video_url, download=True)
+                video_title = info.get("title", "Título Indisponível")
+                video_path = ydl.prepare_filename(info)
+                print(f"Vídeo baixado: {video_path}")  # Log
+                return video_title, video_path
+
+        return media_cache.fetch(cache_key, download)
     except Exception as e:
         print(f"Erro ao baixar vídeo: {str(e)}")  # Log
         return None, None
 
+# Verificar se o vídeo completo já está no cache de mídia
+def youtube_video_cached(video_url):
+    try:
+        video_id = get_youtube_video_id(video_url)
+    except Exception:
+        return False
+    return bool(video_id) and media_cache.contains(youtube_cache_key(video_id))
+
+# Liberar no cache o vídeo de um download em segundo plano que terminou depois do job
+def release_video_future(future):
+    _, video_path = future.result()
+    if video_path:
+        media_cache.release(video_path)
+
+# Gerar o proxy de análise em segundo plano assim que o vídeo completo estiver disponível
+def start_proxy_build(video_future, proxy_path):
+    """
+    Encadeia a geração do proxy ao download do vídeo.
+
+    O proxy é gerado no ingest_pool quando o download termina. Cancelar o future
+    retornado (ex.: o job terminou antes) evita gerar um proxy que ninguém vai usar.
+
+    :param video_future: Future que retorna (título, caminho do vídeo).
+    :return: Future com o AnalysisProxy (ou None se o vídeo ou o proxy falharem).
+    """
+    proxy_future = Future()
+
+    def build():
+        if not proxy_future.set_running_or_notify_cancel():
+            return
+        try:
+            _, video_path = video_future.result()
+            proxy_future.set_result(build_proxy(video_path, proxy_path, PROXY_WIDTH, PROXY_FPS) if video_path else None)
+        except Exception as e:
+            proxy_future.set_exception(e)
+
+    def schedule(future):
+        if proxy_future.cancelled():
+            return
+        try:
+            ingest_pool.submit(build)
+        except RuntimeError:
+            # ingest_pool encerrado: resolver o future para ninguém ficar esperando
+            if proxy_future.set_running_or_notify_cancel():
+                proxy_future.set_result(None)
+
+    video_future.add_done_callback(schedule)
+    return proxy_future
+
+# Função para obter a mídia de um vídeo do YouTube usada na extração de áudio
+def fetch_youtube_media(video_url, reporter, timings):
+    """
+    Baixa a mídia necessária para começar a transcrição de um vídeo do YouTube.
+
+    No modo pipelined, com o vídeo fora do cache, só o áudio é baixado aqui e o
+    vídeo completo é baixado em paralelo no ingest_pool (etapa "download_video"),
+    sendo esperado apenas na geração dos clipes.
+
+    :param video_url: URL do vídeo no YouTube.
+    :param reporter: JobReporter do job.
+    :param timings: Dicionário que recebe a duração de cada download, em segundos.
+    :return: (título, caminho da mídia, future do vídeo). Sem future, a mídia já é o vídeo
+             completo; com future, é só o áudio, que deve ser liberado com media_cache.release.
+    """
+    def download(video_format, timing_key):
+        start = time.perf_counter()
+        result = download_youtube_video(video_url, video_format)
+        timings[timing_key] = round(time.perf_counter() - start, 3)
+        return result
+
+    if INGEST_MODE != "pipelined" or youtube_video_cached(video_url):
+        video_title, video_path = download(YOUTUBE_VIDEO_FORMAT, "video_download")
+        return video_title, video_path, None
+
+    reporter.start_stage("download_video", background=True)
+    video_future = ingest_pool.submit(download, YOUTUBE_VIDEO_FORMAT, "video_download")
+    video_title, audio_path = download(YOUTUBE_AUDIO_FORMAT, "audio_download")
+    if audio_path:
+        return video_title, audio_path, video_future
+
+    print("Falha ao baixar só o áudio; aguardando o vídeo completo")
+    video_title, video_path = video_future.result()
+    reporter.finish_stage("download_video")
+    return video_title, video_path, None
+
 # Função para processar um arquivo de vídeo local
-def process_local_video(file):
+def process_local_video(file, output_dir=DOWNLOADS_DIR):
     try:
         # Verificar se o arquivo é um vídeo
-        allowed_extensions = {'mp4', 'mov', 'avi', 'mkv', 'webm'}
-        if not file.filename.split('.')[-1].lower() in allowed_extensions:
+        if not file.filename.split('.')[-1].lower() in ALLOWED_VIDEO_EXTENSIONS:
             print(f"Arquivo não é um vídeo: {file.filename}")
             return None, None
         
         # Salvar o arquivo temporariamente
-        video_path = os.path.join(DOWNLOADS_DIR, file.filename)
+        video_path = os.path.join(output_dir, os.path.basename(file.filename))
         file.save(video_path)
         print(f"Vídeo salvo localmente: {video_path}")
         
@@ -106,9 +369,27 @@ def process_local_video(file):
         return None, None
 
 # Função para extrair áudio usando FFmpeg
-def extract_audio(video_path, audio_output_path="audio.mp3"):
+def extract_audio(video_path, audio_output_path="audio.mp3", mode="mp3"):
+    """
+    Extrai o áudio do vídeo.
+
+    :param video_path: Caminho do vídeo.
+    :param audio_output_path: Arquivo de saída (MP3 no modo "mp3", PCM bruto no modo "pcm_mmap").
+    :param mode: "mp3" grava um MP3 que o Whisper decodifica de novo; "pcm" e "pcm_mmap"
+                 decodificam uma única vez para PCM float32 16 kHz mono.
+    :return: Caminho do MP3 ou numpy.ndarray com o PCM, ou None em caso de erro.
+    """
     try:
-        print(f"Extraindo áudio de: {video_path}")  # Log
+        print(f"Extraindo áudio de: {video_path} (modo {mode})")  # Log
+        if mode == "pcm":
+            audio = load_pcm(video_path)
+            print(f"Áudio extraído em memória: {len(audio) / SAMPLE_RATE:.1f}s")  # Log
+            return audio
+        if mode == "pcm_mmap":
+            audio = load_pcm_mmap(video_path, audio_output_path)
+            print(f"Áudio extraído e mapeado em memória: {audio_output_path}")  # Log
+            return audio
+
         subprocess.run([
             "ffmpeg", "-i", video_path, "-q:a", "0", "-map", "a", audio_output_path
         ], check=True)
@@ -119,172 +400,63 @@ def extract_audio(video_path, audio_output_path="audio.mp3"):
         return None
 
 # Função para transcrever o áudio usando Whisper
-import torch
-import cv2
 import numpy as np
-import face_recognition
-from PIL import Image
 
-def extract_faces_from_video(video_path, num_faces=2):
-    """Extrai frames com rostos de um vídeo com expressões distintas"""
-    try:
-        # Abrir o vídeo
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            print(f"Erro ao abrir o vídeo: {video_path}")
-            return None
-
-        face_frames = []
-        frame_count = 0
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        frame_interval = max(30, total_frames // 100)  # Ajustar intervalo baseado no tamanho do vídeo
-        
-        # Dicionário para armazenar expressões faciais
-        expressions = {
-            'neutral': False,
-            'happy': False,
-            'surprised': False,
-            'angry': False
-        }
-        
-        while len(face_frames) < num_faces:
-            ret, frame = cap.read()
-            if not ret:
-                break
-                
-            # Processar a cada frame_interval frames
-            if frame_count % frame_interval == 0:
-                # Converter BGR (OpenCV) para RGB (face_recognition)
-                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                
-                # Detectar rostos e encodings
-                face_locations = face_recognition.face_locations(rgb_frame)
-                face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-                
-                for i, (top, right, bottom, left) in enumerate(face_locations):
-                    # Verificar se o rosto não está muito próximo
-                    face_height = bottom - top
-                    face_width = right - left
-                    if face_height < frame.shape[0] * 0.3 and face_width < frame.shape[1] * 0.3:
-                        # Verificar se o rosto é diferente dos já selecionados
-                        is_unique = True
-                        for existing_encoding in face_frames:
-                            if face_recognition.compare_faces([existing_encoding['encoding']], face_encodings[i])[0]:
-                                is_unique = False
-                                break
-                                
-                        if is_unique:
-                            # Detectar expressão facial
-                            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-                            faces = face_cascade.detectMultiScale(gray, 1.1, 4)
-                            
-                            for (x, y, w, h) in faces:
-                                # Analisar expressão facial
-                                roi_gray = gray[y:y+h, x:x+w]
-                                roi_color = frame[y:y+h, x:x+w]
-                                
-                                # Detectar sorriso
-                                smile = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_smile.xml')
-                                smiles = smile.detectMultiScale(roi_gray, 1.8, 20)
-                                
-                                # Detectar olhos abertos
-                                eye = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
-                                eyes = eye.detectMultiScale(roi_gray, 1.1, 4)
-                                
-                                # Classificar expressão
-                                if len(smiles) > 0:
-                                    expression = 'happy'
-                                elif len(eyes) == 0:
-                                    expression = 'angry'
-                                elif len(eyes) > 1:
-                                    expression = 'surprised'
-                                else:
-                                    expression = 'neutral'
-                                
-                                # Selecionar rosto se a expressão for nova
-                                if not expressions[expression]:
-                                    # Adicionar margem de 20% ao redor do rosto
-                                    margin = int(max(face_height, face_width) * 0.2)
-                                    top = max(0, top - margin)
-                                    bottom = min(frame.shape[0], bottom + margin)
-                                    left = max(0, left - margin)
-                                    right = min(frame.shape[1], right + margin)
-                                    
-                                    # Recortar e armazenar o frame com o encoding
-                                    face_frame = {
-                                        'frame': frame[top:bottom, left:right],
-                                        'encoding': face_encodings[i],
-                                        'expression': expression
-                                    }
-                                    face_frames.append(face_frame)
-                                    expressions[expression] = True
-                                    break
-                                    
-            frame_count += 1
-            
-            # Se todas as expressões foram capturadas, parar
-            if all(expressions.values()):
-                break
-                
-        cap.release()
-        return face_frames
-        
-    except Exception as e:
-        print(f"Erro ao extrair rostos do vídeo: {e}")
-        return None
+def transcribe_audio(audio_path, model_size=None, on_progress=None):
+    """
+    Transcreve o áudio mantendo os segmentos com timestamps.
 
-def create_thumbnail(face_frames, output_path, thumbnail_height=300):
-    """Cria uma thumbnail a partir dos frames com rostos"""
-    try:
-        if not face_frames or len(face_frames) < 2:
-            return False
-            
-        # Redimensionar as imagens para mesma altura mantendo proporção
-        resized_frames = []
-        for face_frame in face_frames:
-            frame = face_frame['frame']
-            height, width = frame.shape[:2]
-            aspect_ratio = width / height
-            new_width = int(thumbnail_height * aspect_ratio)
-            resized_frame = cv2.resize(frame, (new_width, thumbnail_height))
-            resized_frames.append(resized_frame)
-            
-        # Combinar as imagens horizontalmente
-        thumbnail = np.hstack(resized_frames)
-        
-        # Salvar a thumbnail
-        cv2.imwrite(output_path, thumbnail)
-        return True
-        
-    except Exception as e:
-        print(f"Erro ao criar thumbnail: {e}")
-        return False
+    Áudios PCM longos são divididos nos silêncios e transcritos em paralelo em
+    TRANSCRIBE_WORKERS processos; os demais usam o modelo compartilhado do processo.
 
-def transcribe_audio(audio_path):
+    :param audio_path: Caminho do arquivo de áudio ou array PCM 16 kHz.
+    :param model_size: Tamanho do modelo Whisper (padrão WHISPER_MODEL).
+    :param on_progress: Função opcional chamada com a fração já transcrita.
+    :return: Transcription (str com `.segments`) ou None em caso de erro.
+    """
+    model_size = model_size or WHISPER_MODEL
     try:
-        print(f"Transcrevendo áudio: {audio_path}")  # Log
-        
-        # Verify audio file exists and is not empty
-        if not os.path.exists(audio_path) or os.path.getsize(audio_path) == 0:
-            print(f"Arquivo de áudio inválido ou vazio: {audio_path}")
-            return None
-
-        # Determine the device to use
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        print(f"Usando dispositivo: {device}")
+        # O áudio pode ser um caminho de arquivo ou um array PCM já decodificado
+        if isinstance(audio_path, np.ndarray):
+            print(f"Transcrevendo áudio PCM: {len(audio_path) / SAMPLE_RATE:.1f}s")  # Log
+            if audio_path.size == 0:
+                print("Áudio PCM vazio")
+                return None
+        else:
+            print(f"Transcrevendo áudio: {audio_path}")  # Log
+
+            # Verify audio file exists and is not empty
+            if not os.path.exists(audio_path) or os.path.getsize(audio_path) == 0:
+                print(f"Arquivo de áudio inválido ou vazio: {audio_path}")
+                return None
+
+        use_parallel = (
+            isinstance(audio_path, np.ndarray)
+            and TRANSCRIBE_WORKERS > 1
+            and whisper_models.device == "cpu"
+            and len(audio_path) > 1.5 * TRANSCRIBE_CHUNK_SECONDS * SAMPLE_RATE
+        )
 
-        # Load the Whisper model
-        model = whisper.load_model("base", device=device)
-        
-        # Transcribe with detailed error handling
-        result = model.transcribe(audio_path)
-        
-        if not result or "text" not in result:
-            print("Transcrição falhou: resultado inválido do Whisper")
-            return None
+        if use_parallel:
+            # Vídeo longo: trechos divididos nos silêncios, um modelo por processo
+            transcription = transcribe_parallel(
+                audio_path, model_size, TRANSCRIBE_WORKERS,
+                chunk_seconds=TRANSCRIBE_CHUNK_SECONDS, on_progress=on_progress
+            )
+        else:
+            # Reutilizar o modelo já carregado pelo processo
+            model = whisper_models.get(model_size)
+            print(f"Usando modelo Whisper '{model_size}' em {whisper_models.device}")
+            
+            # Transcribe with detailed error handling (um job por vez em cada modelo)
+            with whisper_models.lock(model_size):
+                result = model.transcribe(audio_path)
             
-        transcription = result["text"]
+            if not result or "text" not in result:
+                print("Transcrição falhou: resultado inválido do Whisper")
+                return None
+                
+            transcription = Transcription.from_whisper_result(result)
         
         if not transcription or len(transcription.strip()) == 0:
             print("Transcrição falhou: texto vazio")
@@ -300,10 +472,258 @@ def transcribe_audio(audio_path):
         return None
 
 # Função para analisar a transcrição com a Gemini API usando google-generativeai
-def analyze_transcription(transcription):
-    api_key = os.getenv("GEMINI_API_KEY")  # Buscar a chave de API do .env
-    if not api_key:
-        print("Erro: Chave de API da Gemini não encontrada.")
+# Momento de clipe identificado pela análise (tempos em segundos)
+AnalysisSegment = namedtuple("AnalysisSegment", ["category", "start_seconds", "end_seconds", "description", "highlight"])
+
+# Schema JSON pedido à Gemini para cada momento da análise
+class ClipMoment(TypedDict):
+    category: str
+    start: str
+    end: str
+    description: str
+    highlight: str
+
+ANALYSIS_GENERATION_CONFIG = genai.GenerationConfig(
+    response_mime_type="application/json",
+    response_schema=list[ClipMoment]
+)
+
+# Contadores de como as análises foram lidas (JSON estruturado ou fallback por regex)
+analysis_parse_stats = {"json": 0, "regex_fallback": 0, "empty": 0}
+analysis_parse_stats_lock = threading.Lock()
+
+# Função para converter "HH:MM:SS" (ou "MM:SS") em segundos
+def parse_timestamp(value):
+    if isinstance(value, (int, float)):
+        return value
+    match = re.fullmatch(r"\s*(?:(\d{1,2}):)?(\d{1,2}):(\d{2}(?:\.\d+)?)\s*", str(value or ""))
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    total = int(hours or 0) * 3600 + int(minutes) * 60 + float(seconds)
+    return int(total) if total.is_integer() else total
+
+# Função para ler o JSON da análise
+def load_analysis_json(analysis):
+    """Retorna a lista de momentos do JSON da análise, ou None se o texto não for um JSON válido."""
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", (analysis or "").strip())
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    if isinstance(data, dict):
+        data = data.get("clips") or data.get("moments")
+    if not isinstance(data, list):
+        return None
+    return [moment for moment in data if isinstance(moment, dict)]
+
+# Fallback para análises em texto livre (Category/Timestamp/Description/Highlight)
+def parse_analysis_text(analysis):
+    """Lê análises em texto livre em uma única passada pelas linhas, em inglês ou português."""
+    timestamp_pattern = r"(\d{1,2}:\d{2}:\d{2})\s*-\s*(\d{1,2}:\d{2}:\d{2})"
+    segments = []
+    current = None
+    pending_category = ""
+    for raw_line in analysis.splitlines():
+        line = raw_line.strip().lstrip("-*• ").replace("**", "")
+        label, _, value = line.partition(":")
+        label = label.strip().lower()
+        value = value.strip()
+        if label in ("category", "categoria"):
+            pending_category = value
+            current = None
+        elif label == "timestamp":
+            match = re.search(timestamp_pattern, value)
+            if match:
+                current = {
+                    "category": pending_category,
+                    "start_seconds": parse_timestamp(match.group(1)),
+                    "end_seconds": parse_timestamp(match.group(2)),
+                    "description": "",
+                    "highlight": ""
+                }
+                segments.append(current)
+                pending_category = ""
+        elif label in ("description", "descrição") and current:
+            current["description"] = value
+        elif label in ("highlight", "trecho de destaque") and current:
+            current["highlight"] = value.strip('[]"“” ')
+
+    # Formato alternativo: apenas intervalos de tempo soltos no texto
+    if not segments:
+        for start_time, end_time in re.findall(timestamp_pattern, analysis):
+            segments.append({
+                "category": "", "start_seconds": parse_timestamp(start_time),
+                "end_seconds": parse_timestamp(end_time), "description": "", "highlight": ""
+            })
+    return [AnalysisSegment(**segment) for segment in segments]
+
+# Função para ler a análise em registros tipados
+def parse_analysis(analysis):
+    """
+    Converte a análise em uma lista de AnalysisSegment.
+
+    O formato esperado é o JSON estruturado; análises em texto livre (respostas
+    antigas ou fora do schema) passam pelo fallback por regex, contado em
+    analysis_parse_stats.
+    """
+    moments = load_analysis_json(analysis)
+    if moments is not None:
+        segments = []
+        for moment in moments:
+            start_seconds = parse_timestamp(moment.get("start"))
+            end_seconds = parse_timestamp(moment.get("end"))
+            if start_seconds is None or end_seconds is None:
+                print(f"Momento com timestamp inválido ignorado: {moment}")
+                continue
+            segments.append(AnalysisSegment(
+                category=str(moment.get("category") or "").strip(),
+                start_seconds=start_seconds,
+                end_seconds=end_seconds,
+                description=str(moment.get("description") or "").strip(),
+                highlight=str(moment.get("highlight") or "").strip().strip('"')
+            ))
+        if segments:
+            with analysis_parse_stats_lock:
+                analysis_parse_stats["json"] += 1
+            return segments
+
+    segments = parse_analysis_text(analysis or "")
+    with analysis_parse_stats_lock:
+        analysis_parse_stats["regex_fallback" if segments else "empty"] += 1
+    print(f"Aviso: análise lida pelo fallback de regex ({len(segments)} momento(s))")
+    return segments
+
+def format_timestamp(seconds):
+    """Formata segundos como HH:MM:SS."""
+    seconds = int(seconds)
+    return f"{seconds // 3600:02}:{(seconds % 3600) // 60:02}:{seconds % 60:02}"
+
+# Função para formatar a transcrição com os timestamps de cada segmento
+def format_timestamped_transcription(segments):
+    return "\n".join(f"[{format_timestamp(segment.start)}] {segment.text}" for segment in segments)
+
+# Função para dividir os segmentos da transcrição em janelas de tempo
+def split_transcription_windows(segments, window_seconds):
+    windows = []
+    current = []
+    window_end = window_seconds
+    for segment in segments:
+        if current and segment.start >= window_end:
+            windows.append(current)
+            current = []
+            while segment.start >= window_end:
+                window_end += window_seconds
+        current.append(segment)
+    if current:
+        windows.append(current)
+    return windows
+
+# Análise map-reduce: janelas analisadas em paralelo e um ranking global no final
+def analyze_transcription_windows(client, transcription, timings=None):
+    """
+    Analisa transcrições longas por janelas de tempo.
+
+    Cada janela (ANALYSIS_WINDOW_SECONDS) é analisada em paralelo, com no máximo
+    ANALYSIS_WORKERS chamadas simultâneas, gerando momentos candidatos. Em seguida
+    uma etapa de redução ordena todos os candidatos e escolhe a lista final.
+
+    :param client: GeminiClient compartilhado.
+    :param transcription: Transcription com `.segments`.
+    :param timings: Dicionário opcional preenchido com as latências por janela.
+    :return: Array JSON (texto) com os momentos, no mesmo formato da análise direta.
+    """
+    windows = split_transcription_windows(transcription.segments, ANALYSIS_WINDOW_SECONDS)
+    print(f"Análise map-reduce: {len(windows)} janela(s) de até {ANALYSIS_WINDOW_SECONDS}s")
+    timings = timings if timings is not None else {}
+    timings["windows"] = []
+    start = time.perf_counter()
+
+    def analyze_window(index, window):
+        window_start = time.perf_counter()
+        prompt = f"""You are an assistant specialized in video engagement. Below is an excerpt ({index + 1} of {len(windows)}) of a long video transcription, from {format_timestamp(window[0].start)} to {format_timestamp(window[-1].end)}. Each line starts with its absolute timestamp in the video.
+
+Identify the 1 to 3 best moments for short clips in this excerpt: emotional and impactful moments, funny and viral moments, valuable information and useful insights, tense or surprising moments, catchphrases and powerful hooks. Use the absolute timestamps shown in the transcription.
+
+Return a JSON array with one object per moment, with the fields "category", "start" (HH:MM:SS), "end" (HH:MM:SS), "description" and "highlight" (most striking phrase or dialogue).
+
+**Transcription excerpt:**
+{format_timestamped_transcription(window)}
+"""
+        text = client.generate(prompt, generation_config=ANALYSIS_GENERATION_CONFIG, name="analysis_window")
+        return load_analysis_json(text) or [], time.perf_counter() - window_start
+
+    candidates = [[] for _ in windows]
+    first_candidate_seconds = None
+    with ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS) as pool:
+        futures = {pool.submit(analyze_window, index, window): index for index, window in enumerate(windows)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                moments, latency = future.result()
+            except Exception as e:
+                print(f"Erro ao analisar janela {index + 1}: {e}")
+                continue
+            candidates[index] = moments
+            found = len(moments)
+            if found and first_candidate_seconds is None:
+                first_candidate_seconds = time.perf_counter() - start
+            timings["windows"].append({"window": index + 1, "latency_seconds": round(latency, 3), "candidates": found})
+            print(f"Janela {index + 1}/{len(windows)} analisada em {latency:.2f}s ({found} candidato(s))")
+
+    timings["windows"].sort(key=lambda window: window["window"])
+    timings["time_to_first_candidate_seconds"] = round(first_candidate_seconds, 3) if first_candidate_seconds is not None else None
+    all_candidates = [moment for moments in candidates for moment in moments]
+    candidates_text = json.dumps(all_candidates, ensure_ascii=False, indent=1)
+    if not all_candidates:
+        print("Erro: Nenhuma janela retornou candidatos")
+        return None
+
+    # Redução: ranking global dos candidatos
+    reduce_start = time.perf_counter()
+    prompt = f"""You are an assistant specialized in video engagement. The moments below are candidate clips found across a long video ({format_timestamp(transcription.segments[-1].end)} total). Rank them globally and select the best ones for the final clip list.
+
+### Selection Criteria:
+- Prefer emotional, funny, surprising or highly informative moments and powerful hooks
+- Keep the clips distributed throughout the video and covering different aspects of the content
+- Long videos (>60 min): 5-10 clips; medium videos (30-60 min): 3-5 clips
+- Keep the original timestamps of each selected candidate; never return an empty response
+
+### **Response Format:**
+Return a JSON array with the selected moments in ranking order, with the same fields as the candidates ("category", "start", "end", "description", "highlight").
+
+**Candidate moments (JSON):**
+{candidates_text}
+"""
+    try:
+        text = client.generate(prompt, generation_config=ANALYSIS_GENERATION_CONFIG, name="analysis_reduce")
+    except Exception as e:
+        print(f"Erro na redução da análise: {e}")
+        text = None
+    timings["reduce_seconds"] = round(time.perf_counter() - reduce_start, 3)
+    timings["total_seconds"] = round(time.perf_counter() - start, 3)
+    print(f"Análise map-reduce concluída em {timings['total_seconds']:.2f}s "
+          f"(primeiro candidato em {timings['time_to_first_candidate_seconds']}s, redução em {timings['reduce_seconds']:.2f}s)")
+
+    if not text or load_analysis_json(text) is None:
+        # Sem o ranking global, usar os candidatos das janelas diretamente
+        print("Erro: Resposta inválida da Gemini API na redução, usando candidatos das janelas")
+        return candidates_text
+    return text
+
+def analyze_transcription(transcription, timings=None):
+    """
+    Analisa a transcrição com a Gemini e retorna os melhores momentos para clipes.
+
+    Transcrições com timestamps mais longas que 1,5 janela usam a análise
+    map-reduce por janelas; as demais são analisadas em uma única chamada.
+
+    :param transcription: Transcrição (Transcription com `.segments` ou texto simples).
+    :param timings: Dicionário opcional preenchido com as latências da análise.
+    :return: Array JSON (texto) com os momentos ou None em caso de erro.
+    """
+    client = get_gemini_client()
+    if not client:
         return None
     
     try:
@@ -312,9 +732,19 @@ def analyze_transcription(transcription):
             print("Erro: Transcrição vazia ou inválida")
             return None
 
-        # Configurar a Gemini API
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-1.5-flash')
+        # Transcrições longas com timestamps: análise hierárquica por janelas
+        segments = getattr(transcription, "segments", None)
+        if segments and segments[-1].end > 1.5 * ANALYSIS_WINDOW_SECONDS:
+            analysis = analyze_transcription_windows(client, transcription, timings)
+            if not analysis or len(analysis.strip()) == 0:
+                print("Erro: Análise vazia")
+                return None
+            print(f"Análise concluída: {analysis[:100]}...")  # Log
+            return analysis
+
+        # Com segmentos, a transcrição vai com os timestamps de cada trecho
+        transcription_text = format_timestamped_transcription(segments) if segments else transcription
+        analysis_start = time.perf_counter()
         
         # Prompt otimizado para vídeos longos
         prompt = f"""Você é um assistente especializado em análise de vídeos longos e engajamento. Sua tarefa is to analyze the transcription systematically and identify the best moments for clips, ensuring multiple relevant clips are generated.
@@ -348,27 +778,23 @@ def analyze_transcription(transcription):
 - Never return an empty response  
 
 ### **Response Format:**  
-For each identified moment, return in the following format:
-
-Category: [Category Name]
-Timestamp: [HH:MM:SS - HH:MM:SS]
-Description: [Concise summary of the moment]
-Highlight: ["Most striking phrase or dialogue from the segment"]
+Return a JSON array with one object per identified moment, with the fields:
+- "category": category name
+- "start": start timestamp (HH:MM:SS)
+- "end": end timestamp (HH:MM:SS)
+- "description": concise summary of the moment
+- "highlight": most striking phrase or dialogue from the segment
 
 **Video Transcription:**  
-{transcription}
+{transcription_text}
 
 Please systematically analyze the transcription and provide the best moments distributed throughout the video. **Ensure there are multiple relevant clips, especially for long videos.**
         """
         
-        # Generate response with error handling
-        response = model.generate_content(prompt)
-        
-        if not response or not response.text:
-            print("Erro: Resposta inválida da Gemini API")
-            return None
-            
-        analysis = response.text
+        # Generate response with error handling (JSON restrito ao schema dos momentos)
+        analysis = client.generate(prompt, generation_config=ANALYSIS_GENERATION_CONFIG, name="analysis")
+        if timings is not None:
+            timings["total_seconds"] = round(time.perf_counter() - analysis_start, 3)
         
         if not analysis or len(analysis.strip()) == 0:
             print("Erro: Análise vazia")
@@ -396,9 +822,8 @@ def generate_optimized_title(transcription, category, clip_index, total_clips, d
     :param highlight: Trecho de destaque do clipe (opcional).
     :return: Título otimizado para o clipe.
     """
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        print("Erro: Chave de API da Gemini não encontrada.")
+    client = get_gemini_client()
+    if not client:
         return None
     
     try:
@@ -412,10 +837,6 @@ def generate_optimized_title(transcription, category, clip_index, total_clips, d
         if len(transcription) > max_transcription_length:
             transcription = transcription[:max_transcription_length] + "..."
 
-        # Configurar a Gemini API
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
         # Construir contexto adicional baseado em metadados disponíveis
         context = ""
         if category:
@@ -449,13 +870,7 @@ Por favor, retorne APENAS o título sugerido, sem explicações ou comentários
 """
         
         # Generate response with error handling
-        response = model.generate_content(prompt)
-        
-        if not response or not response.text:
-            print("Erro: Resposta inválida da Gemini API")
-            return None
-            
-        title = response.text.strip()
+        title = client.generate(prompt, name="title").strip()
         
         # Remove aspas, se houver
         title = title.strip('"\'')
@@ -474,6 +889,98 @@ Por favor, retorne APENAS o título sugerido, sem explicações ou comentários
         return None
 
 
+# Função para gerar os títulos de todos os clipes de um vídeo em uma única chamada
+def generate_optimized_titles(clips_context):
+    """
+    Gera títulos otimizados para vários clipes do mesmo vídeo em uma única chamada à Gemini.
+
+    :param clips_context: Lista de dicionários com transcription, category, description e highlight.
+    :return: Lista de títulos na mesma ordem (None nas posições que não puderam ser lidas),
+             ou None se a chamada ou o parse da resposta falhar.
+    """
+    client = get_gemini_client()
+    if not client:
+        return None
+
+    if not clips_context:
+        return []
+
+    try:
+        # Limitar transcrição de cada clipe para otimizar o prompt
+        max_transcription_length = 1500
+        clips_text = ""
+        for index, context in enumerate(clips_context):
+            transcription = context.get("transcription") or ""
+            if len(transcription) > max_transcription_length:
+                transcription = transcription[:max_transcription_length] + "..."
+            clips_text += f"\n### Clipe {index + 1}\n"
+            if context.get("category"):
+                clips_text += f"Categoria do clipe: {context['category']}.\n"
+            if context.get("description"):
+                clips_text += f"Descrição do conteúdo: {context['description']}.\n"
+            if context.get("highlight"):
+                clips_text += f"Trecho de destaque: \"{context['highlight']}\".\n"
+            clips_text += f"Transcrição:\n{transcription}\n"
+
+        # Prompt otimizado para geração de títulos em lote
+        prompt = f"""Crie um título ÚNICO (fala o título em inglês) extremamente chamativo para CADA um dos {len(clips_context)} clipes abaixo, todos do mesmo vídeo, otimizado para cliques e engajamento no YouTube. Cada título deve:
+
+1. Ser curto e direto (máximo de 50 caracteres, se possível).
+2. Gerar curiosidade e incentivar o clique.
+3. Usar palavras de alto impacto (exemplos: "GENIAL", "PROIBIDO", "MILIONÁRIO", "INACREDITÁVEL", "BLOQUEADO", etc.).
+4. Se conectar com a thumbnail e reforçar a emoção da cena.
+5. Se possível, incluir números para tornar o título mais atrativo.
+6. Se basear na essência exata do trecho específico daquele clipe.
+7. NÃO usar underscores ou caracteres especiais para separar palavras.
+8. Ser DIFERENTE dos títulos dos outros clipes.
+{clips_text}
+Retorne APENAS um array JSON com um objeto por clipe, na mesma ordem, no formato:
+[{{"clip": 1, "title": "..."}}, {{"clip": 2, "title": "..."}}]
+NÃO use aspas dentro dos títulos.
+"""
+
+        text = client.generate(
+            prompt,
+            generation_config=genai.GenerationConfig(response_mime_type="application/json"),
+            name="titles"
+        )
+
+        # Remover cercas de código, se houver, e ler o JSON
+        text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text.strip())
+        items = json.loads(text)
+        if not isinstance(items, list):
+            print("Erro: Resposta de títulos em lote não é uma lista")
+            return None
+
+        titles = [None] * len(clips_context)
+        for position, item in enumerate(items):
+            if isinstance(item, dict):
+                index = item.get("clip", position + 1)
+                title = item.get("title")
+            else:
+                index, title = position + 1, item
+            try:
+                index = int(index) - 1
+            except (TypeError, ValueError):
+                continue
+            if not isinstance(title, str) or not 0 <= index < len(titles):
+                continue
+
+            # Remove aspas, se houver, e limita o tamanho do título
+            title = title.strip().strip('"\'')[:100]
+            if title:
+                titles[index] = title
+
+        print(f"Títulos gerados em lote: {titles}")
+        return titles
+
+    except Exception as e:
+        print(f"Erro ao gerar títulos em lote com a Gemini API: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+
 def get_video_duration(video_path):
     """
     Obtém a duração total do vídeo em segundos.
@@ -493,16 +1000,182 @@ def get_video_duration(video_path):
         print(f"Erro ao obter duração do vídeo: {str(e)}")
         return None
 
+# Função para obter a transcrição de um intervalo do vídeo
+def get_clip_transcription(full_transcription, start_seconds, end_seconds, fallback):
+    """
+    Junta os segmentos da transcrição contidos no intervalo do clipe.
+
+    :param full_transcription: Transcrição completa (com `.segments` quando disponível).
+    :param fallback: Texto usado quando não há segmentos com timestamps.
+    :return: Transcrição do clipe; a transcrição completa se o resultado for curto demais.
+    """
+    try:
+        # Se tivermos a transcrição completa com timestamps (formato avançado do Whisper)
+        if hasattr(full_transcription, 'segments'):
+            words_with_timestamps = []
+            for transcript_segment in full_transcription.segments:
+                if transcript_segment.start >= start_seconds and transcript_segment.end <= end_seconds:
+                    words_with_timestamps.append(transcript_segment.text)
+            clip_transcription = " ".join(words_with_timestamps)
+        else:
+            clip_transcription = fallback
+
+        if not clip_transcription or len(clip_transcription) < 10:
+            # Se a transcrição específica não for adequada, usar o texto completo
+            clip_transcription = full_transcription
+        return clip_transcription
+    except Exception as e:
+        print(f"Erro ao extrair transcrição para o clipe: {e}")
+        return full_transcription
+
+# Função para gerar os títulos dos clipes (com fallbacks quando a Gemini falha)
+def build_clip_titles(planned_clips, total_clips, full_transcription):
+    """
+    Gera os títulos de todos os clipes com uma única chamada em lote.
+
+    Só os clipes cujo título não pôde ser lido da resposta em lote recebem uma
+    chamada individual; se mesmo assim não houver título, usa o trecho de destaque,
+    a descrição ou a categoria.
+
+    :param planned_clips: Clipes planejados (com segment, index, start_seconds e end_seconds).
+    :param total_clips: Total de segmentos encontrados na análise.
+    :param full_transcription: Transcrição completa do vídeo.
+    :return: Lista de títulos na ordem dos clipes.
+    """
+    # Transcrição usada para gerar cada título (fallback: transcrição completa)
+    contexts = []
+    for clip in planned_clips:
+        segment = clip["segment"]
+        contexts.append({
+            "transcription": get_clip_transcription(
+                full_transcription, clip["start_seconds"], clip["end_seconds"], full_transcription
+            ),
+            "category": segment.get("categoria", ""),
+            "description": segment.get("descricao", ""),
+            "highlight": segment.get("trecho_destaque", "")
+        })
+
+    titles = generate_optimized_titles(contexts) or [None] * len(planned_clips)
+
+    # Chamadas individuais apenas para os títulos que faltaram na resposta em lote
+    missing = [n for n, title in enumerate(titles) if not title]
+    if missing:
+        print(f"Gerando {len(missing)} título(s) individualmente")
+        with ThreadPoolExecutor(max_workers=TITLE_WORKERS) as pool:
+            futures = {
+                pool.submit(
+                    generate_optimized_title,
+                    contexts[n]["transcription"],
+                    contexts[n]["category"],
+                    planned_clips[n]["index"],  # índice do clipe atual
+                    total_clips,  # total de clipes sendo gerados
+                    contexts[n]["description"],
+                    contexts[n]["highlight"]
+                ): n
+                for n in missing
+            }
+            for future in as_completed(futures):
+                titles[futures[future]] = future.result()
+
+    # Usar o título otimizado ou fallback para títulos padrão
+    clip_titles = []
+    for clip, optimized_title in zip(planned_clips, titles):
+        segment = clip["segment"]
+        clip_title = optimized_title if optimized_title else segment.get("trecho_destaque", "")
+        if not clip_title or len(clip_title.strip()) < 3:
+            if segment.get("descricao"):
+                clip_title = segment["descricao"]
+            else:
+                clip_title = segment.get("categoria", f"Momento Interessante {clip['index'] + 1}")
+        clip_titles.append(clip_title)
+    return clip_titles
+
+# Medições de codificação por perfil (só clipes recodificados por inteiro)
+encode_profile_stats = {}
+encode_profile_stats_lock = threading.Lock()
+
+# Função para registrar a velocidade de codificação e o bitrate de saída de um perfil
+def record_encode_stats(profile, clips, encode_seconds):
+    """
+    Registra uma codificação (um clipe ou vários na passada única) nas estatísticas do perfil.
+
+    :param clips: Clipes planejados codificados juntos neste tempo (com encoded_frames medido pelo ffmpeg).
+    :return: Dicionário com encode_fps e bitrate_kbps medidos.
+    """
+    media_seconds = sum(clip["end_seconds"] - clip["start_seconds"] for clip in clips)
+    output_bytes = sum(os.path.getsize(clip["output_path"]) for clip in clips if os.path.exists(clip["output_path"]))
+    measured = [clip.get("encoded_frames") for clip in clips]
+    frames = sum(measured) if all(measured) else None
+    with encode_profile_stats_lock:
+        stats = encode_profile_stats.setdefault(
+            profile, {"clips": 0, "encode_seconds": 0.0, "media_seconds": 0.0, "frames": 0,
+                      "frames_encode_seconds": 0.0, "output_bytes": 0}
+        )
+        stats["clips"] += len(clips)
+        stats["encode_seconds"] += encode_seconds
+        stats["media_seconds"] += media_seconds
+        stats["output_bytes"] += output_bytes
+        # Sem a contagem de frames, a codificação não entra no fps médio
+        if frames:
+            stats["frames"] += frames
+            stats["frames_encode_seconds"] += encode_seconds
+    return {
+        "encode_fps": round(frames / encode_seconds, 1) if frames and encode_seconds > 0 else None,
+        "bitrate_kbps": round(output_bytes * 8 / media_seconds / 1000) if media_seconds > 0 else None
+    }
+
+# Resumo das estatísticas de codificação por perfil para /metrics
+def encode_stats_summary():
+    with encode_profile_stats_lock:
+        summary = {}
+        for profile, stats in encode_profile_stats.items():
+            summary[profile] = {
+                "clips": stats["clips"],
+                "encode_seconds": round(stats["encode_seconds"], 2),
+                "media_seconds": round(stats["media_seconds"], 2),
+                "encode_fps": round(stats["frames"] / stats["frames_encode_seconds"], 1) if stats["frames_encode_seconds"] else None,
+                "realtime_factor": round(stats["media_seconds"] / stats["encode_seconds"], 2) if stats["encode_seconds"] else None,
+                "bitrate_kbps": round(stats["output_bytes"] * 8 / stats["media_seconds"] / 1000) if stats["media_seconds"] else None
+            }
+        return summary
+
+# Função para escolher o perfil de codificação de um job
+def resolve_encode_profile(requested="auto"):
+    """
+    Retorna o perfil pedido ou, no modo "auto", o perfil padrão, trocado por
+    "throughput" quando a fila está saturada (ENCODE_THROUGHPUT_QUEUE_DEPTH).
+    """
+    if requested in ENCODE_PROFILES:
+        return requested
+    if job_queue.queue_depth() >= ENCODE_THROUGHPUT_QUEUE_DEPTH:
+        print("Fila saturada: usando o perfil de codificação 'throughput'")
+        return "throughput"
+    return ENCODE_PROFILE if ENCODE_PROFILE in ENCODE_PROFILES else "balanced"
+
+# Categorias priorizadas na ordem dos clipes (nomes do prompt em inglês e em português)
+PRIORITY_CATEGORIES = {
+    "Valuable Information and Useful Insights",
+    "Emotional and Impactful Moments",
+    "Informações Valiosas e Insights Úteis",
+    "Momentos Emocionantes e Impactantes"
+}
+
 # Função para gerar clipes com base nos timestamps
-def generate_clips(video_path, analysis, clip_format, clip_duration, full_transcription):
+def generate_clips(video_path, analysis, clip_format, clip_duration, full_transcription, encode_profile="balanced",
+                   proxy=None, boundaries=None, work_dir=None):
     """
     Gera clipes com base nos timestamps identificados na análise, respeitando o formato e a duração escolhidos.
     
     :param video_path: Caminho do vídeo original.
-    :param analysis: Texto da análise contendo os timestamps.
+    :param analysis: Análise em JSON (ou texto livre, lido pelo fallback) contendo os timestamps.
     :param clip_format: Formato do clipe ("9:16", "1:1", "16:9").
     :param clip_duration: Duração do clipe ("short", "medium", "long").
     :param full_transcription: Transcrição completa do vídeo.
+    :param encode_profile: Perfil de codificação ("throughput", "balanced" ou "quality").
+    :param proxy: AnalysisProxy do vídeo; se informado, thumbnails e reenquadramento são calculados nele.
+    :param boundaries: BoundarySnapper opcional para levar as bordas às pausas e trocas de cena.
+    :param work_dir: Pasta onde os clipes são codificados antes de irem para static/clips
+                     (padrão: downloads/clips).
     :return: Lista de dicionários contendo informações dos clipes gerados.
     """
     clips_info = []
@@ -532,32 +1205,24 @@ def generate_clips(video_path, analysis, clip_format, clip_duration, full_transc
     }
     min_duration, max_duration = duration_mapping.get(clip_duration, (180, 300))  # Padrão para 3-5 minutos
 
-    # Extrair timestamps da análise (formato mais flexível)
-    pattern = r"Timestamp:\s*(\d{1,2}:\d{2}:\d{2})\s*-\s*(\d{1,2}:\d{2}:\d{2})"
-    matches = re.findall(pattern, analysis)
-    print(f"Timestamps encontrados (regex): {matches}")  # Log dos timestamps encontrados
-
-    # Tentar um formato alternativo caso o primeiro não funcione
-    if not matches:
-        pattern = r"(\d{1,2}:\d{2}:\d{2})\s*-\s*(\d{1,2}:\d{2}:\d{2})"
-        matches = re.findall(pattern, analysis)
-        print(f"Timestamps encontrados (alternativo): {matches}")
+    # Ler os momentos da análise uma única vez (JSON estruturado, com fallback por regex)
+    moments = parse_analysis(analysis)
+    print(f"Momentos encontrados na análise: {len(moments)}")  # Log dos momentos encontrados
 
     # Lista para armazenar os clipes com suas informações
     clip_segments = []
 
-    for i, (start_time, end_time) in enumerate(matches):
+    for i, moment in enumerate(moments):
         try:
-            # Converter timestamps para segundos
-            start_seconds = sum(int(x) * 60 ** (2 - i) for i, x in enumerate(start_time.split(":")))
-            end_seconds = sum(int(x) * 60 ** (2 - i) for i, x in enumerate(end_time.split(":")))
+            start_seconds = moment.start_seconds
+            end_seconds = moment.end_seconds
 
-            print(f"Start time: {start_time}, Start seconds: {start_seconds}")  # Log
-            print(f"End time: {end_time}, End seconds: {end_seconds}")  # Log
+            print(f"Start time: {format_timestamp(start_seconds)}, Start seconds: {start_seconds}")  # Log
+            print(f"End time: {format_timestamp(end_seconds)}, End seconds: {end_seconds}")  # Log
 
             # Validar timestamps
             if start_seconds >= end_seconds or start_seconds >= total_duration:
-                print(f"Timestamp inválido: start={start_time}, end={end_time}")
+                print(f"Timestamp inválido: start={format_timestamp(start_seconds)}, end={format_timestamp(end_seconds)}")
                 continue
 
             # Ajustar o clipe para respeitar a duração máxima
@@ -573,53 +1238,20 @@ def generate_clips(video_path, analysis, clip_format, clip_duration, full_transc
             if end_seconds > total_duration:
                 end_seconds = total_duration
                 start_seconds = max(0, end_seconds - min_duration) # Ajustar start_seconds se necessário
-                
-            clip_length = end_seconds - start_seconds
-
-            # Formatar os timestamps corretamente
-            start_time_formatted = f"{int(start_seconds // 3600):02}:{int((start_seconds % 3600) // 60):02}:{int(start_seconds % 60):02}"
-            end_time_formatted = f"{int(end_seconds // 3600):02}:{int((end_seconds % 3600) // 60):02}:{int(end_seconds % 60):02}"
 
-            # Extrair dados para criar títulos e descrições
-            categoria = ""
-            descricao = ""
-            trecho_destaque = ""
-            try:
-                # Pesquisar o contexto antes do timestamp atual
-                current_section = analysis.split(f"Timestamp: {start_time} - {end_time}")[0]
-                last_category_index = current_section.rfind("Categoria:")
-                if last_category_index != -1:
-                    section_context = current_section[last_category_index:]
-                    
-                    # Extrair categoria
-                    categoria_pattern = r"Categoria:\s*([^\n]+)"
-                    categoria_match = re.search(categoria_pattern, section_context)
-                    if categoria_match:
-                        categoria = categoria_match.group(1).strip()
-                    
-                    # Extrair descrição
-                    descricao_pattern = r"Descrição:\s*([^\n]+)"
-                    descricao_match = re.search(descricao_pattern, section_context)
-                    if descricao_match:
-                        descricao = descricao_match.group(1).strip()
-                    
-                    # Extrair trecho de destaque
-                    trecho_pattern = r"Trecho de Destaque:\s*\"([^\"]+)\""
-                    trecho_match = re.search(trecho_pattern, section_context)
-                    if trecho_match:
-                        trecho_destaque = trecho_match.group(1).strip()
-            except Exception as e:
-                print(f"Erro ao extrair metadados do clipe: {e}")
+            # Levar as bordas para a pausa ou troca de cena mais próxima (sem cortar no meio da frase)
+            if boundaries:
+                start_seconds, end_seconds = boundaries.refine(
+                    start_seconds, end_seconds, total_duration, min_length=min_duration, max_length=max_duration
+                )
 
             # Adicionar o segmento à lista
             clip_segments.append({
                 "start_seconds": start_seconds,
                 "end_seconds": end_seconds,
-                "start_time_formatted": start_time_formatted,
-                "end_time_formatted": end_time_formatted,
-                "categoria": categoria,
-                "descricao": descricao,
-                "trecho_destaque": trecho_destaque
+                "categoria": moment.category,
+                "descricao": moment.description,
+                "trecho_destaque": moment.highlight
             })
         except Exception as e:
             print(f"Erro ao processar clipe {i + 1}: {str(e)}")
@@ -627,215 +1259,623 @@ def generate_clips(video_path, analysis, clip_format, clip_duration, full_transc
             traceback.print_exc()
 
     # Ordenar os segmentos por categoria (priorizando categorias importantes)
-    clip_segments.sort(key=lambda x: (x["categoria"] != "Informações Valiosas e Insights Úteis" and 
-                                      x["categoria"] != "Momentos Emocionantes e Impactantes", 
-                                      x["start_seconds"]))
+    clip_segments.sort(key=lambda x: (x["categoria"] not in PRIORITY_CATEGORIES, x["start_seconds"]))
 
-    # Gerar os clipes a partir dos segmentos, evitando sobreposição
-    last_end_seconds = 0
-    try:
-        for i, segment in enumerate(clip_segments):
-            start_seconds = segment["start_seconds"]
-            end_seconds = segment["end_seconds"]
-            start_time_formatted = segment["start_time_formatted"]
-            end_time_formatted = segment["end_time_formatted"]
-
-            # Verificar se o segmento se sobrepõe ao clipe anterior
-            if start_seconds < last_end_seconds:
-                print(f"Segmento {i + 1} sobrepõe o clipe anterior, ignorando.")
-                continue
+    # Pasta para salvar os clipes
+    CLIPS_DIR = "static/clips"
+    if not os.path.exists(CLIPS_DIR):
+        os.makedirs(CLIPS_DIR)
 
-            # Pasta para salvar os clipes
-            CLIPS_DIR = "static/clips"
-            if not os.path.exists(CLIPS_DIR):
-                os.makedirs(CLIPS_DIR)
+    # Pasta dos clipes em codificação (fora da pasta pública)
+    partial_dir = work_dir or os.path.join(DOWNLOADS_DIR, "clips")
+    os.makedirs(partial_dir, exist_ok=True)
 
-            # Gerar título otimizado para o clipe usando a API Gemini
-            clip_transcription = ""
-            try:
-                # Encontrar a transcrição correspondente ao intervalo de tempo do clipe
-                words_with_timestamps = []
-                
-                # Se tivermos a transcrição completa com timestamps (formato avançado do Whisper)
-                if hasattr(full_transcription, 'segments'):
-                    for segment in full_transcription.segments:
-                        if segment.start >= start_seconds and segment.end <= end_seconds:
-                            words_with_timestamps.append(segment.text)
-                    clip_transcription = " ".join(words_with_timestamps)
-                else:
-                    # Caso contrário, usar a transcrição completa recortada
-                    clip_transcription = full_transcription
-    
-                if not clip_transcription or len(clip_transcription) < 10:
-                    # Se a transcrição específica não for adequada, usar o texto completo
-                    clip_transcription = full_transcription
-            except Exception as e:
-                print(f"Erro ao extrair transcrição para o clipe: {e}")
-                clip_transcription = full_transcription
-
-            # Contar clipes válidos para contexto de geração de títulos
-            valid_clips_count = len(clip_segments)
-
-            # Gerar título otimizado com a API do Gemini
-            optimized_title = generate_optimized_title(
-                clip_transcription, 
-                segment.get("categoria", ""),
-                i,  # índice do clipe atual
-                valid_clips_count,  # total de clipes sendo gerados
-                segment.get("descricao", ""), 
-                segment.get("trecho_destaque", "")
+    # Contar clipes válidos para contexto de geração de títulos
+    valid_clips_count = len(clip_segments)
+
+    # Verificar se o vídeo de origem já está no formato final (caminho rápido sem recodificação)
+    cut_mode = "encode"
+    try:
+        source_info = probe_video(video_path)
+    except Exception as e:
+        print(f"Erro ao analisar o vídeo de origem, recodificando os clipes: {e}")
+        source_info = None
+    if CLIP_STREAM_COPY and source_info and can_stream_copy(source_info, resolution):
+        cut_mode = "smart_cut" if CLIP_SMART_CUT else "copy"
+        print(f"Vídeo já está em {resolution}: cortando sem recodificar ({cut_mode})")
+
+    # Planejar os clipes a partir dos segmentos, evitando sobreposição
+    planned_clips = []
+    last_end_seconds = 0
+    for i, segment in enumerate(clip_segments):
+        start_seconds = segment["start_seconds"]
+        end_seconds = segment["end_seconds"]
+
+        # Verificar se o segmento se sobrepõe ao clipe anterior
+        if start_seconds < last_end_seconds:
+            print(f"Segmento {i + 1} sobrepõe o clipe anterior, ignorando.")
+            continue
+
+        unique_id = hex(random.randint(0, 2**32-1))[2:].zfill(8)  # Gera um hexadecimal de 8 caracteres
+        planned_clips.append({
+            "index": i,
+            "segment": segment,
+            "start_seconds": start_seconds,
+            "end_seconds": end_seconds,
+            "unique_id": unique_id,
+            # O nome final depende do título: o clipe é codificado na pasta de trabalho
+            # e só vai para a pasta pública depois de concluído
+            "output_path": os.path.join(partial_dir, f"{unique_id}.partial.mp4"),
+            "video_filter": scale_filter(resolution),
+            "cut_mode": cut_mode,
+            "source_info": source_info,
+            # Extrair transcrição específica para este clipe (fallback: trecho de destaque)
+            "transcription": get_clip_transcription(
+                full_transcription, start_seconds, end_seconds, segment.get("trecho_destaque", "")
             )
+        })
+        last_end_seconds = end_seconds
+
+    # Pessoas do vídeo de origem, compartilhadas entre o reenquadramento e as thumbnails de todos os clipes
+    face_index = FaceIndex()
+
+    # Reenquadrar os formatos verticais/quadrados seguindo o rosto principal de cada clipe
+    reframe_results = {}
+    if CLIP_REFRAME and clip_format in ("9:16", "1:1") and cut_mode == "encode" and source_info and source_info["width"]:
+        reframe_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS) as reframe_pool:
+            reframe_futures = {
+                reframe_pool.submit(
+                    plan_reframe, video_path, clip["start_seconds"], clip["end_seconds"],
+                    source_info["width"], source_info["height"], resolution,
+                    REFRAME_SAMPLES_PER_SECOND, REFRAME_MAX_SAMPLES, proxy=proxy, face_index=face_index
+                ): n
+                for n, clip in enumerate(planned_clips)
+            }
+            for future in as_completed(reframe_futures):
+                n = reframe_futures[future]
+                try:
+                    reframe = future.result()
+                except Exception as e:
+                    print(f"Erro ao reenquadrar o clipe {n + 1}, usando apenas redimensionamento: {e}")
+                    continue
+                if reframe:
+                    planned_clips[n]["video_filter"] = reframe["video_filter"]
+                    reframe_results[n] = reframe
+        print(f"Reenquadramento de {len(planned_clips)} clipe(s) em {time.perf_counter() - reframe_start:.2f}s")
+
+    # Títulos, codificações e thumbnails rodam em pools separados; os resultados são montados na ordem original
+    # Perfis com menos threads por ffmpeg rodam mais processos, mantendo o total de threads
+    encode_threads = profile_threads(encode_profile, CLIP_ENCODE_THREADS)
+    for clip in planned_clips:
+        clip["encoder_args"] = encoder_args_for(encode_profile, encode_threads, clip["end_seconds"] - clip["start_seconds"])
+    # A passada única só compensa quando os clipes precisam ser recodificados
+    single_pass = CLIP_RENDER_MODE == "single_pass" and len(planned_clips) > 1 and cut_mode == "encode"
+    encode_workers = 1 if single_pass else max(1, CLIP_ENCODE_WORKERS * CLIP_ENCODE_THREADS // encode_threads)
+    print(f"Codificando {len(planned_clips)} clipe(s) (perfil {encode_profile}) com {encode_workers} "
+          f"processo(s) ffmpeg de {encode_threads} thread(s)")
 
-            # Usar o título otimizado ou fallback para títulos padrão
-            clip_title = optimized_title if optimized_title else segment.get("trecho_destaque", "")
-            if not clip_title or len(clip_title.strip()) < 3:
-                if segment.get("descricao"):
-                    clip_title = segment["descricao"]
-                else:
-                    clip_title = segment.get("categoria", f"Momento Interessante {i + 1}")
-
-            # Criar nome de arquivo sem underscores ou separadores
-            safe_title = re.sub(r'[\\/*?:"<>|]', "", clip_title).strip()
-            # Não substituir espaços por underscores - mantém os espaços no título
-            # Remover caracteres duplicados de espaço
-            safe_title = re.sub(r'\s+', " ", safe_title)
-            import random
-            unique_id = hex(random.randint(0, 2**32-1))[2:].zfill(8)  # Gera um hexadecimal de 8 caracteres
-
-            # Nome do arquivo do clipe com título viral
-            clip_filename = f"{safe_title} {unique_id}.mp4"
-            clip_path = os.path.join(CLIPS_DIR, clip_filename)
-
-            # Extrair transcrição específica para este clipe
-            clip_transcription = ""
-            try:
-                # Encontrar a transcrição correspondente ao intervalo de tempo do clipe
-                words_with_timestamps = []
-                
-                # Se tivermos a transcrição completa com timestamps (formato avançado do Whisper)
-                if hasattr(full_transcription, 'segments'):
-                    for segment in full_transcription.segments:
-                        if segment.start >= start_seconds and segment.end <= end_seconds:
-                            words_with_timestamps.append(segment.text)
-                    clip_transcription = " ".join(words_with_timestamps)
-                else:
-                    # Caso contrário, usar o trecho de destaque como transcrição
-                    clip_transcription = segment.get("trecho_destaque", "")
-                
-                if not clip_transcription or len(clip_transcription) < 10:
-                    # Se a transcrição específica não for adequada, usar o texto completo
-                    clip_transcription = full_transcription
-            except Exception as e:
-                print(f"Erro ao extrair transcrição para o clipe: {e}")
-                clip_transcription = full_transcription
-
-            # Comando FFmpeg para cortar e redimensionar o vídeo
-            ffmpeg_command = [
-                "ffmpeg", "-i", video_path,
-                "-ss", start_time_formatted,
-                "-to", end_time_formatted,
-                "-vf", f"scale={resolution},setsar=1:1",  # Redimensiona e corrige a proporção
-                "-c:v", "libx264",
-                "-preset", "fast",
-                "-crf", "23",
-                "-c:a", "aac",
-                clip_path
-            ]
-            print(f"Comando FFmpeg: {' '.join(ffmpeg_command)}")  # Log do comando
+    try:
+        with ThreadPoolExecutor(max_workers=1) as title_pool, \
+                ThreadPoolExecutor(max_workers=encode_workers) as encode_pool, \
+                ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS) as thumbnail_pool:
+
+            # Gerar os títulos (em lote) com a API do Gemini enquanto os clipes são codificados
+            titles_future = title_pool.submit(build_clip_titles, planned_clips, valid_clips_count, full_transcription)
+
+            # Renderizar os clipes: um ffmpeg por clipe com seek na entrada, ou todos em uma única passada
+            total_start = time.perf_counter()
+            if single_pass:
+                has_audio = source_info["has_audio"] if source_info else probe_video(video_path)["has_audio"]
+                encode_futures = {
+                    encode_pool.submit(render_single_pass, video_path, planned_clips, has_audio):
+                        list(range(len(planned_clips)))
+                }
+            else:
+                encode_futures = {
+                    encode_pool.submit(render_clip, video_path, clip): [n]
+                    for n, clip in enumerate(planned_clips)
+                }
+
+            # Com o proxy, os rostos das thumbnails vêm do trecho do vídeo original e não
+            # dependem da codificação; sem ele, são extraídos de cada clipe assim que fica pronto
+            thumbnail_futures = {}
+            if proxy:
+                for n, clip in enumerate(planned_clips):
+                    thumbnail_futures[n] = thumbnail_pool.submit(
+                        extract_faces_from_video, video_path, num_samples=THUMBNAIL_SAMPLES, proxy=proxy,
+                        start_seconds=clip["start_seconds"], end_seconds=clip["end_seconds"], face_index=face_index
+                    )
+
+            encode_results = {}
+            encode_measurements = {}
+            for future in as_completed(encode_futures):
+                indexes = encode_futures[future]
+                try:
+                    encode_seconds = future.result()
+                except subprocess.CalledProcessError as e:
+                    print(f"Erro no FFmpeg: {e}")
+                    print(f"Código de retorno: {e.returncode}")
+                    print(f"Saída: {e.output}")
+                    continue
+                if cut_mode == "encode":
+                    measurement = record_encode_stats(
+                        encode_profile, [planned_clips[n] for n in indexes], encode_seconds
+                    )
+                    for n in indexes:
+                        encode_measurements[n] = measurement
+                for n in indexes:
+                    encode_results[n] = None if single_pass else round(encode_seconds, 3)
+                    if not single_pass:
+                        print(f"Clipe codificado em {encode_seconds:.2f}s: {planned_clips[n]['output_path']}")
+                    if n not in thumbnail_futures:
+                        thumbnail_futures[n] = thumbnail_pool.submit(
+                            extract_faces_from_video, planned_clips[n]["output_path"], num_samples=THUMBNAIL_SAMPLES,
+                            face_index=face_index
+                        )
+            total_encode_seconds = time.perf_counter() - total_start
+            print(f"Tempo total de codificação ({CLIP_RENDER_MODE}): {total_encode_seconds:.2f}s para {len(encode_results)} clipe(s)")
+
+            # Montar os resultados na ordem original dos segmentos
+            for n, clip in enumerate(planned_clips):
+                if n not in encode_results:
+                    continue
+
+                clip_title = titles_future.result()[n]
+
+                # Criar nome de arquivo sem underscores ou separadores
+                safe_title = re.sub(r'[\\/*?:"<>|]', "", clip_title).strip()
+                # Não substituir espaços por underscores - mantém os espaços no título
+                # Remover caracteres duplicados de espaço
+                safe_title = re.sub(r'\s+', " ", safe_title)
+
+                # Nome do arquivo do clipe com título viral
+                clip_filename = f"{safe_title} {clip['unique_id']}.mp4"
+                clip_path = os.path.join(CLIPS_DIR, clip_filename)
+                # A thumbnail pode estar lendo o arquivo parcial: esperar antes de movê-lo
+                face_frames = thumbnail_futures[n].result()
+                library_mtime = clip_library.folder_mtime()
+                os.replace(clip["output_path"], clip_path)
 
-            try:
-                subprocess.run(ffmpeg_command, check=True)
-                
                 # Salvar a transcrição em um arquivo de texto
                 transcription_filename = clip_path.replace(".mp4", ".txt")
                 with open(transcription_filename, "w", encoding="utf-8") as f:
-                    f.write(clip_transcription)
+                    f.write(clip["transcription"])
                 
                 # Gerar thumbnail para o clipe
                 thumbnail_path = clip_path.replace(".mp4", "_thumbnail.jpg")
-                face_frames = extract_faces_from_video(clip_path)
                 if face_frames:
                     create_thumbnail(face_frames, thumbnail_path)
+
+                # Registrar o clipe no índice da biblioteca
+                library_entry = clip_library.add(
+                    clip_path, clip_title, thumbnail_path, duration=clip["end_seconds"] - clip["start_seconds"],
+                    folder_mtime=library_mtime
+                )
                 
                 # Adicionar informações do clipe à lista de retorno
                 clips_info.append({
+                    "id": library_entry["id"],
                     "path": clip_path,
                     "url": f"/static/clips/{os.path.basename(clip_path)}",
                     "title": clip_title,
-                    "categoria": segment.get("categoria", ""),
-                    "transcription": clip_transcription,
-                    "duration": end_seconds - start_seconds,
-                    "thumbnail": f"/static/clips/{os.path.basename(thumbnail_path)}" if os.path.exists(thumbnail_path) else None
+                    "categoria": clip["segment"].get("categoria", ""),
+                    "transcription": clip["transcription"],
+                    "duration": clip["end_seconds"] - clip["start_seconds"],
+                    "thumbnail": f"/static/clips/{os.path.basename(thumbnail_path)}" if os.path.exists(thumbnail_path) else None,
+                    "encode_seconds": encode_results[n],
+                    "encode_profile": encode_profile if cut_mode == "encode" else None,
+                    "encode_fps": encode_measurements.get(n, {}).get("encode_fps"),
+                    "bitrate_kbps": encode_measurements.get(n, {}).get("bitrate_kbps"),
+                    "reframe_seconds": round(reframe_results[n]["seconds"], 3) if n in reframe_results else None,
+                    "total_encode_seconds": round(total_encode_seconds, 3)
                 })
-                
-                last_end_seconds = end_seconds
-                
-            except subprocess.CalledProcessError as e:
-                print(f"Erro no FFmpeg: {e}")
-                print(f"Código de retorno: {e.returncode}")
-                print(f"Saída: {e.output}")
-                continue
 
     except Exception as e:
         print(f"Erro ao processar clipes: {str(e)}")
         print(f"Detalhes do erro: {str(e)}")
         import traceback
         traceback.print_exc()
+    finally:
+        # Clipes que não chegaram à pasta pública (falha ou erro no meio do lote)
+        for clip in planned_clips:
+            if os.path.exists(clip["output_path"]):
+                os.remove(clip["output_path"])
 
     print(f"Clipes gerados: {len(clips_info)}")  # Log
     return clips_info
 
 # Rota principal (página inicial)
+# Registro leve de um clipe para a listagem (a transcrição é carregada sob demanda)
+def clip_summary(clip):
+    return {
+        "id": clip["id"],
+        "title": clip["title"],
+        "url": clip["url"],
+        "thumbnail": f"{clip_library.url_prefix}/{clip['thumbnail']}" if clip["thumbnail"] else None,
+        "duration": clip["duration"]
+    }
+
 @app.route("/")
 def index():
-    # Listar todos os arquivos na pasta de clipes
-    clips_dir = os.path.join(app.static_folder, "clips")
-    if not os.path.exists(clips_dir):
-        os.makedirs(clips_dir)
-        
-    clip_files = glob.glob(os.path.join(clips_dir, "*.mp4"))
+    # Renderizar apenas a primeira página da biblioteca; as demais vêm de /api/clips com rolagem infinita
+    clip_library.refresh()
+    clips, next_cursor, total_clips = clip_library.page_after(None, CLIPS_PAGE_SIZE)
+    clips_data = [clip_summary(clip) for clip in clips]
+    return render_template(
+        "index.html", clips_data=clips_data, next_cursor=next_cursor, total_clips=total_clips,
+        page_size=CLIPS_PAGE_SIZE
+    )
+
+# Rota da API com a biblioteca de clipes paginada por cursor
+@app.route("/api/clips")
+def list_clips():
+    clip_library.refresh()
+    limit = min(max(request.args.get("limit", CLIPS_PAGE_SIZE, type=int), 1), 100)
+    try:
+        clips, next_cursor, total_clips = clip_library.page_after(request.args.get("cursor") or None, limit)
+    except ValueError:
+        return jsonify({"status": "error", "message": "Cursor inválido."}), 400
+    return jsonify({
+        "clips": [clip_summary(clip) for clip in clips],
+        "next_cursor": next_cursor,
+        "total": total_clips
+    })
+
+# Rota da API com a transcrição de um clipe (com ETag/Last-Modified para respostas 304)
+@app.route("/api/clips/<clip_id>/transcript")
+def get_clip_transcript(clip_id):
+    clip = clip_library.get(clip_id)
+    transcript_path = clip_library.transcript_path(clip) if clip else None
+    if not transcript_path or not os.path.exists(transcript_path):
+        return jsonify({"status": "error", "message": "Transcrição não encontrada."}), 404
+    return send_file(
+        os.path.abspath(transcript_path),
+        mimetype="text/plain; charset=utf-8",
+        conditional=True,
+        etag=True,
+        max_age=0
+    )
+
+# Carregar (ou calcular e guardar em cache) os mapas de pausas e trocas de cena de um vídeo
+def load_boundary_snapper(audio, audio_hash, video_path, proxy=None, timings=None):
+    """
+    Monta o BoundarySnapper de um vídeo.
 
-    # Criar uma lista para armazenar os dados dos clipes
-    clips_data = []
-    for clip_file in clip_files:
-        clip_url = f"/static/clips/{os.path.basename(clip_file)}"
-        file_name = os.path.basename(clip_file)
-        
-        # Extrair título do nome do arquivo
-        title = file_name.replace(".mp4", "").replace("_", " ")
-        # Remover o número de sequência no final do título (ex: "_1")
-        title = re.sub(r'_\d+$', '', title)
-        # Formatar o título para exibição
-        title = " ".join(word.capitalize() for word in title.split())
-        
-        # Buscar transcrição correspondente
-        transcription_file = clip_file.replace(".mp4", ".txt")
-        try:
-            with open(transcription_file, "r", encoding="utf-8") as f:
-                transcription = f.read()
-        except FileNotFoundError:
-            transcription = "Transcrição não disponível"
-        
-            # Verificar se existe thumbnail para o clipe
-            thumbnail_path = clip_file.replace(".mp4", "_thumbnail.jpg")
-            thumbnail_url = f"/static/clips/{os.path.basename(thumbnail_path)}" if os.path.exists(thumbnail_path) else None
-            
-            clips_data.append({
-                "url": clip_url, 
-                "title": title,
-                "transcription": transcription,
-                "thumbnail": thumbnail_url
+    As pausas vêm do PCM já decodificado e as trocas de cena de uma passada do
+    ffmpeg sobre o proxy de análise (ou sobre o original reduzido). Os dois mapas
+    ficam em cache por hash do áudio, então gerar clipes de novo do mesmo vídeo
+    não recalcula nada.
+
+    :param audio: PCM 16 kHz (sem PCM, no modo mp3, o mapa de pausas fica vazio).
+    :param timings: Dicionário opcional que recebe cached e seconds.
+    :return: BoundarySnapper.
+    """
+    timings = timings if timings is not None else {}
+    # As trocas de cena dependem da resolução e da taxa de quadros analisadas (proxy ou original reduzido)
+    key = ResultCache.make_key(
+        audio_hash, "boundaries", BOUNDARY_MAP_VERSION, SILENCE_MIN_SECONDS, SCENE_CUT_THRESHOLD, PROXY_WIDTH, PROXY_FPS
+    )
+    maps = result_cache.get("boundaries", key)
+    timings["cached"] = bool(maps)
+    if not maps:
+        start = time.perf_counter()
+        silences = silence_map(audio, SILENCE_MIN_SECONDS) if isinstance(audio, np.ndarray) else []
+        if proxy:
+            cuts = scene_cuts(proxy.path, SCENE_CUT_THRESHOLD)
+        else:
+            cuts = scene_cuts(video_path, SCENE_CUT_THRESHOLD, max_width=PROXY_WIDTH, fps=PROXY_FPS)
+        maps = {"silences": silences, "scene_cuts": cuts or []}
+        # Com erro na detecção de cenas, não guardar: a próxima execução tenta de novo
+        if cuts is not None:
+            result_cache.put("boundaries", key, maps)
+        timings["seconds"] = round(time.perf_counter() - start, 3)
+        print(f"Mapas de bordas calculados em {timings['seconds']:.2f}s: "
+              f"{len(maps['silences'])} pausa(s), {len(maps['scene_cuts'])} troca(s) de cena")
+    return BoundarySnapper(maps["silences"], maps["scene_cuts"], BOUNDARY_SNAP_TOLERANCE)
+
+# Etapas do pipeline com o peso de cada uma no progresso geral
+PIPELINE_STAGES = [
+    ("download", 10),
+    ("extract_audio", 5),
+    ("transcribe", 40),
+    ("analyze", 10),
+    ("download_video", 5),
+    ("generate_clips", 30),
+]
+
+# Função executada pelos workers da fila para processar um vídeo
+def run_pipeline(job_id, params, reporter):
+    """
+    Executa download → extração de áudio → transcrição → análise → geração de clipes.
+
+    Vídeos do YouTube no modo pipelined são transcritos a partir do áudio enquanto o
+    vídeo completo ainda está sendo baixado (ver fetch_youtube_media).
+
+    :param job_id: ID do job na fila.
+    :param params: Parâmetros enviados para /process.
+    :param reporter: JobReporter usado para informar o progresso de cada etapa.
+    :return: Dicionário com os clipes gerados.
+    """
+    video_url = params.get("video_url")
+    clip_format = params["clip_format"]
+    clip_duration = params["clip_duration"]
+    user_id = params.get("user_id", "anônimo")
+
+    # Pasta de trabalho exclusiva deste job (o upload, se houver, já está nela)
+    job_dir = workdirs.create(job_id)
+    video_path = None
+    audio_media_path = None
+    video_future = None
+    proxy_future = None
+    ingest_timings = {}
+
+    try:
+        # Processar vídeo do YouTube ou vídeo carregado
+        reporter.start_stage("download")
+        if video_url:
+            print(f"Processando vídeo do YouTube: {video_url}")
+            video_title, media_path, video_future = fetch_youtube_media(video_url, reporter, ingest_timings)
+            if video_future:
+                audio_media_path = media_path
+            else:
+                video_path = media_path
+        else:
+            video_title, media_path = params.get("video_title"), params.get("video_path")
+            video_path = media_path
+            print(f"Processando vídeo carregado: {video_path}")
+
+        if not media_path or not os.path.exists(media_path):
+            raise PipelineError("Falha ao processar o vídeo")
+        reporter.finish_stage("download")
+        if not video_future:
+            reporter.finish_stage("download_video")
+        ingest_timings["mode"] = "pipelined" if video_future else "sequential"
+        print(f"Vídeo processado com sucesso: {media_path}")
+
+        # Proxy de análise gerado em paralelo com a transcrição (no modo pipelined, logo após o vídeo)
+        if ANALYSIS_PROXY:
+            proxy_path = os.path.join(job_dir, "proxy.mp4")
+            if video_future:
+                proxy_future = start_proxy_build(video_future, proxy_path)
+            else:
+                proxy_future = ingest_pool.submit(build_proxy, video_path, proxy_path, PROXY_WIDTH, PROXY_FPS)
+
+        # Extrair áudio (do vídeo completo ou, no modo pipelined, da faixa de áudio)
+        reporter.start_stage("extract_audio")
+        audio_extension = "mp3" if AUDIO_EXTRACTION_MODE == "mp3" else "f32"
+        audio = extract_audio(
+            media_path,
+            audio_output_path=os.path.join(job_dir, f"audio.{audio_extension}"),
+            mode=AUDIO_EXTRACTION_MODE
+        )
+        if audio is None:
+            raise PipelineError("Falha ao extrair áudio")
+        if audio_media_path:
+            media_cache.release(audio_media_path)
+            audio_media_path = None
+        reporter.finish_stage("extract_audio")
+        print("Áudio extraído com sucesso")
+
+        # Chaves de cache: mesmo áudio + mesmos modelos/prompt = mesmo resultado
+        audio_hash = hash_audio(audio)
+        transcript_key = ResultCache.make_key(audio_hash, WHISPER_MODEL)
+        analysis_key = ResultCache.make_key(
+            audio_hash, WHISPER_MODEL, GEMINI_MODEL, ANALYSIS_PROMPT_VERSION, ANALYSIS_WINDOW_SECONDS
+        )
+
+        # Transcrever o áudio (ou reutilizar a transcrição em cache)
+        print("Iniciando transcrição do áudio...")
+        reporter.start_stage("transcribe")
+        cached_transcript = result_cache.get("transcripts", transcript_key)
+        if cached_transcript:
+            transcription = Transcription(cached_transcript["text"], cached_transcript["segments"])
+        else:
+            transcription = transcribe_audio(
+                audio, on_progress=lambda fraction: reporter.stage_progress("transcribe", fraction)
+            )
+            if not transcription:
+                raise PipelineError("Falha ao transcrever áudio: resultado vazio")
+            result_cache.put("transcripts", transcript_key, {
+                "text": str(transcription),
+                "segments": [list(segment) for segment in transcription.segments]
             })
+        reporter.finish_stage("transcribe")
+        print(f"Transcrição concluída com sucesso: {transcription[:100]}...")
+        print(f"Tamanho da transcrição: {len(transcription)} caracteres")
+
+        # Analisar a transcrição com a Gemini API
+        print("Iniciando análise da transcrição...")
+        reporter.start_stage("analyze")
+        analysis_timings = {"cached": True}
+        analysis = result_cache.get("analyses", analysis_key)
+        if not analysis:
+            analysis_timings = {"cached": False}
+            analysis = analyze_transcription(transcription, timings=analysis_timings)
+            if not analysis:
+                raise PipelineError("Falha ao analisar transcrição: resultado vazio")
+            result_cache.put("analyses", analysis_key, analysis)
+        reporter.finish_stage("analyze")
+        print(f"Análise concluída com sucesso: {analysis[:100]}...")
+        print(f"Tamanho da análise: {len(analysis)} caracteres")
+
+        # Modo pipelined: o vídeo completo só é necessário a partir daqui
+        if video_future:
+            reporter.start_stage("download_video")
+            wait_start = time.perf_counter()
+            _, video_path = video_future.result()
+            ingest_timings["video_wait"] = round(time.perf_counter() - wait_start, 3)
+            if not video_path or not os.path.exists(video_path):
+                raise PipelineError("Falha ao baixar o vídeo")
+            reporter.finish_stage("download_video")
+            print(f"Vídeo completo disponível após {ingest_timings['video_wait']:.2f}s de espera: {video_path}")
+
+        # Preparação da geração: proxy de análise e mapas de bordas
+        reporter.start_stage("generate_clips")
+
+        # Sem proxy (desativado ou com erro), a visão computacional lê o vídeo original
+        proxy = None
+        if proxy_future:
+            wait_start = time.perf_counter()
+            try:
+                proxy = proxy_future.result()
+            except Exception as e:
+                print(f"Erro ao gerar o proxy de análise, usando o vídeo original: {e}")
+            ingest_timings["proxy_wait"] = round(time.perf_counter() - wait_start, 3)
+            if proxy:
+                ingest_timings["proxy_build"] = round(proxy.seconds, 3)
+
+        # Mapas de pausas e trocas de cena para ajustar as bordas dos clipes
+        boundaries = None
+        boundary_timings = {}
+        if BOUNDARY_SNAP:
+            boundaries = load_boundary_snapper(audio, audio_hash, video_path, proxy, boundary_timings)
+
+        # Gerar clipes com base na análise, formato e duração (perfil escolhido com a fila atual)
+        encode_profile = resolve_encode_profile(params.get("encode_profile", "auto"))
+        clips_info = generate_clips(
+            video_path, analysis, clip_format, clip_duration, transcription, encode_profile,
+            proxy=proxy, boundaries=boundaries, work_dir=job_dir
+        )
+        print(f"Clipes gerados: {len(clips_info)}")
+        if not clips_info:
+            raise PipelineError("Nenhum clipe adequado foi gerado")
 
-    # Ordenar clips por nome
-    clips_data.sort(key=lambda x: x["title"])
+        # Preparar dados para exibição
+        clips_data = []
+        for clip_info in clips_info:
+            clips_data.append({
+                "id": clip_info["id"],
+                "url": clip_info["url"],
+                "title": clip_info["title"],
+                "transcription": clip_info["transcription"],
+                "thumbnail": clip_info.get("thumbnail"),
+                "duration": clip_info.get("duration"),
+                "encode_seconds": clip_info.get("encode_seconds"),
+                "encode_profile": clip_info.get("encode_profile"),
+                "encode_fps": clip_info.get("encode_fps"),
+                "bitrate_kbps": clip_info.get("bitrate_kbps"),
+                "reframe_seconds": clip_info.get("reframe_seconds")
+            })
 
-    return render_template("index.html", clips_data=clips_data)
+        # Salvar no banco de dados se necessário
+        if user_id != "anônimo":
+            for clip in clips_data:
+                save_clip(user_id, clip["url"], clip["transcription"], clip["title"])
+        reporter.finish_stage("generate_clips")
+
+        print("Clipes gerados com sucesso")
+        return {
+            "clips": clips_data,
+            "encode_profile": encode_profile,
+            "analysis_timings": analysis_timings,
+            "ingest_timings": ingest_timings,
+            "boundary_refinement": dict(boundary_timings, **boundaries.stats()) if boundaries else None
+        }
 
-# Rota para processar o vídeo
+    finally:
+        # Proxy que ainda não começou a ser gerado não é mais necessário
+        if proxy_future:
+            proxy_future.cancel()
+        # Liberar as mídias no cache e limpar apenas a pasta deste job
+        if audio_media_path:
+            media_cache.release(audio_media_path)
+        if video_future and not video_path:
+            # Job falhou antes de usar o vídeo: liberá-lo agora ou quando o download acabar
+            video_future.add_done_callback(release_video_future)
+        elif video_url and video_path:
+            media_cache.release(video_path)
+        workdirs.cleanup(job_id)
+
+# Fila de jobs persistida em SQLite (sobrevive a reinícios do servidor)
+job_queue = JobQueue(
+    JOBS_DB_PATH,
+    run_pipeline,
+    PIPELINE_STAGES,
+    num_workers=JOB_WORKERS,
+    lease_seconds=JOB_LEASE_SECONDS,
+    max_attempts=JOB_MAX_ATTEMPTS
+)
+
+# Verificar se um job ainda precisa da sua pasta de trabalho
+def is_job_active(job_id):
+    job = job_queue.get(job_id)
+    if job and job["status"] == JOB_WAITING:
+        # Upload em andamento: protegido da cota de disco, mas expira pelo TTL se for abandonado
+        try:
+            return time.time() - os.path.getmtime(workdirs.path(job_id)) <= JOB_DIR_TTL
+        except OSError:
+            return False
+    return bool(job) and job["status"] in (JOB_QUEUED, JOB_RUNNING)
+
+# Índice da biblioteca de clipes
+clip_library = ClipLibrary(CLIP_LIBRARY_DB_PATH, os.path.join(app.static_folder, "clips"))
+
+# Pastas de trabalho por job, com reaper para pastas abandonadas (e uploads em partes dentro delas)
+workdirs = WorkDirManager(
+    JOB_DIRS_ROOT,
+    ttl_seconds=JOB_DIR_TTL,
+    quota_bytes=JOB_DIRS_QUOTA_MB * 1024 * 1024,
+    is_active=is_job_active
+)
+uploads = UploadManager(workdirs)
+
+# Iniciar os serviços do processo (modelo Whisper, reaper e workers da fila).
+# Chamado pelo ponto de entrada (python app.py ou wsgi.py), nunca na importação:
+# os processos do pool de transcrição (spawn) reimportam este módulo como
+# __mp_main__ e não devem carregar o modelo do servidor nem assumir jobs da fila.
+def start_services():
+    if WHISPER_PRELOAD:
+        whisper_models.warm_up([WHISPER_MODEL])
+    workdirs.start_reaper()
+    job_queue.start()
+
+# Validar as opções de clipe enviadas para /process e /uploads
+def validate_clip_params(data):
+    """Retorna (parâmetros do job, None) ou (None, resposta de erro)."""
+    clip_format = data.get("clip_format", "16:9")  # Default to 16:9
+    clip_duration = data.get("clip_duration", "3m-5m")  # Default to 3-5 minutes
+    user_id = data.get("user_id", "anônimo")  # Default to anonymous
+    encode_profile = data.get("encode_profile") or "auto"  # Auto: escolhido pela fila
+
+    # Validate clip format
+    valid_formats = ["9:16", "1:1", "16:9"]
+    if clip_format not in valid_formats:
+        print(f"Formato de clipe inválido: {clip_format}")
+        return None, (jsonify({
+            "status": "error",
+            "message": f"Formato de clipe inválido. Use um dos seguintes: {', '.join(valid_formats)}"
+        }), 400)
+
+    # Validate clip duration
+    valid_durations = ["<30s", "30s-59s", "90s-3m", "3m-5m", "5m-10m", "10m-15m", "15m-20m", "20m-25m"]
+    if clip_duration not in valid_durations:
+        print(f"Duração de clipe inválida: {clip_duration}")
+        return None, (jsonify({
+            "status": "error",
+            "message": f"Duração de clipe inválida. Use um dos seguintes: {', '.join(valid_durations)}"
+        }), 400)
+
+    # Validate encode profile
+    valid_profiles = ["auto", *ENCODE_PROFILES]
+    if encode_profile not in valid_profiles:
+        print(f"Perfil de codificação inválido: {encode_profile}")
+        return None, (jsonify({
+            "status": "error",
+            "message": f"Perfil de codificação inválido. Use um dos seguintes: {', '.join(valid_profiles)}"
+        }), 400)
+
+    return {
+        "clip_format": clip_format,
+        "clip_duration": clip_duration,
+        "encode_profile": encode_profile,
+        "user_id": user_id
+    }, None
+
+# Rota para enfileirar o processamento de um vídeo
 @app.route("/process", methods=["POST"])
 def process_video():
-    print("Iniciando processamento do vídeo")  # Log
+    print("Recebendo pedido de processamento do vídeo")  # Log
     
     try:
         # Obter e validar dados do formulário
@@ -844,9 +1884,6 @@ def process_video():
         
         video_url = data.get("video_url")
         uploaded_file = files.get("video_file")
-        clip_format = data.get("clip_format", "16:9")  # Default to 16:9
-        clip_duration = data.get("clip_duration", "3m-5m")  # Default to 3-5 minutes
-        user_id = data.get("user_id", "anônimo")  # Default to anonymous
 
         # Validate required parameters
         if not video_url and not uploaded_file:
@@ -856,135 +1893,159 @@ def process_video():
                 "message": "Por favor, forneça um link do YouTube ou faça upload de um arquivo de vídeo"
             }), 400
 
-        # Validate clip format
-        valid_formats = ["9:16", "1:1", "16:9"]
-        if clip_format not in valid_formats:
-            print(f"Formato de clipe inválido: {clip_format}")
-            return jsonify({
-                "status": "error", 
-                "message": f"Formato de clipe inválido. Use um dos seguintes: {', '.join(valid_formats)}"
-            }), 400
-
-        # Validate clip duration
-        valid_durations = ["<30s", "30s-59s", "90s-3m", "3m-5m", "5m-10m", "10m-15m", "15m-20m", "20m-25m"]
-        if clip_duration not in valid_durations:
-            print(f"Duração de clipe inválida: {clip_duration}")
-            return jsonify({
-                "status": "error",
-                "message": f"Duração de clipe inválida. Use um dos seguintes: {', '.join(valid_durations)}"
-            }), 400
-
-        try:
-            # Limpar pasta de downloads antes de processar novo vídeo
-            if not clean_downloads_folder():
-                print("Falha ao limpar pasta de downloads")
-                return jsonify({
-                    "status": "error",
-                    "message": "Falha ao limpar pasta de downloads"
-                }), 500
+        params, error = validate_clip_params(data)
+        if error:
+            return error
+        params["video_url"] = video_url
+        job_id = job_queue.new_job_id()
 
-            # Processar vídeo do YouTube ou vídeo carregado
-            if video_url:
-                print(f"Processando vídeo do YouTube: {video_url}")
-                video_title, video_path = download_youtube_video(video_url)
-            else:
-                print(f"Processando vídeo carregado: {uploaded_file.filename}")
-                video_title, video_path = process_local_video(uploaded_file)
-                
+        # O upload precisa ser salvo agora, pois o arquivo não sobrevive ao fim da requisição
+        if not video_url:
+            print(f"Salvando vídeo carregado: {uploaded_file.filename}")
+            video_title, video_path = process_local_video(uploaded_file, workdirs.create(job_id))
             if not video_path:
-                print("Falha ao processar o vídeo")
+                workdirs.cleanup(job_id)
                 return jsonify({
                     "status": "error",
                     "message": "Falha ao processar o vídeo"
-                }), 500
-            print(f"Vídeo processado com sucesso: {video_path}")
+                }), 400
+            params["video_title"] = video_title
+            params["video_path"] = video_path
 
-            # Extrair áudio
-            audio_path = extract_audio(video_path, audio_output_path=f"{DOWNLOADS_DIR}/audio.mp3")
-            if not audio_path:
-                print("Falha ao extrair áudio")
-                return jsonify({
-                    "status": "error",
-                    "message": "Falha ao extrair áudio"
-                }), 500
-            print(f"Áudio extraído com sucesso: {audio_path}")
-
-            # Transcrever o áudio
-            print("Iniciando transcrição do áudio...")
-            transcription = transcribe_audio(audio_path)
-            if not transcription:
-                print("Falha ao transcrever áudio: resultado vazio")
-                return jsonify({
-                    "status": "error",
-                    "message": "Falha ao transcrever áudio: resultado vazio"
-                }), 500
-            print(f"Transcrição concluída com sucesso: {transcription[:100]}...")
-            print(f"Tamanho da transcrição: {len(transcription)} caracteres")
-
-            # Analisar a transcrição com a Gemini API
-            print("Iniciando análise da transcrição...")
-            analysis = analyze_transcription(transcription)
-            if not analysis:
-                print("Falha ao analisar transcrição: resultado vazio")
-                return jsonify({
-                    "status": "error",
-                    "message": "Falha ao analisar transcrição: resultado vazio"
-                }), 500
-            print(f"Análise concluída com sucesso: {analysis[:100]}...")
-            print(f"Tamanho da análise: {len(analysis)} caracteres")
-
-            # Gerar clipes com base na análise, formato e duração
-            clips_info = generate_clips(video_path, analysis, clip_format, clip_duration, transcription)
-            print(f"Clipes gerados: {len(clips_info)}")
-
-            # Limpar a pasta de downloads após processar os clipes
-            if not clean_downloads_folder():
-                print("Falha ao limpar pasta de downloads após processamento")
-                return jsonify({
-                    "status": "error",
-                    "message": "Falha ao limpar pasta de downloads"
-                }), 500
-
-            # Retornar os clipes gerados
-            if not clips_info:
-                print("Nenhum clipe adequado foi gerado.")
-                return jsonify({
-                    "status": "error",
-                    "message": "Nenhum clipe adequado foi gerado"
-                }), 500
-            
-            # Preparar dados para exibição
-            clips_data = []
-            for clip_info in clips_info:
-                clips_data.append({
-                    "url": clip_info["url"],
-                    "title": clip_info["title"],
-                    "transcription": clip_info["transcription"],
-                    "thumbnail": clip_info.get("thumbnail"),
-                    "duration": clip_info.get("duration")
-                })
-                
-            # Salvar no banco de dados se necessário
-            if user_id != "anônimo":
-                for clip in clips_data:
-                    save_clip(user_id, clip["url"], clip["transcription"], clip["title"])
-            
-            print("Clipes gerados com sucesso")
-            return jsonify({
-                "status": "success",
-                "data": clips_data
-            })
-
-        except Exception as e:
-            print(f"Erro durante o processamento: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return jsonify({
-                "status": "error",
-                "message": f"Erro durante o processamento: {str(e)}"
-            }), 500
+        job_queue.enqueue(params, job_id=job_id)
+        return jsonify({
+            "status": "queued",
+            "job_id": job_id,
+            "status_url": url_for("get_job", job_id=job_id)
+        }), 202
 
     except Exception as e:
         print(f"Erro no servidor: {str(e)}")
         import traceback
         traceback.print_exc()
+        return jsonify({
+            "status": "error",
+            "message": f"Erro no servidor: {str(e)}"
+        }), 500
+
+# Rota para iniciar um upload retomável em partes (o job fica aguardando a última parte)
+@app.route("/uploads", methods=["POST"])
+def create_upload():
+    data = request.get_json(silent=True) or request.form
+    filename = os.path.basename(data.get("filename") or "")
+    try:
+        size = int(data.get("size", 0))
+    except (TypeError, ValueError):
+        size = 0
+
+    if filename.split('.')[-1].lower() not in ALLOWED_VIDEO_EXTENSIONS:
+        return jsonify({"status": "error", "message": "Arquivo não é um vídeo"}), 400
+    if size <= 0 or size > UPLOAD_MAX_SIZE_MB * 1024 * 1024:
+        return jsonify({
+            "status": "error",
+            "message": f"Tamanho do arquivo inválido (máximo de {UPLOAD_MAX_SIZE_MB} MB)"
+        }), 400
+
+    params, error = validate_clip_params(data)
+    if error:
+        return error
+    params["video_url"] = None
+
+    job_id = job_queue.new_job_id()
+    upload = uploads.create(job_id, filename, size, data.get("sha256"))
+    params["video_title"] = filename
+    params["video_path"] = upload["path"]
+    job_queue.enqueue(params, job_id=job_id, waiting=True)
+    return jsonify({
+        "status": "waiting",
+        "job_id": job_id,
+        "upload_url": url_for("upload_chunk", job_id=job_id),
+        "offset": 0,
+        "size": size,
+        "max_chunk_size": UPLOAD_MAX_CHUNK_MB * 1024 * 1024
+    }), 201
+
+# Rota para consultar o offset de um upload (para retomar após uma falha)
+@app.route("/uploads/<job_id>", methods=["GET", "HEAD"])
+def get_upload(job_id):
+    upload = uploads.status(job_id)
+    if not upload:
+        return jsonify({"status": "error", "message": "Upload não encontrado ou expirado"}), 404
+    response = jsonify({"offset": upload["offset"], "size": upload["size"], "complete": upload["complete"]})
+    response.headers["Upload-Offset"] = str(upload["offset"])
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+# Rota para enviar uma parte do upload: corpo bruto, header Upload-Offset e checksum opcional em Upload-Checksum (SHA-256)
+@app.route("/uploads/<job_id>", methods=["PUT", "PATCH"])
+def upload_chunk(job_id):
+    try:
+        offset = int(request.headers.get("Upload-Offset", ""))
+    except ValueError:
+        return jsonify({"status": "error", "message": "Header Upload-Offset ausente ou inválido"}), 400
+    length = request.content_length or 0
+    if length > UPLOAD_MAX_CHUNK_MB * 1024 * 1024:
+        return jsonify({"status": "error", "message": f"Parte maior que {UPLOAD_MAX_CHUNK_MB} MB"}), 413
+
+    try:
+        # O corpo é lido do stream em blocos e escrito direto no arquivo do job
+        upload = uploads.write_chunk(job_id, offset, request.stream, length, request.headers.get("Upload-Checksum"))
+    except UploadError as e:
+        response = jsonify({"status": "error", "message": str(e), "offset": e.offset})
+        if e.offset is not None:
+            response.headers["Upload-Offset"] = str(e.offset)
+        return response, e.status_code
+
+    if not upload["complete"]:
+        response = jsonify({"status": "uploading", "offset": upload["offset"], "size": upload["size"]})
+        response.headers["Upload-Offset"] = str(upload["offset"])
+        return response
+
+    # Última parte recebida: liberar o job para processamento imediatamente
+    job_queue.release(job_id)
+    return jsonify({
+        "status": "queued",
+        "job_id": job_id,
+        "offset": upload["offset"],
+        "status_url": url_for("get_job", job_id=job_id)
+    }), 202
+
+# Rota para consultar o status de um job
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({
+            "status": "error",
+            "message": "Job não encontrado"
+        }), 404
+
+    return jsonify({
+        "job_id": job["id"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "progress": job["progress"],
+        "stages": job["stages"],
+        "message": job["message"],
+        "error": job["error"],
+        "result": job["result"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"]
+    })
+
+# Rota com métricas internas de desempenho
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return jsonify({
+        "whisper": whisper_models.stats(),
+        "result_cache": result_cache.stats(),
+        "analysis_parsing": dict(analysis_parse_stats),
+        "gemini": gemini_client.stats() if gemini_client else None,
+        "media_cache": media_cache.stats(),
+        "encoding": encode_stats_summary(),
+        "jobs": {"queue_depth": job_queue.queue_depth()}
+    })
+
+if __name__ == "__main__":
+    start_services()
+    app.run(host="0.0.0.0", port=int(os.getenv("PORT", "5000")))
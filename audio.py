@@ -0,0 +1,88 @@
+import hashlib
+import os
+import subprocess
+import tempfile
+
+import numpy as np
+
+# Formato esperado pelo Whisper: mono, 16 kHz, float32 em [-1, 1]
+SAMPLE_RATE = 16000
+
+
+def _ffmpeg_pcm_command(video_path, output):
+    return [
+        "ffmpeg", "-nostdin", "-v", "error",
+        "-i", video_path,
+        "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE),
+        "-f", "f32le", "-acodec", "pcm_f32le",
+        "-y", output
+    ]
+
+
+def load_pcm(video_path):
+    """
+    Decodifica o áudio do vídeo direto para PCM float32 16 kHz mono na memória.
+
+    :param video_path: Caminho do vídeo (ou áudio) de origem.
+    :return: numpy.ndarray float32 pronto para o Whisper.
+    """
+    # Erros vão para um arquivo temporário: um pipe cheio de stderr travaria o ffmpeg
+    # enquanto o stdout ainda está sendo lido
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(
+            _ffmpeg_pcm_command(video_path, "pipe:1"),
+            stdout=subprocess.PIPE,
+            stderr=stderr_file
+        )
+        # Ler em blocos para um bytearray evita uma cópia extra ao criar o array
+        buffer = bytearray()
+        while True:
+            chunk = process.stdout.read(1 << 20)
+            if not chunk:
+                break
+            buffer += chunk
+        process.stdout.close()
+        if process.wait() != 0:
+            stderr_file.seek(0)
+            raise subprocess.CalledProcessError(process.returncode, "ffmpeg", stderr=stderr_file.read())
+
+    return np.frombuffer(buffer, dtype=np.float32, count=len(buffer) // 4)
+
+
+def load_pcm_mmap(video_path, raw_output_path):
+    """
+    Decodifica o áudio para um arquivo PCM float32 bruto e o mapeia em memória.
+
+    As páginas são carregadas sob demanda, então o processo não precisa manter
+    o áudio inteiro residente de uma só vez.
+
+    :param video_path: Caminho do vídeo de origem.
+    :param raw_output_path: Caminho do arquivo .f32 a ser criado.
+    :return: numpy.memmap float32 (copy-on-write, pode ser usado pelo Whisper).
+    """
+    subprocess.run(_ffmpeg_pcm_command(video_path, raw_output_path), check=True, capture_output=True)
+    if os.path.getsize(raw_output_path) < 4:
+        return np.zeros(0, dtype=np.float32)
+    return np.memmap(raw_output_path, dtype=np.float32, mode="c")
+
+
+def audio_duration(audio):
+    """Duração em segundos de um array PCM no formato do Whisper."""
+    return len(audio) / SAMPLE_RATE
+
+
+def hash_audio(audio, block_samples=1 << 20):
+    """
+    Hash SHA-256 do conteúdo do áudio, usado como chave dos caches.
+
+    :param audio: Array PCM ou caminho de um arquivo de áudio.
+    """
+    digest = hashlib.sha256()
+    if isinstance(audio, np.ndarray):
+        for start in range(0, len(audio), block_samples):
+            digest.update(np.ascontiguousarray(audio[start:start + block_samples]).tobytes())
+    else:
+        with open(audio, "rb") as f:
+            for block in iter(lambda: f.read(1 << 22), b""):
+                digest.update(block)
+    return digest.hexdigest()
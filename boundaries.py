@@ -0,0 +1,154 @@
+import bisect
+import re
+import subprocess
+
+import numpy as np
+
+from audio import SAMPLE_RATE
+
+# Margem mantida entre a borda do clipe e a fala (evita cortar a primeira/última sílaba)
+SPEECH_LEAD_SECONDS = 0.2
+
+
+def silence_map(audio, min_silence_seconds=0.3, threshold_db=-30.0, frame_ms=50, block_seconds=60):
+    """
+    Intervalos de silêncio (pausas) do áudio.
+
+    A energia é calculada por frame como em split_on_silence, em blocos para não
+    duplicar o áudio inteiro na memória. O limiar é relativo ao nível da fala
+    (percentil 90 da energia), então funciona com gravações baixas ou altas.
+
+    :param audio: PCM float32 16 kHz mono.
+    :param min_silence_seconds: Duração mínima de uma pausa.
+    :param threshold_db: Frames abaixo deste nível (em dB relativos à fala) são silêncio.
+    :return: Lista de [início, fim] em segundos.
+    """
+    frame = int(SAMPLE_RATE * frame_ms / 1000)
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return []
+
+    block_frames = max(1, int(block_seconds * 1000 / frame_ms))
+    energy = np.empty(n_frames, dtype=np.float64)
+    for first in range(0, n_frames, block_frames):
+        last = min(n_frames, first + block_frames)
+        block = np.asarray(audio[first * frame:last * frame], dtype=np.float32).reshape(last - first, frame)
+        energy[first:last] = np.square(block).mean(axis=1)
+
+    speech_level = np.percentile(energy, 90)
+    if speech_level <= 0:
+        return []
+    quiet = 10 * np.log10(energy / speech_level + 1e-12) < threshold_db
+
+    # Início e fim de cada sequência de frames silenciosos
+    edges = np.diff(np.concatenate(([0], quiet.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    min_frames = int(np.ceil(min_silence_seconds * 1000 / frame_ms))
+    frame_seconds = frame_ms / 1000
+    return [
+        [round(float(start * frame_seconds), 3), round(float(end * frame_seconds), 3)]
+        for start, end in zip(starts, ends) if end - start >= min_frames
+    ]
+
+
+def scene_cuts(video_path, threshold=0.3, max_width=None, fps=None):
+    """
+    Tempos das trocas de cena do vídeo, com o filtro de detecção de cenas do ffmpeg.
+
+    O ideal é passar o proxy de análise (poucos quadros pequenos); para o vídeo
+    original, max_width e fps reduzem a decodificação da mesma forma.
+
+    :param threshold: Diferença mínima entre quadros (0-1) para considerar uma troca de cena.
+    :return: Lista ordenada de tempos em segundos, ou None em caso de erro.
+    """
+    filters = []
+    if fps:
+        filters.append(f"fps={fps}")
+    if max_width:
+        filters.append(f"scale='min({max_width},iw)':-2")
+    filters += [f"select='gt(scene,{threshold})'", "metadata=print:file=-"]
+    try:
+        result = subprocess.run(
+            ["ffmpeg", "-nostdin", "-v", "error", "-i", video_path, "-an", "-vf", ",".join(filters), "-f", "null", "-"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=True
+        )
+    except Exception as e:
+        print(f"Erro ao detectar trocas de cena: {e}")
+        return None
+    times = re.findall(r"pts_time:([0-9.]+)", result.stdout.decode("utf-8", errors="ignore"))
+    return sorted(round(float(value), 3) for value in times)
+
+
+class BoundarySnapper:
+    """
+    Ajusta as bordas dos clipes para a pausa ou troca de cena mais próxima.
+
+    - O início vai para logo antes da fala recomeçar depois de uma pausa, ou para uma troca de cena.
+    - O fim vai para logo depois da fala parar antes de uma pausa, ou para uma troca de cena.
+    - Sem candidato dentro da tolerância, a borda fica como veio da análise.
+
+    :param silences: Intervalos [início, fim] de silêncio, em segundos (silence_map).
+    :param cuts: Tempos das trocas de cena, em segundos (scene_cuts).
+    :param tolerance: Distância máxima, em segundos, que uma borda pode ser movida.
+    """
+
+    def __init__(self, silences, cuts, tolerance=1.5):
+        self.tolerance = tolerance
+        self.silences = len(silences)
+        self.cuts = len(cuts)
+        self._starts = sorted({max(start, end - SPEECH_LEAD_SECONDS) for start, end in silences} | set(cuts))
+        self._ends = sorted({min(end, start + SPEECH_LEAD_SECONDS) for start, end in silences} | set(cuts))
+        self.snapped_starts = 0
+        self.snapped_ends = 0
+
+    def _nearest(self, candidates, seconds):
+        position = bisect.bisect_left(candidates, seconds)
+        nearby = candidates[max(0, position - 1):position + 1]
+        if not nearby:
+            return None
+        best = min(nearby, key=lambda candidate: abs(candidate - seconds))
+        return best if abs(best - seconds) <= self.tolerance else None
+
+    def refine(self, start_seconds, end_seconds, total_duration=None, min_length=1.0, max_length=None):
+        """
+        Retorna (início, fim) ajustados, dentro dos limites de duração do clipe.
+
+        Se o clipe ajustado sair de [min_length, max_length], tenta manter só uma das
+        bordas ajustadas; se nenhuma combinação couber, retorna as bordas originais.
+        Um clipe que já vem fora dos limites (ex.: encurtado pelo fim do vídeo) não
+        pode ficar ainda mais fora deles.
+        """
+        start = self._nearest(self._starts, start_seconds)
+        end = self._nearest(self._ends, end_seconds)
+        if total_duration is not None and end is not None and end > total_duration:
+            end = None
+        if start is not None:
+            start = max(0.0, start)
+
+        length = end_seconds - start_seconds
+        shortest = min(min_length, length)
+        longest = max(max_length, length) if max_length is not None else None
+
+        for new_start, new_end in ((start, end), (start, None), (None, end)):
+            if new_start is None and new_end is None:
+                break
+            new_start = new_start if new_start is not None else start_seconds
+            new_end = new_end if new_end is not None else end_seconds
+            new_length = new_end - new_start
+            if new_length < shortest or (longest is not None and new_length > longest):
+                continue
+            self.snapped_starts += new_start != start_seconds
+            self.snapped_ends += new_end != end_seconds
+            return new_start, new_end
+        return start_seconds, end_seconds
+
+    def stats(self):
+        return {
+            "silences": self.silences,
+            "scene_cuts": self.cuts,
+            "snapped_starts": int(self.snapped_starts),
+            "snapped_ends": int(self.snapped_ends)
+        }
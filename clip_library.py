@@ -0,0 +1,254 @@
+import base64
+import bisect
+import glob
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+
+def clip_id_for(filename):
+    """ID estável do clipe: o sufixo hexadecimal do nome do arquivo ou um hash do nome."""
+    match = re.search(r" ([0-9a-f]{8})\.mp4$", filename)
+    if match:
+        return match.group(1)
+    return hashlib.sha1(filename.encode("utf-8")).hexdigest()[:16]
+
+
+def title_from_filename(filename):
+    """Título para clipes encontrados no disco sem metadados (mesma regra da listagem antiga)."""
+    title = filename.replace(".mp4", "").replace("_", " ")
+    # Remover o número de sequência no final do título (ex: "_1")
+    title = re.sub(r'_\d+$', '', title)
+    return " ".join(word.capitalize() for word in title.split())
+
+
+def encode_cursor(clip):
+    """Cursor opaco da paginação: a chave de ordenação (título, ID) do último clipe da página."""
+    raw = json.dumps([clip["title"], clip["id"]], ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Lê um cursor gerado por encode_cursor; ValueError se ele for inválido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        title, clip_id = json.loads(raw.decode("utf-8"))
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+    return str(title), str(clip_id)
+
+
+class ClipLibrary:
+    """
+    Índice persistente (SQLite) dos clipes gerados, mantido também em memória.
+
+    - generate_clips registra cada clipe com add() assim que ele fica pronto.
+    - refresh() compara o mtime da pasta de clipes com o da última varredura e só
+      então procura arquivos adicionados ou removidos por fora (outro processo,
+      limpeza manual); nas demais requisições custa um único stat.
+    - A lista em memória fica ordenada por título, então page() é O(limite)
+      independente do tamanho da biblioteca.
+
+    :param db_path: Caminho do arquivo SQLite.
+    :param clips_dir: Pasta dos arquivos .mp4 dos clipes.
+    :param url_prefix: Prefixo das URLs públicas dos arquivos.
+    """
+
+    def __init__(self, db_path, clips_dir, url_prefix="/static/clips"):
+        self.db_path = db_path
+        self.clips_dir = clips_dir
+        self.url_prefix = url_prefix
+        self._lock = threading.Lock()
+        self._clips = []
+        self._keys = []
+        self._by_id = {}
+        self._scanned_mtime = None
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        os.makedirs(clips_dir, exist_ok=True)
+        self._init_db()
+        self._load()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS clips (
+                    id TEXT PRIMARY KEY,
+                    filename TEXT NOT NULL UNIQUE,
+                    title TEXT NOT NULL,
+                    thumbnail TEXT,
+                    duration REAL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE TABLE IF NOT EXISTS library_state (key TEXT PRIMARY KEY, value REAL)")
+
+    def _load(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM clips").fetchall()
+            state = conn.execute("SELECT value FROM library_state WHERE key = 'scanned_mtime'").fetchone()
+        with self._lock:
+            for row in rows:
+                self._insert(dict(row))
+            self._scanned_mtime = state[0] if state else None
+        print(f"Biblioteca de clipes carregada: {len(rows)} clipe(s)")
+
+    @staticmethod
+    def _sort_key(clip):
+        return (clip["title"], clip["id"])
+
+    def _insert(self, clip):
+        clip["url"] = f"{self.url_prefix}/{clip['filename']}"
+        if clip["id"] in self._by_id:
+            self._remove(clip["id"])
+        key = self._sort_key(clip)
+        position = bisect.bisect_left(self._keys, key)
+        self._keys.insert(position, key)
+        self._clips.insert(position, clip)
+        self._by_id[clip["id"]] = clip
+
+    def _remove(self, clip_id):
+        clip = self._by_id.pop(clip_id)
+        position = bisect.bisect_left(self._keys, self._sort_key(clip))
+        del self._keys[position]
+        del self._clips[position]
+
+    def _record(self, filename, title, thumbnail=None, duration=None, created_at=None):
+        return {
+            "id": clip_id_for(filename),
+            "filename": filename,
+            "title": title,
+            "thumbnail": thumbnail,
+            "duration": duration,
+            "created_at": created_at or time.time()
+        }
+
+    def folder_mtime(self):
+        """mtime atual da pasta de clipes, ou None se ela não puder ser lida."""
+        try:
+            return os.stat(self.clips_dir).st_mtime
+        except OSError:
+            return None
+
+    def add(self, path, title, thumbnail_path=None, duration=None, folder_mtime=None):
+        """
+        Registra (ou atualiza) um clipe recém-gerado e retorna o seu registro.
+
+        :param folder_mtime: folder_mtime() lido antes de gravar os arquivos do clipe. Se a pasta
+                             estava sincronizada, as escritas do próprio clipe não exigem nova varredura.
+        """
+        filename = os.path.basename(path)
+        thumbnail = os.path.basename(thumbnail_path) if thumbnail_path and os.path.exists(thumbnail_path) else None
+        clip = self._record(filename, title, thumbnail, duration)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO clips (id, filename, title, thumbnail, duration, created_at) "
+                "VALUES (:id, :filename, :title, :thumbnail, :duration, :created_at)",
+                clip
+            )
+        with self._lock:
+            self._insert(dict(clip))
+            # Outras mudanças desde a última varredura (outro processo, cópia manual) continuam pendentes
+            if folder_mtime is not None and folder_mtime == self._scanned_mtime:
+                self._scanned_mtime = self.folder_mtime()
+        return clip
+
+    def refresh(self):
+        """Sincroniza o índice com a pasta de clipes se ela mudou desde a última varredura."""
+        try:
+            mtime = os.stat(self.clips_dir).st_mtime
+        except OSError:
+            return
+        if mtime == self._scanned_mtime:
+            return
+
+        start = time.perf_counter()
+        on_disk = {os.path.basename(path) for path in glob.glob(os.path.join(self.clips_dir, "*.mp4"))}
+        with self._lock:
+            known = {clip["filename"]: clip["id"] for clip in self._clips}
+
+        # Clipes registrados por outro processo já têm linha no banco (com o título gerado)
+        new_files = sorted(filename for filename in on_disk - known.keys() if not filename.startswith("."))
+        stored = {}
+        with self._connect() as conn:
+            for first in range(0, len(new_files), 500):
+                ids = [clip_id_for(filename) for filename in new_files[first:first + 500]]
+                placeholders = ", ".join("?" for _ in ids)
+                for row in conn.execute(f"SELECT * FROM clips WHERE id IN ({placeholders})", ids):
+                    stored[row["filename"]] = dict(row)
+
+        added = []
+        for filename in new_files:
+            if filename in stored:
+                added.append(stored[filename])
+                continue
+            path = os.path.join(self.clips_dir, filename)
+            thumbnail = filename.replace(".mp4", "_thumbnail.jpg")
+            added.append(self._record(
+                filename,
+                title_from_filename(filename),
+                thumbnail if os.path.exists(os.path.join(self.clips_dir, thumbnail)) else None,
+                created_at=os.path.getmtime(path)
+            ))
+        removed = [known[filename] for filename in known.keys() - on_disk]
+
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO clips (id, filename, title, thumbnail, duration, created_at) "
+                "VALUES (:id, :filename, :title, :thumbnail, :duration, :created_at)",
+                added
+            )
+            conn.executemany("DELETE FROM clips WHERE id = ?", [(clip_id,) for clip_id in removed])
+            conn.execute("INSERT OR REPLACE INTO library_state (key, value) VALUES ('scanned_mtime', ?)", (mtime,))
+
+        with self._lock:
+            for clip in added:
+                self._insert(clip)
+            for clip_id in removed:
+                if clip_id in self._by_id:
+                    self._remove(clip_id)
+            self._scanned_mtime = mtime
+        if added or removed:
+            print(f"Biblioteca de clipes sincronizada em {time.perf_counter() - start:.2f}s "
+                  f"(+{len(added)} / -{len(removed)})")
+
+    def page_after(self, cursor=None, limit=24):
+        """
+        Paginação por cursor: clipes seguintes ao cursor, em ordem de título.
+
+        Diferente do offset, o cursor continua válido quando clipes são adicionados
+        ou removidos antes dele.
+
+        :return: (clipes, próximo cursor ou None, total de clipes).
+        """
+        with self._lock:
+            position = bisect.bisect_right(self._keys, decode_cursor(cursor)) if cursor else 0
+            clips = [dict(clip) for clip in self._clips[position:position + limit]]
+            has_more = position + limit < len(self._clips)
+            total = len(self._clips)
+        return clips, encode_cursor(clips[-1]) if clips and has_more else None, total
+
+    def get(self, clip_id):
+        """Retorna o registro de um clipe, ou None se não existir."""
+        with self._lock:
+            clip = self._by_id.get(clip_id)
+            return dict(clip) if clip else None
+
+    def transcript_path(self, clip):
+        return os.path.join(self.clips_dir, clip["filename"].replace(".mp4", ".txt"))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._clips)
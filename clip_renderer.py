@@ -0,0 +1,428 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+
+# Parâmetros de codificação padrão dos clipes
+DEFAULT_ENCODER_ARGS = ["-c:v", "libx264", "-preset", "fast", "-crf", "23", "-c:a", "aac"]
+
+# Perfis de codificação (x264 em software). Clipes longos usam um preset mais rápido:
+# o ganho de compressão dos presets lentos não compensa o custo em clipes de vários minutos.
+# threads_divisor reduz as threads por ffmpeg para rodar mais processos em paralelo
+# (o x264 escala mal com muitas threads por processo, e o throughput total sobe)
+ENCODE_PROFILES = {
+    "throughput": {"preset": "veryfast", "long_preset": "ultrafast", "crf": 25, "audio_bitrate": "96k", "threads_divisor": 2},
+    "balanced": {"preset": "fast", "long_preset": "veryfast", "crf": 23, "audio_bitrate": "128k", "threads_divisor": 1},
+    "quality": {"preset": "medium", "long_preset": "fast", "crf": 20, "audio_bitrate": "192k", "threads_divisor": 1},
+}
+
+# A partir desta duração (em segundos) o clipe usa o long_preset do perfil
+LONG_CLIP_SECONDS = 600
+
+# Codecs que podem ser copiados diretamente para o MP4 final sem recodificar
+COPYABLE_VIDEO_CODECS = {"h264"}
+COPYABLE_AUDIO_CODECS = {"aac", "mp3", None}
+
+# Perfis H.264 (como o ffprobe os nomeia) que o x264 reproduz nas bordas do smart cut
+SMART_CUT_PROFILES = {"Constrained Baseline": "baseline", "Baseline": "baseline", "Main": "main", "High": "high"}
+
+
+def probe_video(video_path):
+    """
+    Lê codec, resolução, taxa de quadros, duração e presença de áudio com ffprobe.
+
+    :return: Dicionário com video_codec, audio_codec, pix_fmt, sample_aspect_ratio, profile,
+             level, time_base, width, height, fps, duration e has_audio.
+    """
+    result = subprocess.run(
+        ["ffprobe", "-v", "quiet", "-print_format", "json", "-show_streams", "-show_format", video_path],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True
+    )
+    info = json.loads(result.stdout.decode("utf-8"))
+    streams = info.get("streams", [])
+    video = next((stream for stream in streams if stream.get("codec_type") == "video"), {})
+    audio = next((stream for stream in streams if stream.get("codec_type") == "audio"), {})
+    return {
+        "video_codec": video.get("codec_name"),
+        "audio_codec": audio.get("codec_name"),
+        "pix_fmt": video.get("pix_fmt"),
+        "sample_aspect_ratio": video.get("sample_aspect_ratio"),
+        "profile": video.get("profile"),
+        "level": video.get("level"),
+        "time_base": video.get("time_base"),
+        "width": video.get("width"),
+        "height": video.get("height"),
+        "fps": _parse_frame_rate(video.get("avg_frame_rate")),
+        "duration": float(info.get("format", {}).get("duration", 0) or 0),
+        "has_audio": bool(audio)
+    }
+
+
+def _parse_frame_rate(value):
+    try:
+        numerator, _, denominator = (value or "").partition("/")
+        return float(numerator) / float(denominator or 1) or None
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def profile_threads(profile, base_threads):
+    """Threads do x264 por processo ffmpeg no perfil, a partir do valor base configurado."""
+    return max(1, base_threads // ENCODE_PROFILES[profile]["threads_divisor"])
+
+
+def encoder_args_for(profile, threads, clip_seconds=0):
+    """
+    Argumentos de codificação do ffmpeg para um perfil.
+
+    :param profile: Nome do perfil em ENCODE_PROFILES.
+    :param threads: Threads do x264 por processo.
+    :param clip_seconds: Duração do clipe; a partir de LONG_CLIP_SECONDS usa o preset mais rápido do perfil.
+    """
+    settings = ENCODE_PROFILES[profile]
+    preset = settings["long_preset"] if clip_seconds >= LONG_CLIP_SECONDS else settings["preset"]
+    return [
+        "-c:v", "libx264", "-preset", preset, "-crf", str(settings["crf"]),
+        "-c:a", "aac", "-b:a", settings["audio_bitrate"],
+        "-threads", str(threads)
+    ]
+
+
+def can_stream_copy(source_info, resolution):
+    """
+    Indica se os clipes podem ser cortados sem recodificar.
+
+    Só é possível quando o vídeo de origem já está na resolução alvo, com pixels
+    quadrados e em codecs aceitos no MP4 final (o filtro scale não faria nada).
+    """
+    width, height = (int(value) for value in resolution.split("x"))
+    return (
+        source_info.get("video_codec") in COPYABLE_VIDEO_CODECS
+        and source_info.get("audio_codec") in COPYABLE_AUDIO_CODECS
+        and source_info.get("pix_fmt") == "yuv420p"
+        and source_info.get("sample_aspect_ratio") in (None, "1:1", "0:1", "N/A")
+        and (source_info.get("width"), source_info.get("height")) == (width, height)
+    )
+
+
+def smart_cut_edge_args(source_info, encoder_args=None):
+    """
+    Argumentos para recodificar as bordas do smart cut com os parâmetros do vídeo de origem.
+
+    As bordas recodificadas são concatenadas com o trecho copiado, então precisam do
+    mesmo perfil, nível e formato de pixel da origem; os cabeçalhos SPS/PPS vão em
+    cada keyframe (repeat-headers) para o decodificador trocar de parâmetros entre as partes.
+
+    :param source_info: Resultado de probe_video do vídeo de origem.
+    :return: Lista de argumentos do ffmpeg, ou None se a origem não puder ser reproduzida
+             pelo x264 (o clipe deve ser recodificado inteiro).
+    """
+    profile = SMART_CUT_PROFILES.get(source_info.get("profile"))
+    level = source_info.get("level")
+    if (source_info.get("video_codec") != "h264" or not profile or not isinstance(level, int) or level <= 0
+            or source_info.get("pix_fmt") != "yuv420p" or not _timescale(source_info.get("time_base"))):
+        return None
+
+    # Só os argumentos de vídeo do perfil (as bordas não têm áudio)
+    video_args = []
+    args = list(encoder_args or DEFAULT_ENCODER_ARGS)
+    for option, value in zip(args[::2], args[1::2]):
+        if option in ("-c:v", "-preset", "-crf", "-threads"):
+            video_args += [option, value]
+    return video_args + [
+        "-profile:v", profile,
+        "-level:v", f"{level // 10}.{level % 10}",
+        "-pix_fmt", source_info["pix_fmt"],
+        "-x264-params", "repeat-headers=1"
+    ]
+
+
+def _timescale(time_base):
+    """Denominador de um time_base do ffprobe ("1/15360" -> 15360), ou None."""
+    numerator, _, denominator = (time_base or "").partition("/")
+    return int(denominator) if numerator == "1" and denominator.isdigit() and int(denominator) > 0 else None
+
+
+def find_keyframes(video_path, start_seconds, end_seconds, margin=30):
+    """
+    Lista os tempos dos keyframes próximos ao intervalo, lendo apenas os pacotes (sem decodificar).
+
+    :return: Lista ordenada de tempos em segundos.
+    """
+    result = subprocess.run(
+        [
+            "ffprobe", "-v", "error", "-select_streams", "v:0",
+            "-read_intervals", f"{max(0, start_seconds - margin)}%{end_seconds + margin}",
+            "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", video_path
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True
+    )
+    keyframes = []
+    for line in result.stdout.decode("utf-8").splitlines():
+        parts = line.strip().split(",")
+        if len(parts) >= 2 and "K" in parts[1] and parts[0] not in ("", "N/A"):
+            keyframes.append(float(parts[0]))
+    return sorted(keyframes)
+
+
+def run_ffmpeg(command):
+    """
+    Executa um comando ffmpeg lendo o relatório de -progress.
+
+    :param command: Comando começando por "ffmpeg".
+    :return: Frames de vídeo codificados (frame= do relatório, referente à primeira saída), ou None.
+    :raises subprocess.CalledProcessError: Se o ffmpeg falhar.
+    """
+    result = subprocess.run(
+        [command[0], "-nostats", "-progress", "pipe:1", *command[1:]],
+        stdout=subprocess.PIPE,
+        check=True
+    )
+    frames = re.findall(rb"^frame=(\d+)", result.stdout, re.MULTILINE)
+    return int(frames[-1]) if frames else None
+
+
+def count_frames(video_path):
+    """Número de frames de vídeo de um MP4, lido do cabeçalho do container (sem decodificar), ou None."""
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries", "stream=nb_frames",
+             "-of", "csv=p=0", video_path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=True
+        )
+        return int(result.stdout.decode("utf-8").strip())
+    except (subprocess.CalledProcessError, ValueError):
+        return None
+
+
+def seconds_to_timestamp(seconds):
+    """Formata segundos como HH:MM:SS.mmm para o ffmpeg."""
+    hours, remainder = divmod(max(0.0, seconds), 3600)
+    minutes, secs = divmod(remainder, 60)
+    return f"{int(hours):02}:{int(minutes):02}:{secs:06.3f}"
+
+
+def scale_filter(resolution):
+    """Filtro padrão: redimensiona para a resolução alvo e corrige a proporção."""
+    return f"scale={resolution},setsar=1:1"
+
+
+def build_seek_command(video_path, start_seconds, end_seconds, output_path, video_filter, encoder_args=None):
+    """
+    Comando ffmpeg de um clipe com seek na entrada (-ss antes de -i).
+
+    O ffmpeg pula direto para o keyframe anterior ao início em vez de decodificar
+    o vídeo desde o começo, então o custo não depende da posição do clipe.
+    """
+    return [
+        "ffmpeg", "-y",
+        "-ss", seconds_to_timestamp(start_seconds),
+        "-i", video_path,
+        "-t", seconds_to_timestamp(end_seconds - start_seconds),
+        "-vf", video_filter,
+        *(encoder_args or DEFAULT_ENCODER_ARGS),
+        output_path
+    ]
+
+
+def render_clip(video_path, clip, encoder_args=None):
+    """
+    Renderiza um clipe com seek na entrada.
+
+    :param clip: Dicionário com start_seconds, end_seconds, output_path e video_filter;
+                 cut_mode opcional: "encode" (padrão), "copy" ou "smart_cut";
+                 encoder_args opcional, que substitui os do parâmetro para este clipe.
+                 Na recodificação, os frames codificados ficam em clip["encoded_frames"].
+    :return: Tempo de codificação em segundos.
+    """
+    cut_mode = clip.get("cut_mode", "encode")
+    encoder_args = clip.get("encoder_args") or encoder_args
+    if cut_mode == "copy":
+        return render_stream_copy(video_path, clip)
+    if cut_mode == "smart_cut":
+        return render_smart_cut(video_path, clip, encoder_args, clip.get("source_info"))
+
+    command = build_seek_command(
+        video_path, clip["start_seconds"], clip["end_seconds"], clip["output_path"],
+        clip["video_filter"], encoder_args
+    )
+    print(f"Comando FFmpeg: {' '.join(command)}")  # Log do comando
+    start = time.perf_counter()
+    clip["encoded_frames"] = run_ffmpeg(command)
+    return time.perf_counter() - start
+
+
+def render_stream_copy(video_path, clip):
+    """
+    Corta o clipe sem recodificar, começando no keyframe anterior ao início.
+
+    O clipe pode começar até um GOP antes do pedido, mas o custo é só de I/O.
+
+    :return: Tempo do corte em segundos.
+    """
+    start = time.perf_counter()
+    keyframes = find_keyframes(video_path, clip["start_seconds"], clip["end_seconds"])
+    previous = [keyframe for keyframe in keyframes if keyframe <= clip["start_seconds"]]
+    cut_start = previous[-1] if previous else clip["start_seconds"]
+
+    command = [
+        "ffmpeg", "-y",
+        "-ss", seconds_to_timestamp(cut_start),
+        "-i", video_path,
+        "-t", seconds_to_timestamp(clip["end_seconds"] - cut_start),
+        "-map", "0:v:0", "-map", "0:a?",
+        "-c", "copy",
+        "-avoid_negative_ts", "make_zero",
+        "-movflags", "+faststart",
+        clip["output_path"]
+    ]
+    print(f"Comando FFmpeg (cópia de stream): {' '.join(command)}")  # Log do comando
+    subprocess.run(command, check=True)
+    return time.perf_counter() - start
+
+
+def render_smart_cut(video_path, clip, encoder_args=None, source_info=None):
+    """
+    Corte preciso recodificando apenas as bordas do clipe.
+
+    O trecho entre o primeiro e o último keyframe dentro do clipe é copiado; só o
+    GOP parcial de cada borda é recodificado, com perfil, nível e formato de pixel da
+    origem (smart_cut_edge_args). As partes são geradas em MPEG-TS, com os cabeçalhos
+    SPS/PPS antes de cada keyframe e a mesma base de tempo, e só o arquivo final volta
+    para MP4 com a base de tempo da origem. O áudio é recodificado inteiro (é barato)
+    para evitar descontinuidades entre as partes. Se a origem não for compatível,
+    o clipe é recodificado inteiro.
+
+    :param source_info: Resultado de probe_video do vídeo de origem (lido se não informado).
+    :return: Tempo do corte em segundos.
+    """
+    start = time.perf_counter()
+    source_info = source_info or probe_video(video_path)
+    edge_args = smart_cut_edge_args(source_info, encoder_args)
+    if edge_args is None:
+        print(f"Vídeo de origem incompatível com smart cut ({source_info.get('profile')}, "
+              f"nível {source_info.get('level')}, {source_info.get('pix_fmt')}): recodificando o clipe inteiro")
+        return render_clip(video_path, dict(clip, cut_mode="encode"), encoder_args)
+
+    clip_start, clip_end = clip["start_seconds"], clip["end_seconds"]
+    keyframes = [
+        keyframe for keyframe in find_keyframes(video_path, clip_start, clip_end, margin=0)
+        if clip_start <= keyframe <= clip_end
+    ]
+    if len(keyframes) < 2:
+        # Clipe menor que um GOP: recodificar tudo
+        return render_clip(video_path, dict(clip, cut_mode="encode"), encoder_args)
+
+    first_keyframe, last_keyframe = keyframes[0], keyframes[-1]
+    work_dir = tempfile.mkdtemp(prefix=".smartcut-", dir=os.path.dirname(clip["output_path"]) or ".")
+    try:
+        parts = []
+        ranges = [
+            ("head", clip_start, first_keyframe, True),
+            ("middle", first_keyframe, last_keyframe, False),
+            ("tail", last_keyframe, clip_end, True)
+        ]
+        for name, part_start, part_end, encode in ranges:
+            if part_end - part_start < 0.01:
+                continue
+            part_path = os.path.join(work_dir, f"{name}.ts")
+            command = [
+                "ffmpeg", "-y",
+                "-ss", seconds_to_timestamp(part_start),
+                "-i", video_path,
+                "-t", seconds_to_timestamp(part_end - part_start),
+                "-map", "0:v:0", "-an"
+            ]
+            if encode:
+                command += edge_args
+            else:
+                # Cabeçalhos da origem repetidos em cada keyframe do trecho copiado
+                command += ["-c:v", "copy", "-bsf:v", "h264_mp4toannexb,dump_extra=freq=keyframe"]
+            subprocess.run(command + ["-f", "mpegts", part_path], check=True)
+            parts.append(part_path)
+
+        list_path = os.path.join(work_dir, "parts.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            for part_path in parts:
+                f.write(f"file '{os.path.abspath(part_path)}'\n")
+
+        # Juntar as partes de vídeo e adicionar o áudio cortado com precisão
+        command = [
+            "ffmpeg", "-y",
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-ss", seconds_to_timestamp(clip_start), "-t", seconds_to_timestamp(clip_end - clip_start),
+            "-i", video_path,
+            "-map", "0:v:0", "-map", "1:a?",
+            "-c:v", "copy", "-c:a", "aac",
+            "-video_track_timescale", str(_timescale(source_info["time_base"])),
+            "-movflags", "+faststart",
+            clip["output_path"]
+        ]
+        print(f"Comando FFmpeg (smart cut): {' '.join(command)}")  # Log do comando
+        subprocess.run(command, check=True)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return time.perf_counter() - start
+
+
+def build_single_pass_command(video_path, clips, has_audio=True, encoder_args=None):
+    """
+    Comando ffmpeg que gera todos os clipes em uma única decodificação.
+
+    A entrada é aberta uma vez (com seek até o primeiro clipe), o vídeo e o áudio
+    são divididos com split/asplit e cada ramo é recortado com trim/atrim.
+    """
+    first_start = min(clip["start_seconds"] for clip in clips)
+    count = len(clips)
+
+    graph = [f"[0:v]split={count}" + "".join(f"[v{i}]" for i in range(count))]
+    if has_audio:
+        graph.append(f"[0:a]asplit={count}" + "".join(f"[a{i}]" for i in range(count)))
+
+    for i, clip in enumerate(clips):
+        start = clip["start_seconds"] - first_start
+        end = clip["end_seconds"] - first_start
+        graph.append(f"[v{i}]trim=start={start:.3f}:end={end:.3f},setpts=PTS-STARTPTS,{clip['video_filter']}[vo{i}]")
+        if has_audio:
+            graph.append(f"[a{i}]atrim=start={start:.3f}:end={end:.3f},asetpts=PTS-STARTPTS[ao{i}]")
+
+    command = [
+        "ffmpeg", "-y",
+        "-ss", seconds_to_timestamp(first_start),
+        "-i", video_path,
+        "-filter_complex", ";".join(graph)
+    ]
+    for i, clip in enumerate(clips):
+        command += ["-map", f"[vo{i}]"]
+        if has_audio:
+            command += ["-map", f"[ao{i}]"]
+        command += [*(clip.get("encoder_args") or encoder_args or DEFAULT_ENCODER_ARGS), clip["output_path"]]
+    return command
+
+
+def render_single_pass(video_path, clips, has_audio=True, encoder_args=None):
+    """
+    Renderiza todos os clipes em uma única passada sobre o vídeo de origem.
+
+    O relatório de -progress só conta os frames da primeira saída, então os frames
+    de cada clipe (clip["encoded_frames"]) são lidos do arquivo gerado.
+
+    :return: Tempo total de codificação em segundos.
+    """
+    command = build_single_pass_command(video_path, clips, has_audio, encoder_args)
+    print(f"Comando FFmpeg (passada única, {len(clips)} clipes): {' '.join(command)}")  # Log do comando
+    start = time.perf_counter()
+    run_ffmpeg(command)
+    encode_seconds = time.perf_counter() - start
+    for clip in clips:
+        clip["encoded_frames"] = count_frames(clip["output_path"])
+    return encode_seconds
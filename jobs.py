@@ -0,0 +1,351 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+# Estados possíveis de um job
+JOB_WAITING = "waiting"  # Criado, mas aguardando a entrada (ex.: upload em partes)
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class PipelineError(Exception):
+    """Falha esperada de uma etapa do pipeline (mensagem exibida ao usuário)."""
+
+
+class JobReporter:
+    """
+    Reporta o progresso de um job etapa por etapa.
+
+    O progresso geral (0-100) é calculado a partir do peso de cada etapa,
+    de forma que a barra de progresso reflita o trabalho realmente feito.
+    """
+
+    def __init__(self, queue, job_id, stages):
+        self.queue = queue
+        self.job_id = job_id
+        self.weights = dict(stages)
+        self.total_weight = sum(self.weights.values()) or 1
+        self.stages = {
+            name: {"status": "pending", "progress": 0, "elapsed": None}
+            for name, _ in stages
+        }
+        self._started_at = {}
+        self.current = None
+
+    def _overall_progress(self):
+        done = 0.0
+        for name, info in self.stages.items():
+            done += self.weights.get(name, 0) * info["progress"] / 100
+        return round(100 * done / self.total_weight, 1)
+
+    def _save(self, message=None):
+        self.queue.update_progress(
+            self.job_id, self.current, self._overall_progress(), self.stages, message
+        )
+
+    def start_stage(self, name, message=None, background=False):
+        """
+        Marca uma etapa como em execução.
+
+        :param background: Se True, a etapa roda em paralelo e não vira a etapa atual.
+                           Iniciar de novo uma etapa em execução (ex.: passar a esperar
+                           por ela) só a torna a atual, mantendo o tempo de início.
+        """
+        info = self.stages.setdefault(name, {"status": "pending", "progress": 0, "elapsed": None})
+        if not background:
+            self.current = name
+        if info["status"] != JOB_RUNNING or name not in self._started_at:
+            self._started_at[name] = time.time()
+        info["status"] = JOB_RUNNING
+        self._save(message)
+
+    def stage_progress(self, name, fraction, message=None):
+        info = self.stages.setdefault(name, {"status": JOB_RUNNING, "progress": 0, "elapsed": None})
+        info["progress"] = round(100 * min(max(fraction, 0.0), 1.0), 1)
+        self._save(message)
+
+    def finish_stage(self, name, message=None):
+        info = self.stages.setdefault(name, {"status": JOB_RUNNING, "progress": 0, "elapsed": None})
+        info["status"] = JOB_DONE
+        info["progress"] = 100
+        if name in self._started_at:
+            info["elapsed"] = round(time.time() - self._started_at[name], 3)
+        self._save(message)
+
+
+class JobQueue:
+    """
+    Fila de jobs persistida em SQLite e processada por um pool limitado de workers.
+
+    Cada job em execução pertence a um processo (owner = host:pid) e tem um lease
+    renovado periodicamente. Só jobs com o lease vencido (o processo que os
+    executava parou) voltam a ser executados, até max_attempts tentativas, então
+    vários processos podem compartilhar o mesmo banco sem roubar jobs uns dos outros.
+
+    :param db_path: Caminho do arquivo SQLite.
+    :param handler: Função chamada como handler(job_id, params, reporter); retorna o resultado do job.
+    :param stages: Lista de (nome_da_etapa, peso) usada para calcular o progresso.
+    :param num_workers: Número máximo de jobs executados em paralelo.
+    :param lease_seconds: Validade do lease de um job em execução sem renovação.
+    :param max_attempts: Número máximo de execuções de um job antes de marcá-lo como falho.
+    """
+
+    def __init__(self, db_path, handler, stages, num_workers=1, poll_interval=2.0,
+                 lease_seconds=120, max_attempts=3):
+        self.db_path = db_path
+        self.handler = handler
+        self.stages = stages
+        self.num_workers = max(1, int(num_workers))
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, int(max_attempts))
+        self.owner = None
+        self._claim_lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._workers = []
+        self._active = set()
+        self._active_lock = threading.Lock()
+        self._started = False
+
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self):
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    progress REAL NOT NULL DEFAULT 0,
+                    stages TEXT,
+                    message TEXT,
+                    params TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+
+            # Bancos criados antes do lease por processo
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for name, definition in (("owner", "TEXT"), ("lease_until", "REAL"),
+                                     ("attempts", "INTEGER NOT NULL DEFAULT 0")):
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+
+    def start(self):
+        """
+        Inicia os workers e a renovação dos leases deste processo.
+
+        Deve ser chamado explicitamente pelo ponto de entrada da aplicação (nunca
+        na importação), uma vez por processo.
+        """
+        if self._started:
+            return
+        self._started = True
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+        for i in range(self.num_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True).start()
+        print(f"Fila de jobs iniciada com {self.num_workers} worker(s) ({self.owner})")
+
+    def new_job_id(self):
+        return uuid.uuid4().hex
+
+    def enqueue(self, params, job_id=None, waiting=False):
+        """
+        Adiciona um job à fila e retorna o seu ID.
+
+        :param waiting: Se True, o job fica aguardando release() antes de poder ser executado.
+        """
+        job_id = job_id or self.new_job_id()
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, progress, params, created_at, updated_at) VALUES (?, ?, 0, ?, ?, ?)",
+                (job_id, JOB_WAITING if waiting else JOB_QUEUED, json.dumps(params), now, now)
+            )
+        if waiting:
+            print(f"Job aguardando entrada: {job_id}")
+            return job_id
+        with self._wakeup:
+            self._wakeup.notify()
+        print(f"Job enfileirado: {job_id}")
+        return job_id
+
+    def release(self, job_id, params=None):
+        """
+        Libera um job em espera para execução, atualizando os parâmetros se informados.
+
+        :return: True se o job estava em espera e foi enfileirado.
+        """
+        with self._connect() as conn:
+            if params is None:
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                    (JOB_QUEUED, time.time(), job_id, JOB_WAITING)
+                )
+            else:
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = ?, params = ?, updated_at = ? WHERE id = ? AND status = ?",
+                    (JOB_QUEUED, json.dumps(params), time.time(), job_id, JOB_WAITING)
+                )
+        if not cursor.rowcount:
+            return False
+        with self._wakeup:
+            self._wakeup.notify()
+        print(f"Job enfileirado: {job_id}")
+        return True
+
+    def get(self, job_id):
+        """Retorna o estado de um job como dicionário, ou None se não existir."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row:
+            return None
+
+        job = dict(row)
+        job["params"] = json.loads(job["params"]) if job["params"] else {}
+        job["stages"] = json.loads(job["stages"]) if job["stages"] else {}
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def queue_depth(self):
+        """Número de jobs aguardando ou em execução."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (JOB_QUEUED, JOB_RUNNING)
+            ).fetchone()
+        return row[0]
+
+    def update_progress(self, job_id, stage, progress, stages, message=None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET stage = ?, progress = ?, stages = ?, message = COALESCE(?, message), updated_at = ? WHERE id = ? AND owner = ?",
+                (stage, progress, json.dumps(stages), message, time.time(), job_id, self.owner)
+            )
+
+    def _finish(self, job_id, status, result=None, error=None):
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, progress = CASE WHEN ? = ? THEN 100 ELSE progress END, lease_until = NULL, updated_at = ? WHERE id = ? AND owner = ?",
+                (status, json.dumps(result) if result is not None else None, error,
+                 status, JOB_DONE, time.time(), job_id, self.owner)
+            )
+        if not cursor.rowcount:
+            print(f"Job {job_id} foi assumido por outro processo; resultado descartado")
+
+    def _renew_leases(self):
+        """Estende o lease dos jobs em execução neste processo."""
+        with self._active_lock:
+            job_ids = list(self._active)
+        if not job_ids:
+            return
+        placeholders = ", ".join("?" for _ in job_ids)
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET lease_until = ? WHERE owner = ? AND status = ? AND id IN ({placeholders})",
+                (time.time() + self.lease_seconds, self.owner, JOB_RUNNING, *job_ids)
+            )
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            try:
+                self._renew_leases()
+            except Exception as e:
+                print(f"Erro ao renovar leases dos jobs: {e}")
+
+    def _claim_next(self):
+        """
+        Marca atomicamente o job mais antigo da fila como em execução por este processo.
+
+        Jobs em execução com o lease vencido são assumidos de novo; os que já
+        esgotaram as tentativas são marcados como falhos.
+        """
+        with self._claim_lock:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                now = time.time()
+                expired = "status = ? AND (lease_until IS NULL OR lease_until < ?)"
+                cursor = conn.execute(
+                    f"UPDATE jobs SET status = ?, error = ?, lease_until = NULL, updated_at = ? WHERE {expired} AND attempts >= ?",
+                    (JOB_FAILED, f"Processamento interrompido após {self.max_attempts} tentativa(s)",
+                     now, JOB_RUNNING, now, self.max_attempts)
+                )
+                if cursor.rowcount:
+                    print(f"Jobs abandonados após {self.max_attempts} tentativa(s): {cursor.rowcount}")
+                row = conn.execute(
+                    f"SELECT id, params, status FROM jobs WHERE status = ? OR ({expired}) ORDER BY created_at LIMIT 1",
+                    (JOB_QUEUED, JOB_RUNNING, now)
+                ).fetchone()
+                if not row:
+                    conn.execute("COMMIT")
+                    return None, None
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = NULL, owner = ?, lease_until = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (JOB_RUNNING, self.owner, now + self.lease_seconds, now, row["id"])
+                )
+                conn.execute("COMMIT")
+                if row["status"] == JOB_RUNNING:
+                    print(f"Job {row['id']} retomado: o lease do processo anterior venceu")
+                return row["id"], json.loads(row["params"])
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+
+    def _worker_loop(self):
+        while True:
+            try:
+                job_id, params = self._claim_next()
+            except Exception as e:
+                print(f"Erro ao obter próximo job da fila: {e}")
+                job_id, params = None, None
+
+            if not job_id:
+                with self._wakeup:
+                    self._wakeup.wait(self.poll_interval)
+                continue
+
+            print(f"Iniciando job {job_id}")
+            reporter = JobReporter(self, job_id, self.stages)
+            with self._active_lock:
+                self._active.add(job_id)
+            try:
+                result = self.handler(job_id, params, reporter)
+                self._finish(job_id, JOB_DONE, result=result)
+                print(f"Job concluído: {job_id}")
+            except PipelineError as e:
+                print(f"Job {job_id} falhou: {e}")
+                self._finish(job_id, JOB_FAILED, error=str(e))
+            except Exception as e:
+                print(f"Erro inesperado no job {job_id}: {e}")
+                traceback.print_exc()
+                self._finish(job_id, JOB_FAILED, error=f"Erro durante o processamento: {str(e)}")
+            finally:
+                with self._active_lock:
+                    self._active.discard(job_id)
@@ -0,0 +1,218 @@
+import random
+import threading
+import time
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+try:
+    from requests import exceptions as requests_exceptions
+    _REQUESTS_ERRORS = (requests_exceptions.ConnectionError, requests_exceptions.Timeout)
+except ImportError:
+    _REQUESTS_ERRORS = ()
+
+# Erros transitórios que valem uma nova tentativa (limite de taxa, indisponibilidade, rede)
+RETRYABLE_ERRORS = (
+    google_exceptions.TooManyRequests,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.GatewayTimeout,
+    google_exceptions.DeadlineExceeded,
+    ConnectionError,
+    TimeoutError,
+    *_REQUESTS_ERRORS
+)
+
+
+class LLMError(Exception):
+    """Falha definitiva de uma chamada ao LLM (após as novas tentativas)."""
+
+
+class LLMTimeoutError(LLMError):
+    """O prazo total da chamada acabou antes de uma resposta válida."""
+
+
+class TokenBucket:
+    """
+    Limitador de taxa por token bucket.
+
+    :param rate_per_minute: Chamadas permitidas por minuto em regime contínuo.
+    :param burst: Chamadas que podem ser feitas de uma vez com o balde cheio.
+    """
+
+    def __init__(self, rate_per_minute, burst):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline):
+        """
+        Retira um token, esperando se necessário.
+
+        :param deadline: Instante (time.monotonic) limite para conseguir o token.
+        :return: Tempo esperado em segundos.
+        :raises LLMTimeoutError: Se o token não ficar disponível antes do prazo.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                raise LLMTimeoutError("Prazo esgotado aguardando o limitador de taxa")
+            time.sleep(wait)
+            waited += wait
+
+
+class GeminiClient:
+    """
+    Cliente compartilhado da Gemini.
+
+    - Configura a API e cria o GenerativeModel uma única vez; o handle (e as
+      conexões HTTP do transporte) é reutilizado por todas as chamadas.
+    - Limita a taxa (token bucket) e o número de chamadas simultâneas.
+    - Cada chamada tem um prazo total: cada tentativa recebe apenas o tempo restante.
+    - Erros transitórios são repetidos com backoff exponencial com jitter.
+    - Registra latência, tentativas e erros por tipo de chamada.
+
+    :param api_key: Chave da API.
+    :param model_name: Nome do modelo (ex.: "gemini-1.5-flash").
+    :param requests_per_minute: Taxa máxima de chamadas.
+    :param max_concurrency: Chamadas simultâneas permitidas.
+    :param timeout: Prazo total de cada chamada em segundos, incluindo as novas tentativas.
+    :param max_retries: Novas tentativas após a primeira falha transitória.
+    :param backoff_base: Espera base do backoff em segundos.
+    :param backoff_max: Espera máxima entre tentativas em segundos.
+    :param api_endpoint: Endpoint alternativo (ex.: "http://127.0.0.1:8765" para um servidor falso local).
+    """
+
+    def __init__(self, api_key, model_name, requests_per_minute=60, max_concurrency=4, timeout=60.0,
+                 max_retries=3, backoff_base=1.0, backoff_max=20.0, api_endpoint=None):
+        self.model_name = model_name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        if api_endpoint:
+            # Transporte REST aceita endpoints http:// (servidor falso para testes)
+            genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": api_endpoint})
+        else:
+            genai.configure(api_key=api_key)
+        self._model = genai.GenerativeModel(model_name)
+
+        self._bucket = TokenBucket(requests_per_minute, burst=max_concurrency)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _record(self, name, field, value=1):
+        with self._lock:
+            metrics = self._metrics.setdefault(name, {
+                "calls": 0, "errors": 0, "timeouts": 0, "retries": 0,
+                "latency_seconds_total": 0.0, "latency_seconds_max": 0.0, "rate_limit_wait_seconds": 0.0,
+                "last_error": None
+            })
+            if field == "latency":
+                metrics["latency_seconds_total"] += value
+                metrics["latency_seconds_max"] = max(metrics["latency_seconds_max"], value)
+            elif field == "last_error":
+                metrics["last_error"] = value
+            else:
+                metrics[field] += value
+
+    def _backoff(self, attempt):
+        # Full jitter: espera aleatória entre 0 e o teto exponencial
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def generate(self, prompt, generation_config=None, name="generate", timeout=None):
+        """
+        Gera uma resposta de texto.
+
+        :param prompt: Prompt enviado ao modelo.
+        :param generation_config: GenerationConfig opcional (ex.: resposta em JSON).
+        :param name: Nome da chamada usado nas métricas (ex.: "analysis", "titles").
+        :param timeout: Prazo total em segundos (padrão: o do cliente).
+        :return: Texto da resposta.
+        :raises LLMTimeoutError: Se o prazo acabar.
+        :raises LLMError: Se a chamada falhar de forma definitiva.
+        """
+        start = time.monotonic()
+        deadline = start + (timeout or self.timeout)
+        self._record(name, "calls")
+        attempt = 0
+        try:
+            while True:
+                self._record(name, "rate_limit_wait_seconds", self._bucket.acquire(deadline))
+                # A espera por uma vaga de chamada simultânea também conta no prazo
+                if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                    raise LLMTimeoutError(f"Prazo de {timeout or self.timeout}s esgotado")
+                try:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise LLMTimeoutError(f"Prazo de {timeout or self.timeout}s esgotado")
+                    response = self._model.generate_content(
+                        prompt,
+                        generation_config=generation_config,
+                        request_options={"timeout": remaining, "retry": None}
+                    )
+                    return self._response_text(response)
+                except RETRYABLE_ERRORS as e:
+                    wait = self._backoff(attempt)
+                    if attempt >= self.max_retries:
+                        raise LLMError(f"Falha após {attempt + 1} tentativa(s): {e}") from e
+                    if time.monotonic() + wait >= deadline:
+                        raise LLMTimeoutError(f"Prazo esgotado após {attempt + 1} tentativa(s): {e}") from e
+                    attempt += 1
+                    self._record(name, "retries")
+                    print(f"Gemini ({name}): erro transitório ({type(e).__name__}), nova tentativa {attempt} em {wait:.2f}s")
+                finally:
+                    self._slots.release()
+                # Esperar fora da vaga, para não bloquear outras chamadas durante o backoff
+                time.sleep(wait)
+        except LLMTimeoutError as e:
+            self._record(name, "timeouts")
+            self._record(name, "errors")
+            self._record(name, "last_error", str(e))
+            raise
+        except Exception as e:
+            self._record(name, "errors")
+            self._record(name, "last_error", str(e))
+            if isinstance(e, LLMError):
+                raise
+            raise LLMError(str(e)) from e
+        finally:
+            latency = time.monotonic() - start
+            self._record(name, "latency", latency)
+            print(f"Gemini ({name}): {latency:.2f}s, {attempt + 1} tentativa(s)")
+
+    @staticmethod
+    def _response_text(response):
+        try:
+            text = response.text if response else None
+        except ValueError as e:
+            # Resposta sem partes de texto (ex.: bloqueada por segurança)
+            raise LLMError(f"Resposta sem texto: {e}") from e
+        if not text or not text.strip():
+            raise LLMError("Resposta vazia da Gemini API")
+        return text
+
+    def stats(self):
+        with self._lock:
+            calls = {}
+            for name, metrics in self._metrics.items():
+                metrics = dict(metrics)
+                metrics["latency_seconds_avg"] = round(metrics["latency_seconds_total"] / metrics["calls"], 3) if metrics["calls"] else None
+                metrics["latency_seconds_total"] = round(metrics["latency_seconds_total"], 3)
+                metrics["latency_seconds_max"] = round(metrics["latency_seconds_max"], 3)
+                metrics["rate_limit_wait_seconds"] = round(metrics["rate_limit_wait_seconds"], 3)
+                calls[name] = metrics
+            return {"model": self.model_name, "calls": calls}
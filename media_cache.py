@@ -0,0 +1,204 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+
+class MediaCache:
+    """
+    Cache compartilhado de mídias baixadas (ex.: vídeos do YouTube).
+
+    - Cada entrada é identificada por uma chave (ID do vídeo + formato).
+    - Downloads concorrentes da mesma chave são deduplicados (single-flight):
+      o primeiro pedido baixa e os demais esperam pelo mesmo arquivo.
+    - Entradas em uso pelos jobs ficam "pinadas" e nunca são removidas; as demais
+      são removidas das menos usadas para as mais usadas quando o limite é excedido.
+
+    :param root: Pasta do cache.
+    :param max_bytes: Tamanho máximo do cache em bytes.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._inflight = {}
+        self._pins = {}
+        self._metrics = {
+            "hits": 0, "misses": 0, "deduplicated_waits": 0, "downloads": 0,
+            "download_errors": 0, "evictions": 0, "download_seconds": 0.0, "downloaded_bytes": 0
+        }
+        os.makedirs(root, exist_ok=True)
+        self._load_index()
+        self._remove_orphan_downloads()
+
+    def _meta_path(self, key):
+        return os.path.join(self.root, f"{key}.json")
+
+    def _load_index(self):
+        for name in os.listdir(self.root):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.root, name), "r", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if os.path.exists(entry.get("path", "")):
+                entry["last_used"] = os.path.getmtime(entry["path"])
+                self._entries[name[:-len(".json")]] = entry
+
+    def _remove_orphan_downloads(self):
+        """
+        Remove pastas temporárias de downloads interrompidos (ex.: o processo caiu no meio).
+
+        As pastas levam o PID do processo que baixa ({chave}-{pid}-...); só são removidas
+        as de processos que não estão mais rodando, então outro processo usando o mesmo
+        cache não perde um download em andamento. Nenhuma entrada do índice aponta para elas.
+        """
+        removed = 0
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not os.path.isdir(path):
+                continue
+            parts = name.rsplit("-", 2)
+            pid = int(parts[1]) if len(parts) == 3 and parts[1].isdigit() else None
+            if pid is not None and _process_running(pid):
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+        if removed:
+            print(f"Downloads interrompidos removidos do cache de mídia: {removed}")
+
+    def contains(self, key):
+        """Indica se a mídia já está no cache (sem reservá-la)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return bool(entry) and os.path.exists(entry["path"])
+
+    def fetch(self, key, download_fn):
+        """
+        Retorna (título, caminho) da mídia, baixando-a apenas se necessário.
+
+        :param key: Chave da mídia.
+        :param download_fn: Função download_fn(pasta_temporária) que retorna (título, caminho).
+        O caminho retornado fica pinado até release(caminho) ser chamado.
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry and os.path.exists(entry["path"]):
+                    self._metrics["hits"] += 1
+                    self._pin(key, entry)
+                    print(f"Mídia encontrada no cache: {key}")
+                    return entry["title"], entry["path"]
+
+                event = self._inflight.get(key)
+                if event is None:
+                    # Este pedido será o responsável pelo download
+                    event = threading.Event()
+                    self._inflight[key] = event
+                    self._metrics["misses"] += 1
+                    break
+                self._metrics["deduplicated_waits"] += 1
+
+            print(f"Aguardando download em andamento: {key}")
+            event.wait()
+
+        try:
+            return self._download(key, download_fn)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def _download(self, key, download_fn):
+        tmp_dir = tempfile.mkdtemp(prefix=f"{key}-{os.getpid()}-", dir=self.root)
+        start = time.perf_counter()
+        try:
+            title, downloaded_path = download_fn(tmp_dir)
+            if not downloaded_path or not os.path.exists(downloaded_path):
+                with self._lock:
+                    self._metrics["download_errors"] += 1
+                return None, None
+
+            extension = os.path.splitext(downloaded_path)[1]
+            path = os.path.join(self.root, f"{key}{extension}")
+            os.replace(downloaded_path, path)
+            size = os.path.getsize(path)
+            entry = {"title": title, "path": path, "size": size}
+            with open(self._meta_path(key), "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+
+            with self._lock:
+                self._metrics["downloads"] += 1
+                self._metrics["downloaded_bytes"] += size
+                self._metrics["download_seconds"] += time.perf_counter() - start
+                self._entries[key] = entry
+                self._pin(key, entry)
+                self._evict()
+            return title, path
+        except Exception:
+            with self._lock:
+                self._metrics["download_errors"] += 1
+            raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _pin(self, key, entry):
+        self._pins[key] = self._pins.get(key, 0) + 1
+        entry["last_used"] = time.time()
+        os.utime(entry["path"], None)
+
+    def release(self, path):
+        """Libera uma mídia obtida por fetch() para que ela possa ser removida."""
+        with self._lock:
+            for key, entry in self._entries.items():
+                if entry["path"] == path and self._pins.get(key):
+                    self._pins[key] -= 1
+                    if not self._pins[key]:
+                        del self._pins[key]
+                    break
+            self._evict()
+
+    def _evict(self):
+        total = sum(entry["size"] for entry in self._entries.values())
+        for key, entry in sorted(self._entries.items(), key=lambda item: item[1].get("last_used", 0)):
+            if total <= self.max_bytes:
+                break
+            if self._pins.get(key):
+                continue
+            for path in (entry["path"], self._meta_path(key)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            del self._entries[key]
+            total -= entry["size"]
+            self._metrics["evictions"] += 1
+            print(f"Mídia removida do cache: {key}")
+
+    def stats(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics["download_seconds"] = round(metrics["download_seconds"], 2)
+            metrics["entries"] = len(self._entries)
+            metrics["pinned"] = len(self._pins)
+            metrics["size_mb"] = round(sum(entry["size"] for entry in self._entries.values()) / (1024 * 1024), 2)
+            metrics["max_mb"] = round(self.max_bytes / (1024 * 1024), 2)
+            return metrics
+
+
+def _process_running(pid):
+    if pid == os.getpid():
+        return False  # Pasta de uma execução anterior com o mesmo PID (ex.: PID 1 no container)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
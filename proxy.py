@@ -0,0 +1,100 @@
+import subprocess
+import time
+
+import cv2
+
+# Resolução e taxa de quadros padrão do proxy de análise
+PROXY_WIDTH = 640
+PROXY_FPS = 5
+
+
+class AnalysisProxy:
+    """
+    Cópia reduzida (baixa resolução e poucos quadros por segundo) de um vídeo de origem.
+
+    Toda a visão computacional (thumbnails, reenquadramento, detecção de cenas) lê
+    o proxy em vez do vídeo original: ele é decodificado uma única vez por vídeo e
+    cada frame custa uma fração de um frame em resolução cheia. Os tempos são os
+    mesmos do original; as coordenadas voltam para a resolução original com
+    to_source().
+
+    :param path: Caminho do arquivo do proxy.
+    :param width: Largura do proxy.
+    :param height: Altura do proxy.
+    :param fps: Taxa de quadros do proxy.
+    :param source_width: Largura do vídeo original.
+    :param source_height: Altura do vídeo original.
+    :param seconds: Tempo gasto para gerar o proxy.
+    """
+
+    def __init__(self, path, width, height, fps, source_width, source_height, seconds=0.0):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.source_width = source_width
+        self.source_height = source_height
+        self.seconds = seconds
+
+    @property
+    def scale(self):
+        """Fatores (x, y) do proxy para o vídeo original."""
+        return self.source_width / self.width, self.source_height / self.height
+
+    def to_source(self, box):
+        """Converte uma caixa (top, right, bottom, left) do proxy para o vídeo original."""
+        scale_x, scale_y = self.scale
+        top, right, bottom, left = box
+        return (
+            max(0, int(round(top * scale_y))),
+            min(self.source_width, int(round(right * scale_x))),
+            min(self.source_height, int(round(bottom * scale_y))),
+            max(0, int(round(left * scale_x)))
+        )
+
+
+def _video_size(video_path):
+    cap = cv2.VideoCapture(video_path)
+    try:
+        return int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    finally:
+        cap.release()
+
+
+def build_proxy(video_path, output_path, width=PROXY_WIDTH, fps=PROXY_FPS):
+    """
+    Gera o proxy de análise de um vídeo em uma única decodificação.
+
+    O proxy não tem áudio e usa um keyframe por segundo, então os seeks da
+    amostragem de frames decodificam no máximo `fps` quadros pequenos.
+
+    :param video_path: Caminho do vídeo original.
+    :param output_path: Caminho do proxy (.mp4).
+    :param width: Largura máxima do proxy (vídeos menores mantêm a largura).
+    :param fps: Taxa de quadros do proxy.
+    :return: AnalysisProxy, ou None em caso de erro.
+    """
+    try:
+        start = time.perf_counter()
+        source_width, source_height = _video_size(video_path)
+        if not source_width or not source_height:
+            print(f"Não foi possível ler a resolução do vídeo para o proxy: {video_path}")
+            return None
+
+        subprocess.run([
+            "ffmpeg", "-nostdin", "-v", "error",
+            "-i", video_path,
+            "-map", "0:v:0", "-an",
+            "-vf", f"fps={fps},scale='min({width},iw)':-2",
+            "-c:v", "libx264", "-preset", "ultrafast", "-crf", "28",
+            "-g", str(fps), "-pix_fmt", "yuv420p",
+            "-y", output_path
+        ], check=True, capture_output=True)
+
+        proxy_width, proxy_height = _video_size(output_path)
+        seconds = time.perf_counter() - start
+        print(f"Proxy de análise gerado em {seconds:.2f}s ({proxy_width}x{proxy_height} a {fps} fps): {output_path}")
+        return AnalysisProxy(output_path, proxy_width, proxy_height, fps, source_width, source_height, seconds)
+    except Exception as e:
+        print(f"Erro ao gerar o proxy de análise: {e}")
+        return None
@@ -0,0 +1,168 @@
+import time
+
+import numpy as np
+
+from vision import FaceIndex, analyze_faces, frame_rate, sample_frames
+
+# Largura dos frames usados no rastreamento (menor que a das thumbnails: só a posição importa)
+REFRAME_DETECTION_WIDTH = 480
+
+# Número máximo de pontos do caminho de recorte na expressão do ffmpeg
+MAX_KEYPOINTS = 24
+
+
+def crop_size(source_width, source_height, target_width, target_height):
+    """Maior recorte (largura, altura) com a proporção de saída que cabe no vídeo de origem, em valores pares."""
+    target_aspect = target_width / target_height
+    if source_width / source_height > target_aspect:
+        return int(source_height * target_aspect) // 2 * 2, source_height // 2 * 2
+    return source_width // 2 * 2, int(source_width / target_aspect) // 2 * 2
+
+
+def track_faces(video_path, start_seconds, end_seconds, num_samples, proxy=None, face_index=None):
+    """
+    Localiza o rosto principal em frames esparsos do intervalo.
+
+    Os rostos são agrupados por pessoa com um FaceIndex; o rosto seguido é o da
+    pessoa com maior presença (área somada) no intervalo, e nos frames em que ela
+    não aparece usa-se o maior rosto visível.
+
+    :param proxy: AnalysisProxy opcional; os frames vêm dele e os centros voltam para a resolução original.
+    :param face_index: FaceIndex do vídeo de origem (padrão: um índice novo só para este intervalo).
+    :return: Lista de (tempo relativo ao início, centro x, centro y), com centro None nos frames sem rostos.
+    """
+    source_path = proxy.path if proxy else video_path
+    fps = proxy.fps if proxy else frame_rate(video_path)
+    scale_x, scale_y = proxy.scale if proxy else (1.0, 1.0)
+    samples = list(sample_frames(
+        source_path, num_samples, max_width=REFRAME_DETECTION_WIDTH,
+        start_seconds=start_seconds, end_seconds=end_seconds
+    ))
+    if not samples:
+        return []
+
+    face_index = face_index if face_index is not None else FaceIndex()
+    batch = [(frame, small, scale) for _, frame, small, scale in samples]
+    detections = analyze_faces(batch, with_expressions=False)
+
+    # Identificar as pessoas de todos os frames de uma vez
+    people = iter(face_index.identify([
+        observation.encoding for observations in detections for observation in observations
+    ]))
+
+    presence = {}
+    frames = []
+    for (index, _, _, _), observations in zip(samples, detections):
+        faces = []
+        for observation in observations:
+            top, right, bottom, left = observation.box
+            area = (bottom - top) * (right - left)
+            person = next(people)
+            presence[person] = presence.get(person, 0) + area
+            faces.append((person, area, (left + right) / 2 * scale_x, (top + bottom) / 2 * scale_y))
+        frames.append((index / fps - start_seconds, faces))
+
+    speaker = max(presence, key=presence.get) if presence else None
+    path = []
+    for timestamp, faces in frames:
+        target = next((face for face in faces if face[0] == speaker), None)
+        if target is None and faces:
+            target = max(faces, key=lambda face: face[1])
+        path.append((timestamp, target[2] if target else None, target[3] if target else None))
+    return path
+
+
+def smooth_path(times, values, window_seconds):
+    """
+    Preenche os frames sem rosto por interpolação e suaviza o caminho com média móvel.
+
+    :return: Array com um valor por tempo, ou None se nenhum valor for conhecido.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    known = np.array([value is not None for value in values])
+    if not known.any():
+        return None
+    filled = np.interp(times, times[known], np.array([value for value in values if value is not None], dtype=np.float64))
+    if len(times) < 3:
+        return filled
+
+    spacing = max(1e-6, float(np.median(np.diff(times))))
+    window = max(1, int(round(window_seconds / spacing)))
+    if window <= 1:
+        return filled
+    padded = np.pad(filled, (window // 2, window - 1 - window // 2), mode="edge")
+    return np.convolve(padded, np.ones(window) / window, mode="valid")
+
+
+def piecewise_expression(times, values):
+    """Expressão do ffmpeg (em função de t) que interpola linearmente os pontos (tempo, valor)."""
+    expression = f"{values[-1]:.0f}"
+    for i in range(len(times) - 2, -1, -1):
+        t0, t1 = times[i], times[i + 1]
+        v0, v1 = values[i], values[i + 1]
+        if t1 - t0 <= 0:
+            continue
+        segment = f"{v0:.0f}+({v1 - v0:.0f})*(t-{t0:.3f})/{t1 - t0:.3f}"
+        expression = f"if(lt(t,{t1:.3f}),{segment},{expression})"
+    # Vírgulas e dois-pontos ficam protegidos pelas aspas simples em volta da expressão no filtro
+    return f"if(lt(t,{times[0]:.3f}),{values[0]:.0f},{expression})"
+
+
+def crop_offsets(centers, crop_length, source_length):
+    """Converte centros de rosto em deslocamentos do recorte, limitados às bordas do vídeo."""
+    return np.clip(centers - crop_length / 2, 0, source_length - crop_length)
+
+
+def plan_reframe(video_path, start_seconds, end_seconds, source_width, source_height, resolution,
+                 samples_per_second=0.5, max_samples=40, smoothing_seconds=3.0, proxy=None, face_index=None):
+    """
+    Planeja o reenquadramento de um clipe para uma proporção mais estreita (ex.: 9:16).
+
+    Detecta o rosto principal em uma amostra esparsa de frames, suaviza o caminho
+    do recorte no tempo e monta um filtro crop do ffmpeg cujo x/y variam com t
+    (t começa em 0 no início do clipe). Sem rostos, o recorte fica centralizado.
+
+    :param resolution: Resolução de saída, ex.: "720x1280".
+    :param proxy: AnalysisProxy opcional do vídeo, usado na detecção no lugar do original.
+    :param face_index: FaceIndex opcional do vídeo de origem, compartilhado entre os clipes.
+    :return: Dicionário com video_filter, faces_found e seconds, ou None se o vídeo
+             já estiver na proporção de saída (basta redimensionar).
+    """
+    start = time.perf_counter()
+    target_width, target_height = (int(value) for value in resolution.split("x"))
+    crop_width, crop_height = crop_size(source_width, source_height, target_width, target_height)
+    if crop_width >= source_width - 1 and crop_height >= source_height - 1:
+        return None
+
+    num_samples = int(min(max_samples, max(3, (end_seconds - start_seconds) * samples_per_second)))
+    path = track_faces(video_path, start_seconds, end_seconds, num_samples, proxy, face_index)
+    faces_found = sum(1 for _, center_x, _ in path if center_x is not None)
+
+    x_expression = f"{(source_width - crop_width) // 2}"
+    y_expression = f"{(source_height - crop_height) // 2}"
+    if faces_found:
+        times = [timestamp for timestamp, _, _ in path]
+        if crop_width < source_width:
+            offsets = crop_offsets(smooth_path(times, [center_x for _, center_x, _ in path], smoothing_seconds),
+                                   crop_width, source_width)
+            x_expression = _offset_expression(times, offsets, source_width)
+        if crop_height < source_height:
+            offsets = crop_offsets(smooth_path(times, [center_y for _, _, center_y in path], smoothing_seconds),
+                                   crop_height, source_height)
+            y_expression = _offset_expression(times, offsets, source_height)
+
+    video_filter = f"crop={crop_width}:{crop_height}:'{x_expression}':'{y_expression}',scale={resolution},setsar=1:1"
+    seconds = time.perf_counter() - start
+    print(f"Reenquadramento planejado em {seconds:.2f}s ({faces_found}/{len(path)} frame(s) com rosto)")
+    return {"video_filter": video_filter, "faces_found": faces_found, "seconds": seconds}
+
+
+def _offset_expression(times, offsets, source_length):
+    # Movimentos menores que 2% da imagem não compensam: recorte fixo na mediana
+    if np.ptp(offsets) < source_length * 0.02:
+        return f"{np.median(offsets):.0f}"
+    if len(times) > MAX_KEYPOINTS:
+        keep = np.unique(np.linspace(0, len(times) - 1, MAX_KEYPOINTS).round().astype(int))
+        times = [times[i] for i in keep]
+        offsets = offsets[keep]
+    return piecewise_expression(times, offsets)
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+class ResultCache:
+    """
+    Cache persistente em disco para resultados caros (transcrições, análises).
+
+    Cada entrada é um arquivo JSON em <root>/<namespace>/<chave>.json. O mtime
+    do arquivo é atualizado a cada acerto, e quando o tamanho total passa de
+    max_bytes as entradas usadas há mais tempo são removidas (LRU).
+
+    :param root: Pasta do cache.
+    :param max_bytes: Tamanho máximo do cache em bytes.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._counters = {}
+        os.makedirs(root, exist_ok=True)
+        self._total_bytes = sum(size for _, _, size in self._entries())
+
+    @staticmethod
+    def make_key(*parts):
+        """Chave estável a partir de partes como hash da mídia, modelo e versão do prompt."""
+        return hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+    def _path(self, namespace, key):
+        return os.path.join(self.root, namespace, f"{key}.json")
+
+    def _count(self, namespace, field):
+        counters = self._counters.setdefault(namespace, {"hits": 0, "misses": 0, "writes": 0, "evictions": 0})
+        counters[field] += 1
+
+    def _entries(self):
+        entries = []
+        for namespace in os.listdir(self.root):
+            namespace_dir = os.path.join(self.root, namespace)
+            if not os.path.isdir(namespace_dir):
+                continue
+            for name in os.listdir(namespace_dir):
+                path = os.path.join(namespace_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def get(self, namespace, key):
+        """Retorna o valor armazenado ou None se não existir."""
+        path = self._path(namespace, key)
+        with self._lock:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    value = json.load(f)
+            except (OSError, ValueError):
+                self._count(namespace, "misses")
+                return None
+            os.utime(path, None)
+            self._count(namespace, "hits")
+        print(f"Cache hit: {namespace}/{key[:12]}")
+        return value
+
+    def put(self, namespace, key, value):
+        """Armazena um valor serializável em JSON e aplica o limite de tamanho."""
+        path = self._path(namespace, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+        with self._lock:
+            previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._total_bytes += len(data) - previous_size
+            self._count(namespace, "writes")
+            self._evict()
+
+    def _evict(self):
+        if self._total_bytes <= self.max_bytes:
+            return
+        for _, path, size in sorted(self._entries()):
+            if self._total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._total_bytes -= size
+            self._count(os.path.basename(os.path.dirname(path)), "evictions")
+            print(f"Cache: entrada removida por limite de tamanho: {path}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size_mb": round(self._total_bytes / (1024 * 1024), 2),
+                "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+                "namespaces": {namespace: dict(counters) for namespace, counters in self._counters.items()},
+                "checked_at": time.time()
+            }
@@ -0,0 +1,96 @@
+"""
+Benchmark da extração de áudio: MP3 legado x PCM 16 kHz direto.
+
+Cada modo roda em um subprocesso separado para medir o pico de memória (RSS)
+de forma isolada, somando o processo Python e o ffmpeg.
+
+Uso:
+    python scripts/bench_audio_extraction.py video.mp4 [--repeat 3] [--transcribe tiny]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+MODES = ("mp3", "pcm", "pcm_mmap")
+
+
+def run_once(video_path, mode, model_size=None):
+    """Executa um modo uma vez e imprime o resultado em JSON (chamado no subprocesso)."""
+    from audio import load_pcm, load_pcm_mmap
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        if mode == "mp3":
+            import whisper
+            # Caminho atual: codifica um MP3 e o Whisper decodifica de novo para 16 kHz
+            mp3_path = os.path.join(tmp, "audio.mp3")
+            subprocess.run(
+                ["ffmpeg", "-v", "error", "-i", video_path, "-q:a", "0", "-map", "a", mp3_path],
+                check=True
+            )
+            audio = whisper.load_audio(mp3_path)
+        elif mode == "pcm":
+            audio = load_pcm(video_path)
+        else:
+            audio = load_pcm_mmap(video_path, os.path.join(tmp, "audio.f32"))
+        extract_seconds = time.perf_counter() - start
+
+        transcribe_seconds = None
+        if model_size:
+            import whisper
+            model = whisper.load_model(model_size)
+            start = time.perf_counter()
+            model.transcribe(audio)
+            transcribe_seconds = time.perf_counter() - start
+
+        print(json.dumps({
+            "mode": mode,
+            "samples": int(len(audio)),
+            "extract_seconds": extract_seconds,
+            "transcribe_seconds": transcribe_seconds,
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "ffmpeg_peak_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+        }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video_path")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--transcribe", metavar="MODEL", help="também transcreve com o modelo informado")
+    parser.add_argument("--run-once", metavar="MODE", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_once:
+        run_once(args.video_path, args.run_once, args.transcribe)
+        return
+
+    print(f"{'modo':<10} {'extração (s)':>13} {'transcrição (s)':>16} {'pico RSS (MB)':>14} {'ffmpeg RSS (MB)':>16}")
+    for mode in args.modes.split(","):
+        runs = []
+        for _ in range(args.repeat):
+            command = [sys.executable, __file__, args.video_path, "--run-once", mode]
+            if args.transcribe:
+                command += ["--transcribe", args.transcribe]
+            output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+
+        best = min(runs, key=lambda run: run["extract_seconds"])
+        transcribe = f"{best['transcribe_seconds']:.2f}" if best["transcribe_seconds"] is not None else "-"
+        print(
+            f"{mode:<10} {best['extract_seconds']:>13.2f} {transcribe:>16} "
+            f"{max(run['peak_rss_mb'] for run in runs):>14.0f} "
+            f"{max(run['ffmpeg_peak_rss_mb'] for run in runs):>16.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
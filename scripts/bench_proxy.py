@@ -0,0 +1,64 @@
+"""
+Benchmark do proxy de análise: visão computacional no vídeo original x no proxy.
+
+Gera o proxy uma vez e extrai os rostos das thumbnails de N trechos do vídeo
+(como os clipes de um job), primeiro lendo o vídeo original e depois o proxy.
+O tempo do proxy inclui a sua geração, que é feita uma única vez por vídeo.
+
+Uso:
+    python scripts/bench_proxy.py video.mp4 [--clips 6] [--clip-seconds 60] [--samples 24]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from clip_renderer import probe_video
+from proxy import PROXY_FPS, PROXY_WIDTH, build_proxy
+from vision import extract_faces_from_video
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video_path")
+    parser.add_argument("--clips", type=int, default=6)
+    parser.add_argument("--clip-seconds", type=float, default=60.0)
+    parser.add_argument("--samples", type=int, default=24)
+    parser.add_argument("--width", type=int, default=PROXY_WIDTH)
+    parser.add_argument("--fps", type=int, default=PROXY_FPS)
+    args = parser.parse_args()
+
+    duration = probe_video(args.video_path)["duration"]
+    step = duration / args.clips
+    windows = [(i * step, min(duration, i * step + args.clip_seconds)) for i in range(args.clips)]
+
+    start = time.perf_counter()
+    original_faces = sum(
+        len(extract_faces_from_video(args.video_path, num_samples=args.samples,
+                                     start_seconds=window_start, end_seconds=window_end) or [])
+        for window_start, window_end in windows
+    )
+    original_seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        proxy = build_proxy(args.video_path, os.path.join(tmp, "proxy.mp4"), args.width, args.fps)
+        if not proxy:
+            return
+        proxy_faces = sum(
+            len(extract_faces_from_video(args.video_path, num_samples=args.samples, proxy=proxy,
+                                         start_seconds=window_start, end_seconds=window_end) or [])
+            for window_start, window_end in windows
+        )
+        proxy_seconds = time.perf_counter() - start
+
+    print(f"{'modo':<10} {'tempo (s)':>10} {'rostos':>8}")
+    print(f"{'original':<10} {original_seconds:>10.2f} {original_faces:>8}")
+    print(f"{'proxy':<10} {proxy_seconds:>10.2f} {proxy_faces:>8}  (geração do proxy: {proxy.seconds:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark do reenquadramento com rastreamento de rosto.
+
+Mede, para um trecho do vídeo, o tempo de planejar o recorte (detecção esparsa
+de rostos + suavização) e o tempo de codificar o clipe com o filtro de recorte
+dinâmico e com o redimensionamento simples, para mostrar o custo do
+reenquadramento em relação à codificação.
+
+Uso:
+    python scripts/bench_reframe.py video.mp4 --start 60 --duration 60 [--format 9:16] [--samples-per-second 0.5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from clip_renderer import probe_video, render_clip, scale_filter
+from reframe import plan_reframe
+
+RESOLUTIONS = {"9:16": "720x1280", "1:1": "1080x1080"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video_path")
+    parser.add_argument("--start", type=float, default=0.0)
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--format", choices=sorted(RESOLUTIONS), default="9:16")
+    parser.add_argument("--samples-per-second", type=float, default=0.5)
+    parser.add_argument("--max-samples", type=int, default=40)
+    args = parser.parse_args()
+
+    resolution = RESOLUTIONS[args.format]
+    info = probe_video(args.video_path)
+    end = min(args.start + args.duration, info["duration"] or args.start + args.duration)
+
+    reframe = plan_reframe(
+        args.video_path, args.start, end, info["width"], info["height"], resolution,
+        args.samples_per_second, args.max_samples
+    )
+    if not reframe:
+        print(f"O vídeo ({info['width']}x{info['height']}) já está na proporção {args.format}: nada a reenquadrar")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        timings = {}
+        for name, video_filter in (("escala", scale_filter(resolution)), ("recorte", reframe["video_filter"])):
+            clip = {
+                "start_seconds": args.start, "end_seconds": end,
+                "output_path": os.path.join(tmp, f"{name}.mp4"), "video_filter": video_filter
+            }
+            timings[name] = render_clip(args.video_path, clip)
+
+    print(f"\nTrecho de {end - args.start:.0f}s, {reframe['faces_found']} frame(s) com rosto")
+    print(f"{'etapa':<28} {'tempo (s)':>10}")
+    print(f"{'planejamento do recorte':<28} {reframe['seconds']:>10.2f}")
+    print(f"{'codificação (escala)':<28} {timings['escala']:>10.2f}")
+    print(f"{'codificação (recorte)':<28} {timings['recorte']:>10.2f}")
+    print(f"custo do reenquadramento: {100 * reframe['seconds'] / timings['recorte']:.1f}% da codificação")
+
+
+if __name__ == "__main__":
+    main()
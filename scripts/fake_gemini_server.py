@@ -0,0 +1,123 @@
+"""
+Servidor falso da Gemini API (REST) para testar o cliente localmente.
+
+Responde a POST /v1beta/models/<modelo>:generateContent com respostas fixas:
+momentos em JSON para a análise, um array de títulos para os títulos em lote e
+um título simples nas demais chamadas. Pode simular latência, erros
+transitórios (429/503) e chamadas que travam, para exercitar o limitador de
+taxa, as novas tentativas e os prazos do llm_client.
+
+Uso:
+    python scripts/fake_gemini_server.py [--port 8765] [--latency 0.2] [--error-rate 0.3] [--hang-rate 0.05]
+
+    GEMINI_API_KEY=fake GEMINI_API_ENDPOINT=http://127.0.0.1:8765 python app.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAMPLE_MOMENTS = [
+    {"category": "Valuable Information and Useful Insights", "start": "00:00:05", "end": "00:00:45",
+     "description": "Resposta falsa para testes", "highlight": "Fake highlight"},
+    {"category": "Emotional and Impactful Moments", "start": "00:01:00", "end": "00:01:40",
+     "description": "Resposta falsa para testes", "highlight": "Another fake highlight"}
+]
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    options = None
+    stats = {"requests": 0, "errors": 0, "hangs": 0}
+    stats_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        with self.stats_lock:
+            self._send_json(200, dict(self.stats))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        with self.stats_lock:
+            self.stats["requests"] += 1
+
+        if not re.search(r":generateContent", self.path):
+            self._send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+            return
+
+        options = self.options
+        if random.random() < options.hang_rate:
+            with self.stats_lock:
+                self.stats["hangs"] += 1
+            time.sleep(options.hang_seconds)
+        time.sleep(options.latency * random.uniform(0.5, 1.5))
+
+        if random.random() < options.error_rate:
+            with self.stats_lock:
+                self.stats["errors"] += 1
+            status = random.choice([429, 503])
+            self._send_json(status, {"error": {
+                "code": status, "message": "Simulated transient error",
+                "status": "RESOURCE_EXHAUSTED" if status == 429 else "UNAVAILABLE"
+            }})
+            return
+
+        self._send_json(200, {
+            "candidates": [{
+                "content": {"parts": [{"text": self._response_text(request)}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0
+            }],
+            "usageMetadata": {"promptTokenCount": 0, "candidatesTokenCount": 0, "totalTokenCount": 0}
+        })
+
+    @staticmethod
+    def _response_text(request):
+        prompt = " ".join(
+            part.get("text", "")
+            for content in request.get("contents", [])
+            for part in content.get("parts", [])
+        )
+        config = request.get("generationConfig", {})
+        if config.get("responseSchema") or config.get("response_schema"):
+            return json.dumps(SAMPLE_MOMENTS)
+        match = re.search(r"CADA um dos (\d+) clipes", prompt)
+        if match:
+            return json.dumps([{"clip": i + 1, "title": f"Fake Title {i + 1}"} for i in range(int(match.group(1)))])
+        return "Fake Title"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="latência média de cada resposta (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fração de respostas 429/503")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="fração de chamadas que travam")
+    parser.add_argument("--hang-seconds", type=float, default=300.0)
+    args = parser.parse_args()
+
+    FakeGeminiHandler.options = args
+    server = ThreadingHTTPServer((args.host, args.port), FakeGeminiHandler)
+    print(f"Servidor falso da Gemini em http://{args.host}:{args.port} (GET / mostra os contadores)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -47,9 +47,15 @@ function setupFileUpload() {
 function setupTranscriptToggle() {
     document.addEventListener('click', (e) => {
         if (e.target && e.target.classList.contains('toggle-transcript')) {
-            const transcriptDiv = e.target.closest('.clip-card').querySelector('.clip-transcript');
+            const card = e.target.closest('.clip-card');
+            const transcriptDiv = card.querySelector('.clip-transcript');
             transcriptDiv.classList.toggle('hidden');
             
+            // Carregar a transcrição sob demanda na primeira vez que ela é aberta
+            if (!transcriptDiv.classList.contains('hidden')) {
+                loadTranscript(card);
+            }
+            
             // Alterar texto do botão
             if (transcriptDiv.classList.contains('hidden')) {
                 e.target.textContent = 'Ver Transcrição';
@@ -60,13 +66,95 @@ function setupTranscriptToggle() {
     });
 }
 
+// Buscar a transcrição de um clipe (o navegador revalida com ETag/Last-Modified)
+async function loadTranscript(card) {
+    const transcriptText = card.querySelector('.clip-transcript p');
+    if (!card.dataset.clipId || card.dataset.transcriptLoaded) {
+        return;
+    }
+    
+    transcriptText.textContent = 'Carregando transcrição...';
+    try {
+        const response = await fetch(`/api/clips/${encodeURIComponent(card.dataset.clipId)}/transcript`);
+        transcriptText.textContent = response.ok ? await response.text() : 'Transcrição não disponível';
+        card.dataset.transcriptLoaded = '1';
+    } catch (error) {
+        transcriptText.textContent = 'Transcrição não disponível';
+        console.error(error);
+    }
+}
+
+// Rolagem infinita: carregar a próxima página da biblioteca quando o fim da lista aparece
+function setupInfiniteScroll() {
+    const sentinel = document.getElementById('clips-sentinel');
+    if (!sentinel || !sentinel.dataset.nextCursor || !('IntersectionObserver' in window)) {
+        return;
+    }
+    
+    let loading = false;
+    const observer = new IntersectionObserver(async (entries) => {
+        if (loading || !entries.some(entry => entry.isIntersecting)) {
+            return;
+        }
+        
+        loading = true;
+        sentinel.classList.add('loading');
+        sentinel.textContent = 'Carregando mais clipes...';
+        try {
+            const params = new URLSearchParams({
+                cursor: sentinel.dataset.nextCursor,
+                limit: sentinel.dataset.pageSize || 24
+            });
+            const response = await fetch(`/api/clips?${params}`);
+            const data = await response.json();
+            if (!response.ok) {
+                throw new Error(data.message || 'Não foi possível carregar os clipes.');
+            }
+            
+            const clipsContainer = document.getElementById('clips-container');
+            data.clips.forEach(clip => {
+                // Ignorar clipes que já estão na lista (ex.: gerados nesta sessão)
+                if (!clipsContainer.querySelector(`[data-clip-id="${CSS.escape(clip.id)}"]`)) {
+                    clipsContainer.appendChild(createClipCard(clip));
+                }
+            });
+            
+            sentinel.dataset.nextCursor = data.next_cursor || '';
+            if (!data.next_cursor) {
+                observer.disconnect();
+            }
+        } catch (error) {
+            console.error(error);
+            observer.disconnect();
+        } finally {
+            loading = false;
+            sentinel.classList.remove('loading');
+            sentinel.textContent = '';
+        }
+    }, { rootMargin: '400px' });
+    
+    observer.observe(sentinel);
+}
+
+// Mensagens exibidas para cada etapa do pipeline
+const STAGE_LABELS = {
+    download: 'Baixando vídeo...',
+    download_video: 'Aguardando download do vídeo...',
+    extract_audio: 'Extraindo áudio...',
+    transcribe: 'Transcrevendo áudio...',
+    analyze: 'Analisando transcrição...',
+    generate_clips: 'Gerando clipes...'
+};
+
+// Intervalo entre consultas de status do job (ms)
+const JOB_POLL_INTERVAL = 2000;
+
 // Gerenciamento do formulário e barra de progresso
 function setupFormSubmission() {
     const form = document.getElementById('clip-form');
     const progressContainer = document.querySelector('.progress-container');
     const progressBar = document.getElementById('progress-bar');
     const progressStatus = document.getElementById('progress-status');
-    const resultsSection = document.getElementById('results');
     
     if (form) {
         form.addEventListener('submit', async function(e) {
@@ -93,9 +181,17 @@ function setupFormSubmission() {
             progressBar.style.width = '0%';
             progressBar.textContent = '0%';
             progressStatus.textContent = 'Iniciando processamento...';
-            resultsSection.style.display = 'none';
             
             try {
+                // Arquivos locais são enviados em partes retomáveis; links do YouTube vão direto para /process
+                if (fileTab.classList.contains('active')) {
+                    const jobId = await uploadVideoFile(videoFile, form);
+                    progressStatus.textContent = 'Aguardando na fila...';
+                    const job = await waitForJob(jobId);
+                    finishProcessing(job);
+                    return;
+                }
+                
                 // Criar FormData para o envio
                 const formData = new FormData(form);
                 
@@ -108,50 +204,21 @@ function setupFormSubmission() {
                     formData.delete('video_url');
                 }
                 
-                // Iniciar envio
+                // Enviar o formulário (o servidor apenas enfileira o job)
                 progressStatus.textContent = 'Enviando vídeo...';
-                updateProgress(10);
-                
-                // Enviar o formulário
                 const response = await fetch('/process', {
                     method: 'POST',
                     body: formData
                 });
                 
-                // Verificar resposta
+                const data = await response.json();
                 if (!response.ok) {
-                    const errorData = await response.json();
-                    throw new Error(errorData.error || 'Ocorreu um erro ao processar o vídeo.');
+                    throw new Error(data.message || 'Ocorreu um erro ao processar o vídeo.');
                 }
                 
-                updateProgress(30);
-                progressStatus.textContent = 'Processando vídeo...';
-                
-                // Para simular o progresso (já que o servidor não informa progresso real)
-                let progress = 30;
-                const progressInterval = setInterval(() => {
-                    progress += Math.random() * 5;
-                    if (progress > 90) {
-                        progress = 90;
-                        clearInterval(progressInterval);
-                    }
-                    updateProgress(progress);
-                }, 2000);
-                
-                // Obter resposta HTML
-                const htmlResponse = await response.text();
-                
-                // Simular finalização do processamento
-                clearInterval(progressInterval);
-                updateProgress(100);
-                progressStatus.textContent = 'Concluído!';
-                
-                // Atualizar a página com os resultados
-                setTimeout(() => {
-                    document.documentElement.innerHTML = htmlResponse;
-                    // Reconfigurar manipuladores de eventos após atualização do DOM
-                    setupEventHandlers();
-                }, 1000);
+                progressStatus.textContent = 'Aguardando na fila...';
+                const job = await waitForJob(data.job_id);
+                finishProcessing(job);
                 
             } catch (error) {
                 progressContainer.style.display = 'none';
@@ -162,6 +229,222 @@ function setupFormSubmission() {
     }
 }
 
+// Exibir os clipes de um job concluído e esconder a barra de progresso
+function finishProcessing(job) {
+    const progressContainer = document.querySelector('.progress-container');
+    
+    updateProgress(100);
+    document.getElementById('progress-status').textContent = 'Concluído!';
+    renderClips(job.result ? job.result.clips : []);
+    
+    setTimeout(() => {
+        progressContainer.style.display = 'none';
+    }, 1000);
+}
+
+// Número de novas tentativas de uma mesma parte antes de desistir do upload
+const UPLOAD_MAX_RETRIES = 5;
+
+// SHA-256 em hexadecimal (null quando o navegador não expõe crypto.subtle, ex.: HTTP fora de localhost)
+async function sha256Hex(blob) {
+    if (!window.crypto || !window.crypto.subtle) {
+        return null;
+    }
+    const digest = await window.crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+    return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, '0')).join('');
+}
+
+// Consultar no servidor o offset já gravado (usado para retomar após uma falha)
+async function fetchUploadOffset(uploadUrl) {
+    const response = await fetch(uploadUrl, { cache: 'no-store' });
+    const data = await response.json();
+    if (!response.ok) {
+        throw new Error(data.message || 'Upload não encontrado.');
+    }
+    return data.offset;
+}
+
+// Enviar um arquivo local em partes retomáveis e retornar o ID do job criado
+async function uploadVideoFile(file, form) {
+    const progressStatus = document.getElementById('progress-status');
+    const formData = new FormData(form);
+    
+    progressStatus.textContent = 'Enviando vídeo...';
+    const response = await fetch('/uploads', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            filename: file.name,
+            size: file.size,
+            clip_format: formData.get('clip_format'),
+            clip_duration: formData.get('clip_duration'),
+            encode_profile: formData.get('encode_profile')
+        })
+    });
+    const upload = await response.json();
+    if (!response.ok) {
+        throw new Error(upload.message || 'Não foi possível iniciar o envio do vídeo.');
+    }
+    
+    let offset = upload.offset;
+    let retries = 0;
+    while (offset < file.size) {
+        const chunk = file.slice(offset, Math.min(offset + upload.max_chunk_size, file.size));
+        try {
+            const headers = {
+                'Content-Type': 'application/octet-stream',
+                'Upload-Offset': String(offset)
+            };
+            const checksum = await sha256Hex(chunk);
+            if (checksum) {
+                headers['Upload-Checksum'] = checksum;
+            }
+            
+            const chunkResponse = await fetch(upload.upload_url, { method: 'PUT', headers, body: chunk });
+            const data = await chunkResponse.json();
+            if (chunkResponse.status === 404 || chunkResponse.status === 413) {
+                throw Object.assign(new Error(data.message || 'Erro ao enviar o vídeo.'), { fatal: true });
+            }
+            if (!chunkResponse.ok) {
+                // O servidor informa o offset confirmado; continuar a partir dele
+                throw Object.assign(new Error(data.message || 'Erro ao enviar o vídeo.'), { offset: data.offset });
+            }
+            
+            offset = data.offset;
+            retries = 0;
+        } catch (error) {
+            if (error.fatal || ++retries > UPLOAD_MAX_RETRIES) {
+                throw error;
+            }
+            console.warn(`Falha ao enviar parte (tentativa ${retries}):`, error);
+            progressStatus.textContent = 'Conexão instável, retomando envio...';
+            await new Promise(resolve => setTimeout(resolve, 1000 * retries));
+            offset = typeof error.offset === 'number' ? error.offset : await fetchUploadOffset(upload.upload_url);
+        }
+        
+        const percent = Math.floor(offset / file.size * 100);
+        updateProgress(percent);
+        progressStatus.textContent = `Enviando vídeo... ${percent}%`;
+    }
+    
+    return upload.job_id;
+}
+
+// Consultar o status do job até que ele termine, atualizando a barra de progresso
+async function waitForJob(jobId) {
+    const progressStatus = document.getElementById('progress-status');
+    
+    while (true) {
+        const response = await fetch(`/jobs/${jobId}`);
+        const job = await response.json();
+        
+        if (!response.ok) {
+            throw new Error(job.message || 'Não foi possível consultar o status do processamento.');
+        }
+        
+        if (job.status === 'done') {
+            return job;
+        }
+        
+        if (job.status === 'failed') {
+            throw new Error(job.error || 'Ocorreu um erro ao processar o vídeo.');
+        }
+        
+        updateProgress(job.progress || 0);
+        if (job.status === 'waiting') {
+            progressStatus.textContent = 'Aguardando upload...';
+        } else if (job.status === 'queued') {
+            progressStatus.textContent = 'Aguardando na fila...';
+        } else if (job.stage) {
+            progressStatus.textContent = STAGE_LABELS[job.stage] || 'Processando vídeo...';
+        }
+        
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL));
+    }
+}
+
+// Adicionar os clipes gerados à lista de resultados
+function renderClips(clips) {
+    const resultsSection = document.getElementById('results');
+    const clipsContainer = document.getElementById('clips-container');
+    const emptyMessage = clipsContainer.querySelector('.no-clips');
+    
+    if (emptyMessage && clips.length > 0) {
+        emptyMessage.remove();
+    }
+    
+    // Inserir em ordem reversa para manter a ordem original no topo da lista
+    clips.slice().reverse().forEach(clip => {
+        clipsContainer.prepend(createClipCard(clip));
+    });
+    
+    resultsSection.style.display = 'block';
+}
+
+// Criar o card de um clipe (mesma estrutura do template index.html)
+function createClipCard(clip) {
+    const card = document.createElement('div');
+    card.className = 'clip-card';
+    if (clip.id) {
+        card.dataset.clipId = clip.id;
+    }
+    
+    const title = document.createElement('h3');
+    title.className = 'clip-title';
+    title.textContent = clip.title;
+    card.appendChild(title);
+    
+    if (clip.thumbnail) {
+        const thumbnail = document.createElement('div');
+        thumbnail.className = 'clip-thumbnail';
+        const img = document.createElement('img');
+        img.src = clip.thumbnail;
+        img.alt = 'Thumbnail do clipe';
+        img.loading = 'lazy';
+        thumbnail.appendChild(img);
+        card.appendChild(thumbnail);
+    }
+    
+    const videoWrapper = document.createElement('div');
+    videoWrapper.className = 'clip-video';
+    const video = document.createElement('video');
+    video.src = clip.url;
+    video.controls = true;
+    video.preload = 'metadata';
+    videoWrapper.appendChild(video);
+    card.appendChild(videoWrapper);
+    
+    const actions = document.createElement('div');
+    actions.className = 'clip-actions';
+    const download = document.createElement('a');
+    download.href = clip.url;
+    download.download = clip.url.split('/').pop();
+    download.className = 'download-link';
+    download.innerHTML = '<i class="ri-download-line"></i> Download Clip';
+    actions.appendChild(download);
+    const toggle = document.createElement('button');
+    toggle.className = 'toggle-transcript';
+    toggle.innerHTML = '<i class="ri-translate-2"></i> Ver Transcrição';
+    actions.appendChild(toggle);
+    card.appendChild(actions);
+    
+    const transcript = document.createElement('div');
+    transcript.className = 'clip-transcript hidden';
+    const transcriptTitle = document.createElement('h4');
+    transcriptTitle.textContent = 'Transcrição:';
+    const transcriptText = document.createElement('p');
+    // Clipes recém-gerados já trazem a transcrição; os da biblioteca a carregam ao abrir
+    if (clip.transcription) {
+        transcriptText.textContent = clip.transcription;
+        card.dataset.transcriptLoaded = '1';
+    }
+    transcript.appendChild(transcriptTitle);
+    transcript.appendChild(transcriptText);
+    card.appendChild(transcript);
+    
+    return card;
+}
+
 // Helper para atualizar a barra de progresso
 function updateProgress(percent) {
     const progressBar = document.getElementById('progress-bar');
@@ -178,6 +461,7 @@ function setupEventHandlers() {
     setupFileUpload();
     setupTranscriptToggle();
     setupFormSubmission();
+    setupInfiniteScroll();
 }
 
 // Inicializar quando o DOM estiver carregado
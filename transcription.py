@@ -0,0 +1,168 @@
+import multiprocessing
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from audio import SAMPLE_RATE
+
+# Trecho da transcrição com tempos absolutos (em segundos) no vídeo original
+TranscriptSegment = namedtuple("TranscriptSegment", ["start", "end", "text"])
+
+
+class Transcription(str):
+    """
+    Texto completo da transcrição com os segmentos do Whisper em `.segments`.
+
+    É uma str, então todo código que trata a transcrição como texto continua
+    funcionando; quem precisa dos tempos usa `.segments`.
+    """
+
+    def __new__(cls, text, segments=()):
+        obj = super().__new__(cls, text)
+        obj.segments = [TranscriptSegment(*segment) for segment in segments]
+        return obj
+
+    def __reduce__(self):
+        return (Transcription, (str(self), [tuple(segment) for segment in self.segments]))
+
+    @classmethod
+    def from_whisper_result(cls, result, offset=0.0):
+        segments = [
+            TranscriptSegment(segment["start"] + offset, segment["end"] + offset, segment["text"].strip())
+            for segment in result.get("segments", [])
+        ]
+        return cls(result.get("text", "").strip(), segments)
+
+
+def split_on_silence(audio, target_chunk_seconds=600, search_seconds=30, frame_ms=50):
+    """
+    Divide o áudio em trechos de ~target_chunk_seconds, cortando no ponto mais
+    silencioso dentro de ±search_seconds de cada fronteira.
+
+    :param audio: PCM float32 16 kHz mono.
+    :return: Lista de (início, fim) em amostras.
+    """
+    total = len(audio)
+    chunk_samples = int(target_chunk_seconds * SAMPLE_RATE)
+    if total <= chunk_samples:
+        return [(0, total)]
+
+    # Energia por frame (RMS²), calculada de uma vez sobre o áudio inteiro
+    frame = int(SAMPLE_RATE * frame_ms / 1000)
+    n_frames = total // frame
+    energy = np.square(np.asarray(audio[:n_frames * frame]).reshape(n_frames, frame)).mean(axis=1)
+
+    boundaries = [0]
+    search_frames = int(search_seconds * SAMPLE_RATE / frame)
+    target = chunk_samples
+    while target < total - chunk_samples // 4:
+        center = target // frame
+        low = max(boundaries[-1] // frame + 1, center - search_frames)
+        high = min(n_frames, center + search_frames)
+        if low < high:
+            cut = (low + int(np.argmin(energy[low:high]))) * frame
+        else:
+            cut = target
+        boundaries.append(cut)
+        target = cut + chunk_samples
+    boundaries.append(total)
+
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+# Modelo carregado em cada processo worker
+_worker_model = None
+
+
+def _init_worker(model_size, torch_threads):
+    global _worker_model
+    import torch
+    import whisper
+    torch.set_num_threads(torch_threads)
+    _worker_model = whisper.load_model(model_size, device="cpu")
+
+
+def _transcribe_chunk(source, start, end):
+    # source é o caminho do PCM bruto (o worker lê só o seu trecho) ou o trecho já recortado
+    if isinstance(source, str):
+        chunk = np.fromfile(source, dtype=np.float32, count=end - start, offset=start * 4)
+    else:
+        chunk = source
+    result = _worker_model.transcribe(chunk, fp16=False)
+    return Transcription.from_whisper_result(result, offset=start / SAMPLE_RATE)
+
+
+def _chunk_source(audio, start, end):
+    """Caminho do arquivo para áudio mapeado em memória (sem cópia), ou a cópia do trecho."""
+    if isinstance(audio, np.memmap) and audio.filename and audio.offset == 0 and audio.dtype == np.float32:
+        return audio.filename
+    return np.array(audio[start:end], dtype=np.float32)
+
+
+# Pools de processos reutilizados entre jobs (um por tamanho de modelo)
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool(model_size, workers):
+    # Com spawn, cada processo reimporta o módulo principal como __mp_main__:
+    # a inicialização da aplicação precisa ficar fora da importação (ver start_services em app.py)
+    with _pools_lock:
+        key = (model_size, workers)
+        if key not in _pools:
+            torch_threads = max(1, (os.cpu_count() or 1) // workers)
+            _pools[key] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model_size, torch_threads)
+            )
+            print(f"Pool de transcrição criado: {workers} processo(s), {torch_threads} thread(s) cada")
+        return _pools[key]
+
+
+def transcribe_parallel(audio, model_size, workers, chunk_seconds=600, on_progress=None):
+    """
+    Transcreve um áudio longo em trechos paralelos e junta o resultado.
+
+    :param audio: PCM float32 16 kHz mono.
+    :param model_size: Tamanho do modelo Whisper carregado em cada worker.
+    :param workers: Número de processos.
+    :param chunk_seconds: Tamanho aproximado de cada trecho.
+    :param on_progress: Função opcional chamada com a fração de trechos concluídos.
+    :return: Transcription com os segmentos em tempos absolutos.
+    """
+    chunks = split_on_silence(audio, target_chunk_seconds=chunk_seconds)
+    print(f"Transcrevendo {len(chunks)} trecho(s) em paralelo")
+
+    pool = _get_pool(model_size, workers)
+    pending = iter(enumerate(chunks))
+    futures = {}
+
+    def submit_next():
+        # Trechos enviados sob demanda: no máximo 2 por worker aguardando (e copiados) por vez
+        item = next(pending, None)
+        if item:
+            index, (start, end) = item
+            futures[pool.submit(_transcribe_chunk, _chunk_source(audio, start, end), start, end)] = index
+
+    for _ in range(2 * workers):
+        submit_next()
+
+    results = [None] * len(chunks)
+    done = 0
+    while futures:
+        finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+        for future in finished:
+            results[futures.pop(future)] = future.result()
+            done += 1
+            if on_progress:
+                on_progress(done / len(chunks))
+            submit_next()
+
+    text = " ".join(part for part in results if part.strip())
+    segments = [segment for part in results for segment in part.segments]
+    return Transcription(text, segments)
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import threading
+
+# Tamanho dos blocos lidos do corpo da requisição e gravados no disco
+STREAM_BLOCK_SIZE = 1024 * 1024
+
+
+class UploadError(Exception):
+    """Erro de upload com o status HTTP que deve ser devolvido ao cliente."""
+
+    def __init__(self, message, status_code=400, offset=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.offset = offset
+
+
+class UploadManager:
+    """
+    Uploads retomáveis em partes, gravados direto na pasta de trabalho do job.
+
+    O estado de cada upload (nome, tamanho total, offset já gravado e checksum
+    opcional do arquivo inteiro) fica em upload.json na pasta do job, então um
+    upload interrompido pode continuar do último offset confirmado, inclusive
+    depois de um restart. Cada parte é lida do corpo da requisição em blocos e
+    escrita no arquivo final sem passar por arquivos temporários.
+
+    :param workdirs: WorkDirManager com as pastas dos jobs.
+    """
+
+    def __init__(self, workdirs):
+        self.workdirs = workdirs
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        # Uploads expirados (pasta removida pelo reaper) ou jobs encerrados não precisam mais de lock
+        workdirs.on_cleanup(self._forget)
+
+    def _state_path(self, job_id):
+        return os.path.join(self.workdirs.path(job_id), "upload.json")
+
+    def _lock(self, job_id):
+        with self._locks_lock:
+            return self._locks.setdefault(job_id, threading.Lock())
+
+    def _forget(self, job_id):
+        with self._locks_lock:
+            self._locks.pop(job_id, None)
+
+    def _save_state(self, job_id, state):
+        path = self._state_path(job_id)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(f"{path}.tmp", path)
+
+    def create(self, job_id, filename, size, sha256=None):
+        """
+        Inicia um upload de `size` bytes e retorna o estado inicial.
+
+        :param sha256: Checksum opcional do arquivo inteiro, verificado quando a última parte chega.
+        """
+        job_dir = self.workdirs.create(job_id)
+        state = {
+            "filename": filename,
+            "path": os.path.join(job_dir, os.path.basename(filename)),
+            "size": int(size),
+            "offset": 0,
+            "sha256": sha256.lower() if sha256 else None,
+            "complete": False
+        }
+        # Arquivo criado vazio; as partes são escritas na posição do offset
+        open(state["path"], "wb").close()
+        self._save_state(job_id, state)
+        print(f"Upload iniciado: {job_id} ({state['size']} bytes)")
+        return state
+
+    def status(self, job_id):
+        """Retorna o estado do upload, ou None se ele não existir (ou expirou)."""
+        try:
+            with open(self._state_path(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_chunk(self, job_id, offset, stream, length, chunk_sha256=None):
+        """
+        Grava uma parte a partir de `offset`, lendo `length` bytes de `stream`.
+
+        :param chunk_sha256: Checksum opcional da parte; se não bater, a parte é descartada.
+        :return: Estado atualizado do upload (complete=True quando o arquivo termina).
+        :raises UploadError: Upload inexistente, offset divergente, parte incompleta ou checksum inválido.
+        """
+        with self._lock(job_id):
+            state = self.status(job_id)
+            if not state:
+                raise UploadError("Upload não encontrado ou expirado", 404)
+            if state["complete"]:
+                raise UploadError("Upload já concluído", 409, state["offset"])
+            if offset != state["offset"]:
+                raise UploadError("Offset divergente; retome a partir do offset atual", 409, state["offset"])
+            if length <= 0 or offset + length > state["size"]:
+                raise UploadError("Tamanho da parte inválido", 400, state["offset"])
+
+            digest = hashlib.sha256()
+            received = 0
+            with open(state["path"], "r+b") as f:
+                f.seek(offset)
+                while received < length:
+                    block = stream.read(min(STREAM_BLOCK_SIZE, length - received))
+                    if not block:
+                        break
+                    f.write(block)
+                    digest.update(block)
+                    received += len(block)
+
+                if received != length or (chunk_sha256 and digest.hexdigest() != chunk_sha256.lower()):
+                    # Descartar a parte: o próximo envio recomeça do offset confirmado
+                    f.truncate(offset)
+                    reason = "Parte incompleta" if received != length else "Checksum da parte não confere"
+                    raise UploadError(reason, 400 if received != length else 422, offset)
+
+            state["offset"] = offset + received
+            self.workdirs.touch(job_id)
+
+            if state["offset"] == state["size"]:
+                if state["sha256"] and _file_sha256(state["path"]) != state["sha256"]:
+                    # Arquivo corrompido: recomeçar o upload do zero
+                    open(state["path"], "wb").close()
+                    state["offset"] = 0
+                    self._save_state(job_id, state)
+                    raise UploadError("Checksum do arquivo não confere; reenvie o arquivo", 409, 0)
+                state["complete"] = True
+                print(f"Upload concluído: {job_id} ({state['size']} bytes)")
+            self._save_state(job_id, state)
+
+        if state["complete"]:
+            # Novas partes são recusadas pelo estado salvo; o lock não é mais necessário
+            self._forget(job_id)
+        return state
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(STREAM_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,385 @@
+import itertools
+import threading
+import time
+from collections import namedtuple
+
+import cv2
+import numpy as np
+import face_recognition
+
+# Largura máxima dos frames usados na detecção; as caixas voltam para a resolução original no recorte
+DETECTION_MAX_WIDTH = 640
+
+# Abaixo desta distância entre amostras é mais barato avançar com grab() do que fazer seek
+SEQUENTIAL_GAP_FRAMES = 15
+
+
+def frame_rate(video_path):
+    """Taxa de quadros do vídeo (30 se não puder ser lida)."""
+    cap = cv2.VideoCapture(video_path)
+    try:
+        return cap.get(cv2.CAP_PROP_FPS) or 30.0
+    finally:
+        cap.release()
+
+
+def sample_frames(video_path, num_samples, max_width=DETECTION_MAX_WIDTH, start_seconds=None, end_seconds=None):
+    """
+    Lê num_samples frames distribuídos pelo vídeo, com seek direto em cada um.
+
+    Em vez de decodificar o vídeo inteiro, cada amostra é buscada com
+    CAP_PROP_POS_FRAMES (o decodificador só anda do keyframe anterior até ela),
+    então o custo depende do número de amostras e não da duração do vídeo.
+
+    :param video_path: Caminho do vídeo.
+    :param num_samples: Número de frames amostrados.
+    :param max_width: Largura máxima da cópia reduzida usada na detecção.
+    :param start_seconds: Início opcional do intervalo amostrado.
+    :param end_seconds: Fim opcional do intervalo amostrado.
+    :return: Gerador de (índice do frame, frame original, frame reduzido, escala do reduzido).
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"Erro ao abrir o vídeo: {video_path}")
+        return
+
+    try:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        first = int(start_seconds * fps) if start_seconds else 0
+        last = min(total_frames, int(end_seconds * fps)) if end_seconds else total_frames
+        span = last - first
+        if span <= 0 or num_samples <= 0:
+            return
+        count = min(num_samples, span)
+        # Amostras no centro de cada intervalo, evitando o primeiro e o último frame
+        indexes = sorted({first + int((i + 0.5) * span / count) for i in range(count)})
+
+        position = 0
+        for index in indexes:
+            if 0 <= index - position <= SEQUENTIAL_GAP_FRAMES:
+                for _ in range(index - position):
+                    cap.grab()
+            else:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            ret, frame = cap.read()
+            position = index + 1
+            if not ret:
+                continue
+
+            scale = min(1.0, max_width / frame.shape[1])
+            if scale < 1.0:
+                small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            else:
+                small = frame
+            yield index, frame, small, scale
+    finally:
+        cap.release()
+
+
+def read_frame(video_path, seconds):
+    """Lê o frame do vídeo no tempo informado (em resolução original), ou None se falhar."""
+    cap = cv2.VideoCapture(video_path)
+    try:
+        cap.set(cv2.CAP_PROP_POS_MSEC, seconds * 1000)
+        ret, frame = cap.read()
+        return frame if ret else None
+    finally:
+        cap.release()
+
+
+def scale_box(location, scale, frame_shape):
+    """Converte uma caixa (top, right, bottom, left) do frame reduzido para o frame original."""
+    top, right, bottom, left = (int(round(value / scale)) for value in location)
+    height, width = frame_shape[:2]
+    return max(0, top), min(width, right), min(height, bottom), max(0, left)
+
+
+# Rosto encontrado em um frame: caixa (top, right, bottom, left) na resolução original,
+# encoding de 128 dimensões e expressão classificada
+FaceObservation = namedtuple("FaceObservation", ["box", "encoding", "expression"])
+
+# Classificadores Haar de cada thread (detectMultiScale não deve ser chamado em paralelo no mesmo objeto)
+_cascades = threading.local()
+
+
+def get_cascades():
+    """Retorna os classificadores de sorriso e olhos da thread atual, carregando o XML só na primeira vez."""
+    if not hasattr(_cascades, "smile"):
+        _cascades.smile = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_smile.xml')
+        _cascades.eye = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+    return _cascades
+
+
+def classify_expression(roi_gray):
+    """
+    Classifica a expressão de um rosto a partir da sua região em tons de cinza.
+
+    O sorriso é procurado só na metade inferior do rosto e os olhos só na superior.
+    """
+    cascades = get_cascades()
+    height = roi_gray.shape[0]
+    smiles = cascades.smile.detectMultiScale(roi_gray[height // 2:], 1.8, 20)
+    if len(smiles) > 0:
+        return 'happy'
+    eyes = cascades.eye.detectMultiScale(roi_gray[:height * 3 // 5], 1.1, 4)
+    if len(eyes) == 0:
+        return 'angry'
+    if len(eyes) > 1:
+        return 'surprised'
+    return 'neutral'
+
+
+def analyze_faces(samples, with_expressions=True):
+    """
+    Detecta rostos em um lote de frames amostrados.
+
+    A detecção roda uma única vez por frame (no frame reduzido) e a expressão é
+    avaliada apenas dentro da região de cada rosto, na resolução original.
+
+    :param samples: Lista de (frame original, frame reduzido, escala) como os de sample_frames.
+    :param with_expressions: Se False, não classifica expressões (apenas caixas e encodings).
+    :return: Lista com uma lista de FaceObservation por frame, na mesma ordem.
+    """
+    results = []
+    for frame, small, scale in samples:
+        rgb_small = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+        face_locations = face_recognition.face_locations(rgb_small)
+        face_encodings = face_recognition.face_encodings(rgb_small, face_locations) if face_locations else []
+
+        observations = []
+        for location, encoding in zip(face_locations, face_encodings):
+            top, right, bottom, left = scale_box(location, scale, frame.shape)
+            expression = None
+            if with_expressions and bottom > top and right > left:
+                roi_gray = cv2.cvtColor(frame[top:bottom, left:right], cv2.COLOR_BGR2GRAY)
+                expression = classify_expression(roi_gray)
+            observations.append(FaceObservation((top, right, bottom, left), encoding, expression))
+        results.append(observations)
+    return results
+
+
+class FaceIndex:
+    """
+    Índice das pessoas de um vídeo.
+
+    Os encodings aceitos ficam em uma matriz NumPy contígua e a distância de um
+    rosto novo para todos eles é calculada em uma única operação vetorizada
+    (mesma métrica e tolerância do face_recognition.compare_faces). Um índice
+    por vídeo de origem é compartilhado entre as thumbnails e o reenquadramento
+    de todos os clipes (que rodam em paralelo), então cada pessoa tem a mesma
+    posição no índice em todos eles.
+
+    :param tolerance: Distância máxima para considerar dois rostos a mesma pessoa.
+    :param dimensions: Tamanho dos encodings.
+    """
+
+    def __init__(self, tolerance=0.6, dimensions=128, initial_capacity=16):
+        self.tolerance = tolerance
+        self._matrix = np.empty((initial_capacity, dimensions), dtype=np.float64)
+        self._size = 0
+        self._lock = threading.RLock()
+        self.labels = []
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def encodings(self):
+        """Matriz (n, dimensões) com os encodings aceitos, sem cópia."""
+        return self._matrix[:self._size]
+
+    def distances(self, encoding):
+        """Distância euclidiana do encoding para cada rosto do índice."""
+        return np.linalg.norm(self.encodings - np.asarray(encoding, dtype=np.float64), axis=1)
+
+    def match(self, encoding):
+        """Índice do rosto mais próximo dentro da tolerância, ou None se o rosto for novo."""
+        with self._lock:
+            if not self._size:
+                return None
+            distances = self.distances(encoding)
+            nearest = int(np.argmin(distances))
+            return nearest if distances[nearest] <= self.tolerance else None
+
+    def match_many(self, encodings):
+        """
+        Compara vários encodings de uma vez.
+
+        :return: Array com o índice do rosto mais próximo de cada encoding, ou -1 se for novo.
+        """
+        queries = np.asarray(encodings, dtype=np.float64).reshape(-1, self._matrix.shape[1])
+        with self._lock:
+            if not self._size or not len(queries):
+                return np.full(len(queries), -1, dtype=np.int64)
+            # |a - b|² = |a|² + |b|² - 2ab, para todos os pares de uma vez
+            squared = (
+                np.square(queries).sum(axis=1)[:, None]
+                + np.square(self.encodings).sum(axis=1)[None, :]
+                - 2.0 * queries @ self.encodings.T
+            )
+        distances = np.sqrt(np.maximum(squared, 0.0))
+        nearest = np.argmin(distances, axis=1)
+        return np.where(distances[np.arange(len(queries)), nearest] <= self.tolerance, nearest, -1)
+
+    def add(self, encoding, label=None):
+        """Adiciona um rosto ao índice e retorna a sua posição."""
+        with self._lock:
+            if self._size == len(self._matrix):
+                grown = np.empty((len(self._matrix) * 2, self._matrix.shape[1]), dtype=np.float64)
+                grown[:self._size] = self._matrix[:self._size]
+                self._matrix = grown
+            self._matrix[self._size] = encoding
+            self.labels.append(label)
+            self._size += 1
+            return self._size - 1
+
+    def add_if_new(self, encoding, label=None):
+        """
+        Adiciona o rosto se ele ainda não estiver no índice.
+
+        :return: (posição do rosto, True se foi adicionado agora).
+        """
+        with self._lock:
+            index = self.match(encoding)
+            if index is not None:
+                return index, False
+            return self.add(encoding, label), True
+
+    def identify(self, encodings):
+        """
+        Posição no índice de cada rosto, adicionando as pessoas novas.
+
+        Todos os rostos são comparados de uma vez com match_many; só os que não
+        correspondem a ninguém são conferidos um a um (podem ser a mesma pessoa
+        nova vista em mais de um frame).
+
+        :return: Lista com a posição de cada encoding.
+        """
+        with self._lock:
+            positions = [int(position) for position in self.match_many(encodings)]
+            for i, position in enumerate(positions):
+                if position < 0:
+                    positions[i], _ = self.add_if_new(encodings[i])
+            return positions
+
+
+def extract_faces_from_video(video_path, num_faces=2, num_samples=24, batch_size=8,
+                             proxy=None, start_seconds=None, end_seconds=None, face_index=None):
+    """
+    Extrai frames com rostos de um vídeo com expressões distintas
+
+    Com um proxy de análise, a detecção roda nos frames do proxy (dentro do
+    intervalo informado) e só os frames escolhidos são lidos do vídeo original,
+    com as caixas convertidas para a resolução original.
+
+    :param face_index: FaceIndex do vídeo de origem, compartilhado entre os clipes
+                       (padrão: um índice novo só para esta chamada).
+    """
+    try:
+        start = time.perf_counter()
+        face_frames = []
+        face_index = face_index if face_index is not None else FaceIndex()
+        selected_people = set()
+        sampled = 0
+
+        # Dicionário para armazenar expressões faciais
+        expressions = {
+            'neutral': False,
+            'happy': False,
+            'surprised': False,
+            'angry': False
+        }
+
+        if proxy:
+            samples = sample_frames(proxy.path, num_samples, max_width=proxy.width,
+                                    start_seconds=start_seconds, end_seconds=end_seconds)
+        else:
+            samples = sample_frames(video_path, num_samples, start_seconds=start_seconds, end_seconds=end_seconds)
+        while len(face_frames) < num_faces and not all(expressions.values()):
+            # Analisar os frames em lotes (detecção uma vez por frame)
+            batch = list(itertools.islice(samples, batch_size))
+            if not batch:
+                break
+            sampled += len(batch)
+            detections = analyze_faces([(frame, small, scale) for _, frame, small, scale in batch])
+
+            for (index, frame, _, _), observations in zip(batch, detections):
+                for observation in observations:
+                    if len(face_frames) >= num_faces:
+                        break
+                    top, right, bottom, left = observation.box
+
+                    # Verificar se o rosto não está muito próximo
+                    face_height = bottom - top
+                    face_width = right - left
+                    if face_height >= frame.shape[0] * 0.3 or face_width >= frame.shape[1] * 0.3:
+                        continue
+
+                    # Verificar se a pessoa é diferente das já selecionadas (uma comparação vetorizada)
+                    person, _ = face_index.add_if_new(observation.encoding)
+                    is_unique = person not in selected_people
+
+                    # Selecionar rosto se a expressão for nova
+                    if is_unique and observation.expression and not expressions[observation.expression]:
+                        crop_frame = frame
+                        if proxy:
+                            # Recortar do frame original, com a caixa na resolução original
+                            crop_frame = read_frame(video_path, index / proxy.fps)
+                            if crop_frame is None:
+                                continue
+                            top, right, bottom, left = proxy.to_source(observation.box)
+                            face_height = bottom - top
+                            face_width = right - left
+
+                        # Adicionar margem de 20% ao redor do rosto
+                        margin = int(max(face_height, face_width) * 0.2)
+                        crop_top = max(0, top - margin)
+                        crop_bottom = min(crop_frame.shape[0], bottom + margin)
+                        crop_left = max(0, left - margin)
+                        crop_right = min(crop_frame.shape[1], right + margin)
+
+                        # Recortar (em resolução original) e armazenar o frame com o encoding
+                        face_frames.append({
+                            'frame': crop_frame[crop_top:crop_bottom, crop_left:crop_right],
+                            'encoding': observation.encoding,
+                            'expression': observation.expression
+                        })
+                        selected_people.add(person)
+                        expressions[observation.expression] = True
+        samples.close()
+
+        print(f"Rostos extraídos em {time.perf_counter() - start:.2f}s ({sampled} frame(s) amostrado(s)): {video_path}")
+        return face_frames
+
+    except Exception as e:
+        print(f"Erro ao extrair rostos do vídeo: {e}")
+        return None
+
+
+def create_thumbnail(face_frames, output_path, thumbnail_height=300):
+    """Cria uma thumbnail a partir dos frames com rostos"""
+    try:
+        if not face_frames or len(face_frames) < 2:
+            return False
+
+        # Redimensionar as imagens para mesma altura mantendo proporção
+        resized_frames = []
+        for face_frame in face_frames:
+            frame = face_frame['frame']
+            height, width = frame.shape[:2]
+            aspect_ratio = width / height
+            new_width = int(thumbnail_height * aspect_ratio)
+            resized_frame = cv2.resize(frame, (new_width, thumbnail_height))
+            resized_frames.append(resized_frame)
+
+        # Combinar as imagens horizontalmente
+        thumbnail = np.hstack(resized_frames)
+
+        # Salvar a thumbnail
+        cv2.imwrite(output_path, thumbnail)
+        return True
+
+    except Exception as e:
+        print(f"Erro ao criar thumbnail: {e}")
+        return False
@@ -0,0 +1,113 @@
+import resource
+import threading
+import time
+
+# Tamanhos de modelo suportados pela aplicação
+SUPPORTED_MODEL_SIZES = ("tiny", "base", "small")
+
+
+def current_rss_mb():
+    """Memória residente atual do processo em MB."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Fallback: pico de memória (em KB no Linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class WhisperModelRegistry:
+    """
+    Cache de modelos Whisper compartilhado pelo processo.
+
+    Cada tamanho de modelo é carregado uma única vez e reutilizado entre jobs.
+    O carregamento é protegido por um lock e cada modelo tem o seu próprio lock
+    de inferência, para que jobs concorrentes não usem o mesmo modelo ao mesmo tempo.
+
+    :param device: "cuda" ou "cpu"; detectado automaticamente se não informado.
+    """
+
+    def __init__(self, device=None):
+        self._device = device
+        self._models = {}
+        self._inference_locks = {}
+        self._load_lock = threading.Lock()
+        # Separado do _load_lock, que fica preso durante o carregamento de um modelo
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+
+    @property
+    def device(self):
+        if self._device is None:
+            import torch
+            self._device = "cuda" if torch.cuda.is_available() else "cpu"
+        return self._device
+
+    def get(self, size):
+        """Retorna o modelo do tamanho informado, carregando-o na primeira chamada."""
+        if size not in SUPPORTED_MODEL_SIZES:
+            raise ValueError(f"Modelo Whisper não suportado: {size}. Use um dos seguintes: {', '.join(SUPPORTED_MODEL_SIZES)}")
+
+        model = self._models.get(size)
+        if model is not None:
+            return model
+
+        with self._load_lock:
+            # Outro job pode ter carregado o modelo enquanto esperávamos o lock
+            if size in self._models:
+                return self._models[size]
+
+            import whisper
+            print(f"Carregando modelo Whisper '{size}' em {self.device}...")
+            rss_before = current_rss_mb()
+            start = time.perf_counter()
+            model = whisper.load_model(size, device=self.device)
+            load_seconds = time.perf_counter() - start
+            rss_after = current_rss_mb()
+
+            self._models[size] = model
+            self._inference_locks[size] = threading.Lock()
+            with self._stats_lock:
+                self._stats[size] = {
+                    "device": self.device,
+                    "load_seconds": round(load_seconds, 3),
+                    "rss_delta_mb": round(rss_after - rss_before, 1),
+                    "loaded_at": time.time(),
+                    "uses": 0
+                }
+            print(f"Modelo Whisper '{size}' carregado em {load_seconds:.2f}s (+{rss_after - rss_before:.0f} MB RSS)")
+            return model
+
+    def lock(self, size):
+        """Lock de inferência do modelo; use com `with registry.lock(size):`."""
+        self.get(size)
+        with self._stats_lock:
+            self._stats[size]["uses"] += 1
+        return self._inference_locks[size]
+
+    def warm_up(self, sizes, background=True):
+        """Carrega os modelos informados antecipadamente (por padrão em uma thread separada)."""
+        def load_all():
+            for size in sizes:
+                try:
+                    self.get(size)
+                except Exception as e:
+                    print(f"Erro ao pré-carregar modelo Whisper '{size}': {e}")
+
+        if background:
+            threading.Thread(target=load_all, name="whisper-warmup", daemon=True).start()
+        else:
+            load_all()
+
+    def stats(self):
+        """Tempo de carregamento, memória e uso de cada modelo carregado."""
+        with self._stats_lock:
+            models = {size: dict(info) for size, info in self._stats.items()}
+        return {
+            "loaded_models": sorted(self._models),
+            "rss_mb": round(current_rss_mb(), 1),
+            "models": models
+        }
@@ -0,0 +1,131 @@
+import os
+import shutil
+import threading
+import time
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class WorkDirManager:
+    """
+    Pastas de trabalho isoladas por job, com limpeza restrita ao próprio job.
+
+    Um reaper em segundo plano remove pastas abandonadas (sem job ativo) que
+    passaram do TTL e, se o total ainda exceder a cota de disco, remove as
+    mais antigas até voltar ao limite.
+
+    :param root: Pasta onde as pastas dos jobs são criadas.
+    :param ttl_seconds: Idade máxima de uma pasta sem job ativo.
+    :param quota_bytes: Espaço máximo ocupado pelas pastas dos jobs.
+    :param is_active: Função is_active(job_id) que indica se o job ainda precisa da pasta.
+    """
+
+    def __init__(self, root, ttl_seconds, quota_bytes, is_active=None):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.quota_bytes = quota_bytes
+        self.is_active = is_active or (lambda job_id: False)
+        self._cleanup_callbacks = []
+        self._reaper = None
+        if not os.path.exists(root):
+            os.makedirs(root)
+
+    def path(self, job_id):
+        return os.path.join(self.root, job_id)
+
+    def create(self, job_id):
+        """Cria (ou reaproveita) a pasta de trabalho do job e retorna o caminho."""
+        job_dir = self.path(job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        self.touch(job_id)
+        return job_dir
+
+    def touch(self, job_id):
+        """Atualiza o mtime da pasta para adiar a expiração pelo TTL."""
+        job_dir = self.path(job_id)
+        if os.path.exists(job_dir):
+            os.utime(job_dir, None)
+
+    def on_cleanup(self, callback):
+        """Registra callback(job_id), chamado sempre que a pasta de um job é removida (pelo job ou pelo reaper)."""
+        self._cleanup_callbacks.append(callback)
+
+    def cleanup(self, job_id):
+        """Remove apenas a pasta de trabalho do job informado."""
+        job_dir = self.path(job_id)
+        try:
+            if os.path.exists(job_dir):
+                shutil.rmtree(job_dir)
+                print(f"Pasta de trabalho removida: {job_dir}")
+        except Exception as e:
+            print(f"Erro ao remover pasta de trabalho {job_dir}: {e}")
+            return False
+        for callback in self._cleanup_callbacks:
+            callback(job_id)
+        return True
+
+    def reap(self):
+        """Remove pastas expiradas e aplica a cota de disco. Retorna o número de pastas removidas."""
+        now = time.time()
+        entries = []
+        for job_id in os.listdir(self.root):
+            job_dir = self.path(job_id)
+            if not os.path.isdir(job_dir):
+                continue
+            try:
+                mtime = os.path.getmtime(job_dir)
+            except OSError:
+                continue
+            entries.append({
+                "job_id": job_id,
+                "mtime": mtime,
+                "size": _dir_size(job_dir),
+                "active": self.is_active(job_id)
+            })
+
+        removed = 0
+        total_size = sum(entry["size"] for entry in entries)
+
+        # Primeiro as pastas abandonadas que passaram do TTL, depois as mais antigas até caber na cota
+        entries.sort(key=lambda entry: entry["mtime"])
+        for entry in entries:
+            if entry["active"]:
+                continue
+            expired = now - entry["mtime"] > self.ttl_seconds
+            over_quota = total_size > self.quota_bytes
+            if not expired and not over_quota:
+                continue
+            if self.cleanup(entry["job_id"]):
+                removed += 1
+                total_size -= entry["size"]
+
+        if total_size > self.quota_bytes:
+            print(f"Aviso: pastas de jobs ativos ocupam {total_size // (1024 * 1024)} MB, acima da cota")
+        return removed
+
+    def start_reaper(self, interval=300):
+        """Inicia a thread que executa reap() periodicamente."""
+        if self._reaper:
+            return
+
+        def loop():
+            while True:
+                try:
+                    removed = self.reap()
+                    if removed:
+                        print(f"Reaper removeu {removed} pasta(s) de trabalho")
+                except Exception as e:
+                    print(f"Erro no reaper de pastas de trabalho: {e}")
+                time.sleep(interval)
+
+        self._reaper = threading.Thread(target=loop, name="workdir-reaper", daemon=True)
+        self._reaper.start()
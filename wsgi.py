@@ -0,0 +1,4 @@
+# Ponto de entrada para servidores WSGI (ex.: gunicorn wsgi:app)
+from app import app, start_services
+
+start_services()